@@ -13,7 +13,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=datas,
-    hiddenimports=['PIL', 'PIL._imaging', 'PIL._tkinter_finder', 'cv2', 'numpy', 'replicate'],
+    # cv2, numpy, requests, httpx and replicate are imported lazily (lazy_imports.py)
+    hiddenimports=['PIL', 'PIL._imaging', 'PIL._tkinter_finder', 'cv2', 'numpy', 'replicate', 'httpx', 'requests'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ImageProcessor hot paths
+
+Runs load_template, create_mask, prepare_for_api, composite_result (with
+and without a reused output buffer) and save_image on the bundled
+templates and on synthetic 4K/8K templates, and reports throughput,
+p50/p99 latency and peak memory per stage.
+
+Usage:
+    python bench_image_processor.py
+    python bench_image_processor.py --iterations 50 --inputs bundled,4k
+    python bench_image_processor.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from image_processor import ImageProcessor
+
+
+SYNTHETIC_SIZES = {
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+
+class RSSSampler:
+    """Samples resident set size in a background thread (Linux only)"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.available = Path("/proc/self/statm").exists()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _rss(self) -> int:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self.page_size
+
+    def __enter__(self):
+        if self.available:
+            self.peak = self._rss()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __exit__(self, *exc):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, self._rss())
+
+    @property
+    def peak_mb(self):
+        if not self.available:
+            return None
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def make_synthetic_template(width: int, height: int, path: Path) -> Path:
+    """Draw a template-like image: white vehicle body, dark windows and wheels on a colored background"""
+    img = np.full((height, width, 3), (40, 120, 200), dtype=np.uint8)
+    cv2.rectangle(img, (width // 10, height // 4), (width * 9 // 10, height * 3 // 4), (255, 255, 255), -1)
+    cv2.rectangle(img, (width // 4, height // 3), (width // 2, height // 2), (30, 30, 30), -1)
+    for cx in (width // 4, width * 3 // 4):
+        cv2.circle(img, (cx, height * 3 // 4), height // 8, (10, 10, 10), -1)
+    Image.fromarray(img).save(path, "PNG")
+    return path
+
+
+def find_inputs(selected, work_dir: Path):
+    """Collect benchmark inputs as (name, path) pairs"""
+    inputs = []
+    if "bundled" in selected:
+        for path in sorted(Path("templates").glob("*/*_Template_*.png")):
+            inputs.append((path.stem, path))
+    for name, (width, height) in SYNTHETIC_SIZES.items():
+        if name in selected:
+            inputs.append((f"synthetic_{name}", make_synthetic_template(width, height, work_dir / f"{name}.png")))
+    return inputs
+
+
+def measure(func, iterations: int, warmup: int = 1):
+    """Time a callable; returns latency samples (seconds) plus peak memory"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    tracemalloc.start()
+    with RSSSampler() as rss:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return samples, traced_peak, rss.peak_mb
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples, traced_peak: int, rss_peak_mb, megapixels: float) -> dict:
+    mean = statistics.mean(samples)
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(mean * 1000, 2),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "ops_per_sec": round(1 / mean, 2) if mean else None,
+        "megapixels_per_sec": round(megapixels / mean, 1) if mean else None,
+        "peak_traced_mb": round(traced_peak / (1024 * 1024), 1),
+        "peak_rss_mb": rss_peak_mb,
+    }
+
+
+def bench_input(processor: ImageProcessor, name: str, path: Path, iterations: int, work_dir: Path) -> dict:
+    """Benchmark every stage on one template"""
+    template = processor.load_template(path)
+    mask = processor.create_mask(template)
+    # Stand-in for the model output: same size, different colors
+    generated = Image.fromarray(255 - np.asarray(template))
+    megapixels = template.width * template.height / 1e6
+    out_path = work_dir / f"{name}_out.png"
+    buffer = template.copy()
+
+    stages = {
+        "load_template": lambda: processor.load_template(path),
+        "create_mask": lambda: processor.create_mask(template),
+        "prepare_for_api": lambda: processor.prepare_for_api(template, mask),
+        "composite_result": lambda: processor.composite_result(template, generated, mask),
+        "composite_into_buffer": lambda: processor.composite_result(template, generated, mask, out=buffer),
+        "save_image": lambda: processor.save_image(template, out_path),
+    }
+
+    results = {"size": list(template.size), "megapixels": round(megapixels, 2), "stages": {}}
+    for stage, func in stages.items():
+        samples, traced_peak, rss_peak = measure(func, iterations)
+        results["stages"][stage] = summarize(samples, traced_peak, rss_peak, megapixels)
+        stats = results["stages"][stage]
+        print(f"  {stage:<21} p50 {stats['p50_ms']:>9.2f} ms  p99 {stats['p99_ms']:>9.2f} ms  "
+              f"{stats['megapixels_per_sec']:>8.1f} MP/s  peak {stats['peak_traced_mb']:>7.1f} MB traced"
+              + (f", {stats['peak_rss_mb']:.1f} MB RSS" if stats['peak_rss_mb'] is not None else ""))
+
+    return results
+
+
+def environment() -> dict:
+    """Record versions so results from different machines/commits can be told apart"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "pillow": Image.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(current: dict, previous_path: str) -> None:
+    """Print p50 change per stage against an earlier results file"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+
+    print(f"\nComparison with {previous_path} (p50, negative = faster):")
+    for name, result in current["inputs"].items():
+        old = previous.get("inputs", {}).get(name)
+        if not old:
+            continue
+        for stage, stats in result["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if not old_stats or not old_stats["p50_ms"]:
+                continue
+            change = (stats["p50_ms"] - old_stats["p50_ms"]) / old_stats["p50_ms"] * 100
+            print(f"  {name:<32} {stage:<21} {old_stats['p50_ms']:>9.2f} -> {stats['p50_ms']:>9.2f} ms "
+                  f"({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ImageProcessor stages")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed iterations per stage")
+    parser.add_argument("--inputs", default="bundled,4k,8k",
+                        help="Comma separated inputs: bundled, 4k, 8k")
+    parser.add_argument("--output", default="bench_results.json", help="Where to save JSON results")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    processor = ImageProcessor()
+    results = {"environment": environment(), "iterations": args.iterations, "inputs": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        inputs = find_inputs(set(args.inputs.split(",")), work_dir)
+        if not inputs:
+            print("No benchmark inputs found")
+            return 1
+
+        for name, path in inputs:
+            print(f"\n{name}")
+            results["inputs"][name] = bench_input(processor, name, path, args.iterations, work_dir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Load-test the full generation pipeline against the local mock backend
+
+Runs N views concurrently through BatchGenerator.run_job (the
+LiveryPipeline stages: prepare, generate, composite, save) against an
+in-process mock of the Replicate API, so nothing is billed and no network
+is needed. While the views run, a ticker on the main thread stands in for
+the GUI event loop and records how late its 16 ms ticks fire. The
+pipeline's per-stage timings and memory counters are reported as well.
+
+Usage:
+    python bench_pipeline.py --views 50 --latency lognormal:8,0.4 --error-rate 0.05
+    python bench_pipeline.py --views 200 --async-client --output pipeline.json
+    python bench_pipeline.py --views 50 --atlas   # one call per vehicle instead of per view
+    python bench_pipeline.py --views 50 --cpu-workers -1   # staged pipeline, image work in a process pool
+    python bench_pipeline.py --views 1000 --async-client --webhooks --cpu-workers 1   # pushed completions
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from template_manager import TemplateManager
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from api_client import ReplicateAPIClient
+from async_api_client import AsyncReplicateAPIClient
+from inference_backend import MockBackend
+from webhook_receiver import WebhookReceiver
+from batch_generator import BatchGenerator
+
+
+UI_TICK_SECONDS = 0.016
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def watch_ui_thread(stop: threading.Event, thread_counts: list):
+    """Tick every 16 ms like a GUI event loop; returns how late each tick fired (seconds)"""
+    lags = []
+    expected = time.perf_counter() + UI_TICK_SECONDS
+    while not stop.is_set():
+        time.sleep(max(0.0, expected - time.perf_counter()))
+        now = time.perf_counter()
+        lags.append(now - expected)
+        thread_counts.append(threading.active_count())
+        expected = now + UI_TICK_SECONDS
+    return lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the generation pipeline")
+    parser.add_argument("--views", type=int, default=50, help="Number of views to generate")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Views in flight at once (default: all of them)")
+    parser.add_argument("--latency", default="lognormal:2,0.4", help="Mock latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of predictions that fail")
+    parser.add_argument("--http-error-rate", type=float, default=0.0,
+                        help="Fraction of create requests rejected with HTTP 503")
+    parser.add_argument("--output-image", default=None, help="Image returned by every prediction")
+    parser.add_argument("--upload-mode", default="data_uri", choices=["data_uri", "files"])
+    parser.add_argument("--crop-padding", type=int, default=None,
+                        help="Send only the mask's bounding box plus this padding")
+    parser.add_argument("--async-client", action="store_true", help="Use AsyncReplicateAPIClient")
+    parser.add_argument("--mirror-views", action="store_true",
+                        help="Build mirror image views (Right) from their counterpart instead of generating them")
+    parser.add_argument("--atlas", action="store_true",
+                        help="Generate each vehicle's views with a single call (atlas mode)")
+    parser.add_argument("--cpu-workers", type=int, default=0,
+                        help="Run the batch as a staged pipeline with the image work in this many "
+                             "processes (-1 = one per core); latency is then measured from the batch start")
+    parser.add_argument("--webhooks", action="store_true",
+                        help="Have the mock push completion webhooks to a local receiver instead of polling")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Save results as JSON")
+    args = parser.parse_args()
+
+    # Poll the mock quickly; real runs keep Replicate's default
+    os.environ.setdefault("REPLICATE_POLL_INTERVAL", "0.1")
+    concurrency = args.concurrency or args.views
+
+    backend = MockBackend(latency=args.latency, error_rate=args.error_rate,
+                          http_error_rate=args.http_error_rate,
+                          output_image=args.output_image, seed=args.seed)
+    if args.webhooks:
+        backend.webhooks = WebhookReceiver().start()
+    client_class = AsyncReplicateAPIClient if args.async_client else ReplicateAPIClient
+    client_kwargs = {"poll_interval": 0.1, "max_concurrency": concurrency} if args.async_client else {}
+    client = client_class("", upload_mode=args.upload_mode, backend=backend, **client_kwargs)
+
+    processor = ImageProcessor()
+    template_manager = TemplateManager("templates")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_cache = PreparedInputCache(processor, cache_dir=str(Path(tmp) / "prepared"),
+                                         crop_padding=args.crop_padding)
+        generator = BatchGenerator(client, processor, template_manager, input_cache,
+                                   output_dir=str(Path(tmp) / "output"), max_in_flight=concurrency,
+                                   mirror_views=args.mirror_views, atlas_mode=args.atlas,
+                                   cpu_workers=args.cpu_workers)
+
+        templates = generator.build_jobs(template_manager.get_vehicle_names())
+        if not templates:
+            print("No templates found")
+            return 1
+
+        # Reuse the available templates until there are enough views
+        # (a job with a mirrored view counts as two)
+        jobs = []
+        planned = 0
+        for i, job in enumerate(itertools.cycle(templates)):
+            if planned >= args.views:
+                break
+            mirrored = job.mirrored and dataclasses.replace(
+                job.mirrored, output_path=job.mirrored.output_path.with_name(f"Livery_{job.mirrored.view}_{i}.png"))
+            output_path = job.output_path.with_name(f"Livery_{job.view}_{i}.png")
+            jobs.append(dataclasses.replace(job, output_path=output_path, mirrored=mirrored))
+            planned += 2 if mirrored else 1
+
+        # Units of work: one job each, or in atlas mode one vehicle's set of jobs
+        if args.atlas:
+            units = [jobs[i:i + len(templates)] for i in range(0, len(jobs), len(templates))]
+        else:
+            units = [[job] for job in jobs]
+
+        latencies = []
+        failures = []
+
+        def run(index_unit):
+            index, unit = index_unit
+            views = len(unit) + sum(1 for job in unit if job.mirrored)
+            start = time.perf_counter()
+            try:
+                if args.atlas:
+                    generator.run_atlas_jobs(unit, "load test livery", seed=args.seed + index)
+                else:
+                    generator.run_job(unit[0], "load test livery", seed=args.seed + index)
+                latencies.extend([time.perf_counter() - start] * views)
+            except Exception as e:
+                failures.extend([str(e)] * views)
+
+        def run_staged():
+            # The whole batch through BatchGenerator.run_jobs (jobs have no per-job seed here)
+            def on_result(job, error):
+                if error:
+                    failures.append(error)
+                else:
+                    latencies.append(time.perf_counter() - start)
+            generator.run_jobs(jobs, "load test livery", on_result=on_result)
+
+        stop = threading.Event()
+        thread_counts = []
+        start = time.perf_counter()
+        if args.cpu_workers and not args.atlas:
+            watcher = threading.Thread(target=lambda: (run_staged(), stop.set()), daemon=True)
+            watcher.start()
+            ui_lags = watch_ui_thread(stop, thread_counts)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+                done = executor.map(run, enumerate(units))
+                watcher = threading.Thread(target=lambda: (list(done), stop.set()), daemon=True)
+                watcher.start()
+                ui_lags = watch_ui_thread(stop, thread_counts)
+        elapsed = time.perf_counter() - start
+        generator.close()
+
+    views = len(jobs) + sum(1 for job in jobs if job.mirrored)
+    results = {
+        "views": views,
+        "api_calls": len(units),
+        "estimated_cost_usd": round(len(units) * client.estimated_cost, 4),
+        "mirror_views": args.mirror_views,
+        "atlas": args.atlas,
+        "cpu_workers": generator.cpu_workers,
+        "concurrency": concurrency,
+        "client": client_class.__name__,
+        "completion": "webhook" if args.webhooks else "poll",
+        "upload_mode": args.upload_mode,
+        "crop_padding": args.crop_padding,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "http_error_rate": args.http_error_rate,
+        "seconds": round(elapsed, 2),
+        "views_per_minute": round(views / elapsed * 60, 1),
+        "succeeded": len(latencies),
+        "failed": len(failures),
+        "view_p50_s": round(percentile(latencies, 50), 2),
+        "view_p99_s": round(percentile(latencies, 99), 2),
+        "ui_tick_lag_p50_ms": round(percentile(ui_lags, 50) * 1000, 1),
+        "ui_tick_lag_p99_ms": round(percentile(ui_lags, 99) * 1000, 1),
+        "ui_tick_lag_max_ms": round(max(ui_lags, default=0) * 1000, 1),
+        "ui_ticks": len(ui_lags),
+        "threads_peak": max(thread_counts, default=0),
+        "stages": generator.pipeline.stats.to_dict(),
+        "mock_server": backend.server.stats(),
+        "webhook_receiver": backend.webhooks.counts if backend.webhooks else None,
+        "payload_stats": client.payload_stats,
+        "coalesced_requests": client.coalesced_requests,
+    }
+    backend.close()
+    if backend.webhooks:
+        backend.webhooks.stop()
+
+    print(f"\n{results['succeeded']}/{views} views ({len(units)} API calls, ~${results['estimated_cost_usd']}) in {elapsed:.1f}s "
+          f"({results['views_per_minute']} views/min, {len(failures)} failed)")
+    print(f"View latency: p50 {results['view_p50_s']}s, p99 {results['view_p99_s']}s")
+    if latencies:
+        print(f"Mean view latency: {statistics.mean(latencies):.2f}s")
+    print(generator.pipeline.stats.summary())
+    print(f"Peak threads: {results['threads_peak']}, status polls: {results['mock_server']['polls']}")
+    print(f"UI tick lag: p50 {results['ui_tick_lag_p50_ms']} ms, p99 {results['ui_tick_lag_p99_ms']} ms, "
+          f"max {results['ui_tick_lag_max_ms']} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
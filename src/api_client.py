@@ -4,137 +4,274 @@ API Client - Handles communication with Replicate API for image generation
 import os
 import io
 import base64
-import replicate
-from PIL import Image
-from typing import Optional
+import hashlib
+import threading
+from concurrent.futures import Future
+from PIL import Image, ImageOps
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import time
 
+from result_cache import ResultCache
+from downloader import download_to_temp
+from uploader import FileUploader
+from inference_backend import InferenceBackend, ReplicateBackend
+from cancellation import CancelToken, Cancelled
+from model_registry import DEFAULT_MODEL, ModelSpec, get_model_spec
+
+
+# Image inputs accepted by generate_inpainting: a PIL image, encoded PNG
+# bytes, or an already encoded data URI / file URL
+ImageInput = Union[Image.Image, bytes, str]
+
 
 class ReplicateAPIClient:
     """Client for Replicate API image inpainting"""
 
-    def __init__(self, api_key: str, model: str = "stability-ai/stable-diffusion-inpainting:95b7223104132402a9ae91cc677285bc5eb997834bd2349fa486f53910fd68b3"):
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL,
+                 result_cache: Optional[ResultCache] = None, upload_mode: str = "data_uri",
+                 backend: Optional[InferenceBackend] = None):
         """
         Initialize Replicate API client
 
         Args:
             api_key: Replicate API key
             model: Model identifier to use for inpainting (with version hash)
+            result_cache: Optional cache so identical requests are only paid for once
+            upload_mode: "data_uri" to inline images as base64, or "files" to
+                upload raw PNG bytes once to the Replicate Files API and send
+                the file URL
+            backend: Where predictions run (default: the Replicate API)
         """
         self.api_key = api_key
         self.model = model
+        self.spec: ModelSpec = get_model_spec(model)
+        self.result_cache = result_cache
+        self.upload_mode = upload_mode
+        self.backend = backend or ReplicateBackend(api_key)
+        self.uploader = (
+            FileUploader(api_key, endpoint=self.backend.files_endpoint) if upload_mode == "files" else None
+        )
+
+        # Running totals for payload encoding/upload
+        self.payload_stats: Dict[str, float] = {
+            "payloads": 0, "png_bytes": 0, "sent_bytes": 0,
+            "encode_seconds": 0.0, "upload_seconds": 0.0, "uploads_reused": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+        # Requests currently running, by request_key, as [future, cancel token,
+        # callers waiting]; identical requests made meanwhile share the result
+        self._in_flight: Dict[str, list] = {}
+        self._in_flight_lock = threading.Lock()
+        self.coalesced_requests = 0
 
         # Set API key in environment
         if api_key:
             os.environ["REPLICATE_API_TOKEN"] = api_key
 
-    def image_to_data_uri(self, image: Image.Image) -> str:
-        """Convert PIL Image to data URI for API submission"""
+    @property
+    def is_configured(self) -> bool:
+        """Whether the client can submit predictions (has a key, or the backend needs none)"""
+        return bool(self.api_key) or not self.backend.requires_api_key
+
+    @property
+    def estimated_cost(self) -> float:
+        """Approximate cost of one generation with the current model"""
+        return self.spec.cost
+
+    @property
+    def inverts_mask(self) -> bool:
+        """Whether the model expects an inverted mask (black = inpaint)"""
+        return self.spec.inverts_mask
+
+    @property
+    def input_settings(self) -> Dict[str, Any]:
+        """PreparedInputCache.get() settings that match what the model processes"""
+        return {
+            "max_size": self.spec.max_size,
+            "min_size": self.spec.min_size,
+            "max_pixels": self.spec.optimal_pixels,
+            "multiple": self.spec.multiple,
+            "invert_mask": self.spec.inverts_mask,
+        }
+
+    @staticmethod
+    def image_to_png(image: Image.Image) -> bytes:
+        """Encode PIL Image as PNG bytes"""
         buffered = io.BytesIO()
         image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return f"data:image/png;base64,{img_str}"
+        return buffered.getvalue()
+
+    @staticmethod
+    def mask_to_png(mask: Image.Image, invert: bool = False) -> bytes:
+        """Encode mask as PNG bytes, inverting it for models that need it"""
+        if invert:
+            mask = ImageOps.invert(mask)
+        return ReplicateAPIClient.image_to_png(mask)
+
+    @staticmethod
+    def png_to_data_uri(data: bytes) -> str:
+        """Wrap PNG bytes in a base64 data URI"""
+        return f"data:image/png;base64,{base64.b64encode(data).decode()}"
+
+    @staticmethod
+    def image_to_data_uri(image: Image.Image) -> str:
+        """Convert PIL Image to data URI for API submission"""
+        return ReplicateAPIClient.png_to_data_uri(ReplicateAPIClient.image_to_png(image))
+
+    def payload_bytes(self, payload: ImageInput, is_mask: bool = False) -> Tuple[Union[bytes, str], str]:
+        """
+        Normalize an image input to PNG bytes (or a ready-to-send string)
+
+        Args:
+            payload: PIL image, encoded PNG bytes (mask polarity already
+                applied), or a ready-to-send data URI / URL
+            is_mask: Apply the model's mask polarity when encoding a PIL image
+
+        Returns:
+            Tuple of (PNG bytes or string, content hash used for result cache keys)
+        """
+        if isinstance(payload, str):
+            return payload, hashlib.sha256(payload.encode()).hexdigest()
+
+        if isinstance(payload, Image.Image):
+            start = time.perf_counter()
+            if is_mask:
+                payload = self.mask_to_png(payload, invert=self.inverts_mask)
+            else:
+                payload = self.image_to_png(payload)
+            with self._stats_lock:
+                self.payload_stats["encode_seconds"] += time.perf_counter() - start
+
+        return payload, hashlib.sha256(payload).hexdigest()
+
+    def send_payload(self, payload: Union[bytes, str], name: str) -> str:
+        """
+        Turn PNG bytes into the value sent to the API (data URI or uploaded file URL)
+
+        Args:
+            payload: PNG bytes, or an already encoded string (returned as-is)
+            name: Label used in the size/timing report
+
+        Returns:
+            Value for the model's image/mask input
+        """
+        if isinstance(payload, str):
+            return payload
+
+        start = time.perf_counter()
+        reused = False
+        if self.uploader:
+            value, reused = self.uploader.upload(payload, filename=f"{name}.png")
+            sent_bytes = 0 if reused else len(payload)
+            how = "reused earlier upload" if reused else f"uploaded {sent_bytes / 1024:.0f} KB"
+        else:
+            value = self.png_to_data_uri(payload)
+            sent_bytes = len(value)
+            how = f"{sent_bytes / 1024:.0f} KB data URI"
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            stats = self.payload_stats
+            stats["payloads"] += 1
+            stats["png_bytes"] += len(payload)
+            stats["sent_bytes"] += sent_bytes
+            stats["upload_seconds" if self.uploader else "encode_seconds"] += elapsed
+            stats["uploads_reused"] += int(reused)
+
+        print(f"Payload {name}: {len(payload) / 1024:.0f} KB PNG, {how} in {elapsed * 1000:.0f} ms")
+        return value
 
     def generate_inpainting(
         self,
-        image: Image.Image,
-        mask: Image.Image,
+        image: ImageInput,
+        mask: ImageInput,
         prompt: str,
         view: str = "",
         negative_prompt: str = "blurry, low quality, distorted, deformed, text, words, letters",
         num_inference_steps: int = 50,
-        guidance_scale: float = 7.5
+        guidance_scale: float = 7.5,
+        seed: Optional[int] = None,
+        cancel: Optional[CancelToken] = None
     ) -> Optional[Image.Image]:
         """
         Generate inpainted image using Replicate API
 
         Args:
-            image: Original template image
-            mask: Inpainting mask (white = paint, black = preserve)
+            image: Original template image, its encoded PNG bytes, or a
+                ready-to-send data URI / URL
+            mask: Inpainting mask (white = paint, black = preserve), or its
+                encoded PNG bytes / data URI with the model's polarity applied
             prompt: User prompt for livery design
             view: View angle (Front, Rear, Left, Right, Top)
             negative_prompt: Things to avoid in generation
             num_inference_steps: Number of denoising steps
             guidance_scale: How closely to follow the prompt
+            seed: Fixed random seed for reproducible results (None = random)
+            cancel: Token that stops the request: the remote prediction is
+                cancelled and nothing is downloaded
 
         Returns:
             PIL Image of generated result, or None if failed
+
+        Raises:
+            Cancelled: If cancel was cancelled before the result arrived
         """
-        if not self.api_key:
+        if not self.is_configured:
             raise ValueError("Replicate API key not set")
 
         try:
-            # Build clean prompt - just the user's design request
-            full_prompt = f"{prompt}"
-            if view:
-                full_prompt += f", {view.lower()} side view"
-            # Add quality/style descriptors that help without confusing the AI
-            full_prompt += ", high quality vehicle livery, professional design, clean graphics"
-
+            if cancel:
+                cancel.check()
+            full_prompt = self.build_prompt(prompt, view)
             print(f"Generating with prompt: {full_prompt}")
 
-            # Convert images to data URIs
-            image_uri = self.image_to_data_uri(image)
+            # Encode images to PNG (Ideogram uses an INVERTED mask:
+            # black = inpaint, white = preserve; other models use
+            # white = inpaint, black = preserve)
+            image_data, image_hash = self.payload_bytes(image)
+            mask_data, mask_hash = self.payload_bytes(mask, is_mask=True)
 
-            # Ideogram uses INVERTED mask (black = inpaint, white = preserve)
-            # Other models use white = inpaint, black = preserve
-            if "ideogram" in self.model.lower():
-                from PIL import ImageOps
-                mask_inverted = ImageOps.invert(mask)
-                mask_uri = self.image_to_data_uri(mask_inverted)
-            else:
-                mask_uri = self.image_to_data_uri(mask)
-
-            # Determine model type and use appropriate parameters
-            if "ideogram" in self.model.lower():
-                # Ideogram models (best for text)
-                input_params = {
-                    "image": image_uri,
-                    "mask": mask_uri,
-                    "prompt": full_prompt,
-                    "magic_prompt_option": "Auto",  # Optimize prompts automatically
-                    "style_type": "Auto"
-                }
-            elif "flux-fill-pro" in self.model or "flux" in self.model.lower():
-                # FLUX models use different parameter names
-                input_params = {
-                    "image": image_uri,
-                    "mask": mask_uri,
-                    "prompt": full_prompt,
-                    "steps": num_inference_steps,
-                    "guidance": guidance_scale * 8,  # FLUX uses higher scale (1.5-100 vs 1-20)
-                    "output_format": "png"
-                }
-            else:
-                # Stable Diffusion models use original parameter names
-                input_params = {
-                    "image": image_uri,
-                    "mask": mask_uri,
-                    "prompt": full_prompt,
-                    "negative_prompt": negative_prompt,
-                    "num_inference_steps": num_inference_steps,
-                    "guidance_scale": guidance_scale,
-                }
-
-            # Run the model
-            output = replicate.run(self.model, input=input_params)
-
-            # Handle different output formats
-            if isinstance(output, list) and len(output) > 0:
-                output_url = output[0]
-            elif isinstance(output, str):
-                output_url = output
-            else:
-                print(f"Unexpected output format: {type(output)}")
-                return None
+            input_params = self.build_input_params(
+                full_prompt, negative_prompt, num_inference_steps, guidance_scale, seed
+            )
+
+            # Serve identical requests from the result cache
+            request_key = self.request_key(input_params, image_hash, mask_hash)
+            cache_key = request_key if self.result_cache else None
+            if cache_key:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
 
-            # Download the result
-            import requests
-            response = requests.get(output_url)
-            result_image = Image.open(io.BytesIO(response.content))
+            def run(shared_cancel: CancelToken) -> Optional[Image.Image]:
+                # Only send (base64 encode or upload) images on a cache miss
+                name = view or "image"
+                input_params["image"] = self.send_payload(image_data, f"{name}_template")
+                input_params["mask"] = self.send_payload(mask_data, f"{name}_mask")
 
-            print(f"Successfully generated image: {result_image.size}")
-            return result_image
+                # Run the model
+                start_time = time.monotonic()
+                output = self.backend.run(self.model, input_params, cancel=shared_cancel)
+
+                output_url = self.output_url(output)
+                if output_url is None:
+                    return None
+                shared_cancel.check()
+
+                # Stream the result to disk over the shared session and decode it
+                # here, on the worker thread, rather than lazily on the UI thread
+                download_path = download_to_temp(output_url)
+                result_image = self.load_result(download_path, cache_key, start_time)
+
+                print(f"Successfully generated image: {result_image.size}")
+                return result_image
+
+            return self.single_flight(request_key, run, cancel)
+
+        except Cancelled:
+            raise
 
         except Exception as e:
             print(f"Error generating image: {e}")
@@ -142,6 +279,122 @@ class ReplicateAPIClient:
             traceback.print_exc()
             return None
 
+    def build_prompt(self, prompt: str, view: str = "") -> str:
+        """Build the full prompt sent to the model"""
+        # Build clean prompt - just the user's design request
+        full_prompt = f"{prompt}"
+        if view:
+            full_prompt += f", {view.lower()} side view"
+        # Add quality/style descriptors that help without confusing the AI
+        full_prompt += ", high quality vehicle livery, professional design, clean graphics"
+        return full_prompt
+
+    def build_input_params(self, full_prompt: str, negative_prompt: str, num_inference_steps: int,
+                           guidance_scale: float, seed: Optional[int] = None) -> Dict:
+        """Build model-specific input parameters (image and mask are filled in later)"""
+        return self.spec.build_input_params(
+            full_prompt, negative_prompt, num_inference_steps, guidance_scale, seed
+        )
+
+    def request_key(self, input_params: Dict, image_hash: str, mask_hash: str) -> str:
+        """Hash of everything that determines a result: model, parameters and image contents"""
+        # Key on content hashes so data URIs / file URLs don't matter
+        key_params = dict(input_params, image=image_hash, mask=mask_hash)
+        return ResultCache.make_key(self.model, key_params)
+
+    def single_flight(self, request_key: str, run: Callable[[CancelToken], Optional[Image.Image]],
+                      cancel: Optional[CancelToken] = None) -> Optional[Image.Image]:
+        """
+        Run a request, unless an identical one is already running
+
+        A second "Generate" click, or two vehicles with byte-identical
+        templates, would otherwise pay for the same prediction twice. Later
+        callers wait for the running request and get the same result (or
+        exception). The shared request gets its own cancel token, which is
+        only cancelled once every caller waiting for it has been cancelled;
+        until then a cancelled caller that started it keeps serving the
+        others.
+        """
+        with self._in_flight_lock:
+            flight = self._in_flight.get(request_key)
+            # A flight all of whose callers were cancelled is winding down - start a new one
+            leader = flight is None or flight[1].cancelled
+            if leader:
+                flight = self._in_flight[request_key] = [Future(), CancelToken(), 0]
+            else:
+                self.coalesced_requests += 1
+            flight[2] += 1
+        future, shared_cancel = flight[0], flight[1]
+
+        def leave() -> None:
+            with self._in_flight_lock:
+                flight[2] -= 1
+                if flight[2] == 0:
+                    shared_cancel.cancel()
+
+        unregister = cancel.on_cancel(leave) if cancel else lambda: None
+        try:
+            if not leader:
+                print("Identical request already in flight - sharing its result")
+                if cancel:
+                    # Stop waiting as soon as this caller is cancelled
+                    done = threading.Event()
+                    future.add_done_callback(lambda _: done.set())
+                    stop_waiting = cancel.on_cancel(done.set)
+                    done.wait()
+                    stop_waiting()
+                    cancel.check()
+                return future.result()
+
+            try:
+                result = run(shared_cancel)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with self._in_flight_lock:
+                    if self._in_flight.get(request_key) is flight:
+                        del self._in_flight[request_key]
+
+            # Others may still have wanted the result, but this caller gave up on it
+            if cancel:
+                cancel.check()
+            return result
+        finally:
+            unregister()
+
+    @staticmethod
+    def output_url(output) -> Optional[str]:
+        """Extract the result URL from a model's output"""
+        # Handle different output formats
+        if isinstance(output, list) and len(output) > 0:
+            return str(output[0])
+        elif isinstance(output, str):
+            return output
+
+        print(f"Unexpected output format: {type(output)}")
+        return None
+
+    def load_result(self, download_path: Path, cache_key: Optional[str], start_time: float) -> Image.Image:
+        """Decode a downloaded result and move it into the result cache"""
+        try:
+            with Image.open(download_path) as result_image:
+                result_image.load()
+
+            if self.result_cache and cache_key:
+                self.result_cache.put(
+                    cache_key,
+                    download_path,
+                    latency_seconds=time.monotonic() - start_time,
+                    cost=self.estimated_cost,
+                    model=self.model
+                )
+        finally:
+            download_path.unlink(missing_ok=True)
+
+        return result_image
+
     def test_connection(self) -> bool:
         """Test if API connection is working"""
         if not self.api_key:
@@ -0,0 +1,343 @@
+"""
+Async API Client - asyncio-native Replicate inpainting client
+"""
+import asyncio
+import functools
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Coroutine, Dict, Optional
+
+from PIL import Image
+
+from api_client import ReplicateAPIClient, ImageInput, DEFAULT_MODEL
+from result_cache import ResultCache
+from inference_backend import InferenceBackend, TERMINAL_STATUSES
+from cancellation import CancelToken, Cancelled
+from lazy_imports import lazy_import
+
+httpx = lazy_import("httpx")
+
+
+class EventLoopThread:
+    """An asyncio event loop running in a background thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="asyncio-loop", daemon=True)
+        self.thread.start()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it finishes"""
+        return self.submit(coro).result(timeout)
+
+
+_loop_thread: Optional[EventLoopThread] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    """Get the process-wide event loop thread, starting it on first use"""
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = EventLoopThread()
+        return _loop_thread
+
+
+class AsyncReplicateAPIClient(ReplicateAPIClient):
+    """
+    Replicate client whose predictions are driven by a single asyncio loop.
+
+    Uses the same model-specific parameters, payload handling and result
+    cache as ReplicateAPIClient, but creating, polling, cancelling and
+    downloading predictions are coroutines, so one event loop can keep
+    hundreds of predictions in flight without an OS thread per prediction.
+    With webhook completion (see create_backend) pending predictions
+    aren't polled at all.
+    """
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL,
+                 result_cache: Optional[ResultCache] = None, upload_mode: str = "data_uri",
+                 backend: Optional[InferenceBackend] = None,
+                 max_concurrency: int = 100, poll_interval: float = 1.0):
+        """
+        Initialize async Replicate API client
+
+        Args:
+            api_key: Replicate API key
+            model: Model identifier to use for inpainting
+            result_cache: Optional cache so identical requests are only paid for once
+            upload_mode: "data_uri" or "files" (see ReplicateAPIClient)
+            backend: Where predictions run (default: the Replicate API)
+            max_concurrency: Maximum number of predictions in flight at once
+            poll_interval: Seconds between status checks of a running prediction
+        """
+        super().__init__(api_key, model=model, result_cache=result_cache,
+                         upload_mode=upload_mode, backend=backend)
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._in_flight_tasks: Dict[str, list] = {}  # request_key -> [task, callers waiting]
+
+    @property
+    def _replicate(self):
+        return self.backend.client
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _get_http(self) -> "httpx.AsyncClient":
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(60, connect=10),
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                follow_redirects=True
+            )
+        return self._http
+
+    async def create_prediction(self, input_params: Dict[str, Any], **params):
+        """Create a prediction without waiting for it"""
+        if ":" in self.model:
+            version = self.model.split(":", 1)[1]
+            return await self._replicate.predictions.async_create(version=version, input=input_params, **params)
+
+        owner, name = self.model.split("/", 1)
+        return await self._replicate.models.predictions.async_create(
+            model=(owner, name), input=input_params, **params
+        )
+
+    async def poll(self, prediction_id: str):
+        """Wait until a prediction reaches a terminal status and return it"""
+        while True:
+            prediction = await self._replicate.predictions.async_get(prediction_id)
+            if prediction.status in TERMINAL_STATUSES:
+                return prediction
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for(self, prediction):
+        """
+        Wait until a prediction completes and return it
+
+        With a webhook receiver on the backend this just awaits the
+        completion webhook, checking the prediction directly every
+        fallback_poll seconds in case a webhook was lost; otherwise it polls.
+        """
+        webhooks = self.backend.webhooks
+        if webhooks is None:
+            return await self.poll(prediction.id)
+
+        completed = asyncio.wrap_future(webhooks.watch(prediction.id))
+        try:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(asyncio.shield(completed), webhooks.fallback_poll)
+                    return self.backend.prediction_from_webhook(payload)
+                except asyncio.TimeoutError:
+                    prediction = await self._replicate.predictions.async_get(prediction.id)
+                    if prediction.status in TERMINAL_STATUSES:
+                        return prediction
+        finally:
+            webhooks.forget(prediction.id)
+
+    async def cancel(self, prediction_id: str) -> None:
+        """Cancel a running prediction"""
+        await self._replicate.predictions.async_cancel(prediction_id)
+        print(f"Cancelled prediction {prediction_id}")
+
+    async def download(self, url: str, retries: int = 3) -> Path:
+        """Stream a result to a temporary file, resuming on retry"""
+        fd, name = tempfile.mkstemp(suffix=".png", prefix="livery_")
+        os.close(fd)
+        path = Path(name)
+
+        for attempt in range(retries + 1):
+            offset = path.stat().st_size
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                async with self._get_http().stream("GET", url, headers=headers) as response:
+                    response.raise_for_status()
+                    mode = "ab" if offset and response.status_code == 206 else "wb"
+                    with open(path, mode) as f:
+                        async for chunk in response.aiter_bytes(256 * 1024):
+                            f.write(chunk)
+                return path
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+                    path.unlink(missing_ok=True)
+                    raise
+                if attempt == retries:
+                    path.unlink(missing_ok=True)
+                    raise
+                print(f"Download failed ({e}), retrying...")
+                await asyncio.sleep(min(2 ** attempt, 10))
+
+    async def generate(
+        self,
+        image: ImageInput,
+        mask: ImageInput,
+        prompt: str,
+        view: str = "",
+        negative_prompt: str = "blurry, low quality, distorted, deformed, text, words, letters",
+        num_inference_steps: int = 50,
+        guidance_scale: float = 7.5,
+        seed: Optional[int] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Optional[Image.Image]:
+        """
+        Generate inpainted image (async version of generate_inpainting)
+
+        Cancelling the awaiting task, or cancel from any thread, also
+        cancels the remote prediction.
+
+        Returns:
+            PIL Image of generated result, or None if failed
+
+        Raises:
+            Cancelled: If cancel was cancelled before the result arrived
+        """
+        if not self.is_configured:
+            raise ValueError("Replicate API key not set")
+
+        loop = asyncio.get_running_loop()
+        if cancel is None:
+            return await self._generate(loop, image, mask, prompt, view, negative_prompt,
+                                        num_inference_steps, guidance_scale, seed)
+
+        cancel.check()
+        task = asyncio.ensure_future(self._generate(loop, image, mask, prompt, view, negative_prompt,
+                                                    num_inference_steps, guidance_scale, seed))
+        unregister = cancel.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if cancel.cancelled:
+                raise Cancelled() from None
+            raise
+        finally:
+            unregister()
+
+    async def _generate(self, loop: asyncio.AbstractEventLoop, image: ImageInput, mask: ImageInput,
+                        prompt: str, view: str, negative_prompt: str, num_inference_steps: int,
+                        guidance_scale: float, seed: Optional[int]) -> Optional[Image.Image]:
+        """Body of generate: cache lookup, then a shared prediction per distinct request"""
+
+        try:
+            full_prompt = self.build_prompt(prompt, view)
+            print(f"Generating with prompt: {full_prompt}")
+
+            image_data, image_hash = await loop.run_in_executor(None, self.payload_bytes, image)
+            mask_data, mask_hash = await loop.run_in_executor(None, self.payload_bytes, mask, True)
+
+            input_params = self.build_input_params(
+                full_prompt, negative_prompt, num_inference_steps, guidance_scale, seed
+            )
+
+            request_key = self.request_key(input_params, image_hash, mask_hash)
+            cache_key = request_key if self.result_cache else None
+            if cache_key:
+                cached = await loop.run_in_executor(None, self.result_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+
+        except Exception as e:
+            print(f"Error generating image: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+        # Identical requests share one prediction (see single_flight); it is
+        # only cancelled once every caller waiting for it has been cancelled
+        flight = self._in_flight_tasks.get(request_key)
+        # A flight with no callers left was cancelled and is winding down - start a new one
+        if flight is None or flight[1] == 0:
+            task = asyncio.ensure_future(self._predict(input_params, image_data, mask_data, view, cache_key))
+            flight = self._in_flight_tasks[request_key] = [task, 0]
+            task.add_done_callback(functools.partial(self._land, request_key, flight))
+        else:
+            self.coalesced_requests += 1
+            print("Identical request already in flight - sharing its result")
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            flight[1] -= 1
+            if flight[1] == 0:
+                task.cancel()
+            raise
+
+    def _land(self, request_key: str, flight: list, task: asyncio.Task) -> None:
+        """Forget a finished flight, unless a newer one has taken its place"""
+        if self._in_flight_tasks.get(request_key) is flight:
+            del self._in_flight_tasks[request_key]
+
+    async def _predict(self, input_params: Dict[str, Any], image_data, mask_data, view: str,
+                       cache_key: Optional[str]) -> Optional[Image.Image]:
+        """Send the payloads, run the prediction and download the result"""
+        loop = asyncio.get_running_loop()
+
+        async with self._get_semaphore():
+            prediction_id = None
+            try:
+                name = view or "image"
+                input_params["image"] = await loop.run_in_executor(
+                    None, self.send_payload, image_data, f"{name}_template"
+                )
+                input_params["mask"] = await loop.run_in_executor(
+                    None, self.send_payload, mask_data, f"{name}_mask"
+                )
+
+                start_time = time.monotonic()
+                webhook_params = self.backend.webhooks.create_params() if self.backend.webhooks else {}
+                prediction = await self.create_prediction(input_params, **webhook_params)
+                prediction_id = prediction.id
+                prediction = await self.wait_for(prediction)
+                prediction_id = None
+
+                if prediction.status != "succeeded":
+                    print(f"Prediction {prediction.id} {prediction.status}: {prediction.error}")
+                    return None
+
+                output_url = self.output_url(prediction.output)
+                if output_url is None:
+                    return None
+
+                download_path = await self.download(output_url)
+                # Decode off the event loop
+                result_image = await loop.run_in_executor(
+                    None, self.load_result, download_path, cache_key, start_time
+                )
+
+                print(f"Successfully generated image: {result_image.size}")
+                return result_image
+
+            except asyncio.CancelledError:
+                if prediction_id:
+                    await asyncio.shield(self.cancel(prediction_id))
+                raise
+
+            except Exception as e:
+                print(f"Error generating image: {e}")
+                import traceback
+                traceback.print_exc()
+                return None
+
+    def submit(self, *args, **kwargs) -> Future:
+        """Schedule generate() on the shared event loop; returns a concurrent.futures.Future"""
+        return get_event_loop_thread().submit(self.generate(*args, **kwargs))
+
+    def generate_inpainting(self, *args, **kwargs) -> Optional[Image.Image]:
+        """Blocking wrapper so existing worker threads can use the async client"""
+        return self.submit(*args, **kwargs).result()
@@ -0,0 +1,538 @@
+"""
+Batch Generator - Applies one livery prompt to many vehicles at once
+"""
+import asyncio
+import dataclasses
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from template_manager import TemplateManager
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from async_api_client import AsyncReplicateAPIClient, get_event_loop_thread
+from livery_pipeline import CPU_STAGES, GenerationFailed, LiveryPipeline, PipelineStats, ViewWork
+from run_checkpoint import RunCheckpoint
+from cancellation import CancelToken
+
+
+@dataclass
+class BatchJob:
+    """A single vehicle x view unit of work"""
+    vehicle: str
+    view: str
+    template_path: Path
+    output_path: Path
+    mirrored: Optional["BatchJob"] = None  # View built by flipping this job's result instead of generating it
+
+
+@dataclass
+class BatchProgress:
+    """Aggregate progress of a batch run"""
+    total: int
+    completed: int = 0
+    failed: int = 0
+    started_at: float = 0.0
+
+    @property
+    def done(self) -> int:
+        return self.completed + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at if self.started_at else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Finished views per minute"""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.done / self.elapsed * 60
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the batch finishes, or None before the first result"""
+        if self.done == 0:
+            return None
+        return (self.total - self.done) * (self.elapsed / self.done)
+
+    def summary(self) -> str:
+        """Human readable one-line summary"""
+        text = f"{self.done}/{self.total} views ({self.failed} failed), {self.throughput:.1f} views/min"
+        if self.eta is not None and self.done < self.total:
+            minutes, seconds = divmod(int(self.eta), 60)
+            text += f", ETA {minutes}m {seconds:02d}s"
+        return text
+
+
+@dataclass
+class AtlasReport:
+    """Cost and timing of one atlas generation, next to what one call per view would cost"""
+    views: int           # Views generated by the call
+    seconds: float       # Time spent in the call (queue, run and download)
+    cost: float          # Approximate cost of the call
+    scale: float         # Resolution each view was sent at, relative to its template
+
+    @property
+    def per_view_cost(self) -> float:
+        """Approximate cost of generating the same views with one call each"""
+        return self.cost * self.views
+
+    def summary(self) -> str:
+        """Human readable one-line summary"""
+        return (f"{self.views} views in 1 call, {self.seconds:.1f}s, ~${self.cost:.3f} "
+                f"(one call per view: ~${self.per_view_cost:.3f}); sent at {self.scale:.0%} of template size")
+
+
+class BatchGenerator:
+    """Runs vehicle x view jobs through a bounded worker pool"""
+
+    def __init__(self, api_client, processor: ImageProcessor, template_manager: TemplateManager,
+                 input_cache: PreparedInputCache, output_dir: str = "output", max_in_flight: int = 4,
+                 mirror_views: bool = False, mirror_tolerance: float = 0.01, unmirror_text: bool = False,
+                 atlas_mode: bool = False, cpu_workers: int = 0,
+                 pipeline_stats: Optional[PipelineStats] = None):
+        """
+        Initialize batch generator
+
+        Args:
+            api_client: ReplicateAPIClient used for every job
+            processor: Image processor for masks and compositing
+            template_manager: Source of vehicle templates
+            input_cache: Cache of prepared templates, masks and payloads
+            output_dir: Root directory for results (output/<vehicle>/Livery_<view>.png)
+            max_in_flight: Maximum number of jobs running at the same time
+            mirror_views: Build views whose template mirrors another view
+                (Right from Left) by flipping that view's result
+            mirror_tolerance: Fraction of the masks' area allowed to differ
+                for two views to count as mirror images
+            unmirror_text: Flip lettering in mirrored views back so it reads correctly
+            atlas_mode: Generate all views of a vehicle with a single call
+                (see generate_atlas)
+            cpu_workers: Worker processes for loading, masking, resizing,
+                compositing and saving (0 = do that on the worker threads,
+                -1 = one process per CPU core)
+            pipeline_stats: Stage counters to record into, to share them
+                with other pipelines (default: the generator's own)
+        """
+        self.api_client = api_client
+        self.processor = processor
+        self.template_manager = template_manager
+        self.input_cache = input_cache
+        self.output_dir = Path(output_dir)
+        self.max_in_flight = max(1, max_in_flight)
+        self.mirror_views = mirror_views
+        self.mirror_tolerance = mirror_tolerance
+        self.unmirror_text = unmirror_text
+        self.atlas_mode = atlas_mode
+        self.cpu_workers = (os.cpu_count() or 1) if cpu_workers < 0 else cpu_workers
+        self.pipeline = LiveryPipeline(api_client, processor, input_cache, unmirror_text=unmirror_text,
+                                       stats=pipeline_stats)
+        self._cancel = CancelToken()
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._cpu_pool_lock = threading.Lock()
+
+    def build_jobs(self, vehicles: List[str], views: Optional[List[str]] = None) -> List[BatchJob]:
+        """
+        Expand vehicles into vehicle x view jobs, skipping missing templates
+
+        With mirror_views, a view that mirrors another requested view is
+        attached to that view's job (BatchJob.mirrored) instead of being
+        returned as a job of its own.
+        """
+        views = views or TemplateManager.REQUIRED_VIEWS
+        jobs = []
+
+        for vehicle in vehicles:
+            vehicle_jobs = {}
+            for view in views:
+                template_path = self.template_manager.get_template_path(vehicle, view)
+                if not template_path:
+                    print(f"Skipping {vehicle} {view}: template not found")
+                    continue
+                output_path = self.output_dir / vehicle / f"Livery_{view}.png"
+                vehicle_jobs[view] = BatchJob(vehicle, view, template_path, output_path)
+
+            if self.mirror_views:
+                mirrored = self.template_manager.find_mirrored_views(vehicle, self.processor,
+                                                                     tolerance=self.mirror_tolerance)
+                for view, source in mirrored.items():
+                    if view in vehicle_jobs and source in vehicle_jobs:
+                        vehicle_jobs[source].mirrored = vehicle_jobs.pop(view)
+
+            jobs.extend(vehicle_jobs.values())
+
+        return jobs
+
+    def cancel(self) -> None:
+        """
+        Stop the run: jobs not started yet fail as cancelled, running
+        predictions are cancelled remotely and their results are neither
+        downloaded nor composited
+        """
+        self._cancel.cancel()
+
+    def close(self) -> None:
+        """Shut down the process pool, if one was started"""
+        with self._cpu_pool_lock:
+            if self._cpu_pool is not None:
+                for stage in CPU_STAGES:
+                    self.pipeline.executors.pop(stage, None)
+                self._cpu_pool.shutdown()
+                self._cpu_pool = None
+
+    def _start_cpu_pool(self) -> None:
+        """Start the process pool for the pipeline's CPU stages, unless it is running"""
+        with self._cpu_pool_lock:
+            if self._cpu_pool is None:
+                self._cpu_pool = self.pipeline.create_process_pool(self.cpu_workers)
+                self.pipeline.executors.update(dict.fromkeys(CPU_STAGES, self._cpu_pool))
+
+    def work_for(self, job: BatchJob, prompt: str, seed: Optional[int] = None) -> ViewWork:
+        """Pipeline work item for a job"""
+        mirrored = job.mirrored and ViewWork(
+            job.mirrored.view, job.mirrored.template_path, prompt,
+            output_path=job.mirrored.output_path, label=f"{job.mirrored.vehicle} {job.mirrored.view}"
+        )
+        return ViewWork(job.view, job.template_path, prompt, seed=seed, output_path=job.output_path,
+                        label=f"{job.vehicle} {job.view}", mirrored=mirrored)
+
+    def run(self, prompt: str, vehicles: List[str], views: Optional[List[str]] = None,
+            on_progress: Optional[Callable[[BatchProgress], None]] = None,
+            on_result: Optional[Callable[[BatchJob, Optional[str]], None]] = None,
+            checkpoint: Optional[RunCheckpoint] = None,
+            cancel: Optional[CancelToken] = None) -> BatchProgress:
+        """
+        Generate every vehicle x view job and save each result as soon as it finishes
+
+        Args:
+            prompt: Livery description
+            vehicles: Vehicle names to generate
+            views: Views to generate (defaults to all five)
+            on_progress: Called with aggregate progress after every finished job
+            on_result: Called with the job and an error message (None on success)
+            checkpoint: Run record; views it lists as finished are skipped and
+                every view is recorded as soon as it is saved, so an
+                interrupted batch resumes with exactly the missing views
+            cancel: Token that stops the run (replaces the generator's own,
+                which cancel() cancels - even before the run starts)
+
+        Returns:
+            Final batch progress (of the views that still had to be generated)
+        """
+        return self.run_jobs(self.build_jobs(vehicles, views), prompt, on_progress, on_result, checkpoint, cancel)
+
+    def run_jobs(self, jobs: List[BatchJob], prompt: str,
+                 on_progress: Optional[Callable[[BatchProgress], None]] = None,
+                 on_result: Optional[Callable[[BatchJob, Optional[str]], None]] = None,
+                 checkpoint: Optional[RunCheckpoint] = None,
+                 cancel: Optional[CancelToken] = None) -> BatchProgress:
+        """Generate jobs from build_jobs; see run for the arguments"""
+        if cancel is not None:
+            self._cancel = cancel
+        if checkpoint:
+            jobs = self.pending_jobs(jobs, checkpoint)
+        total = len(jobs) + sum(1 for job in jobs if job.mirrored)
+        progress = BatchProgress(total=total, started_at=time.monotonic())
+        lock = threading.Lock()
+
+        def record(job: BatchJob, error: Optional[str]) -> None:
+            with lock:
+                if error:
+                    progress.failed += 1
+                else:
+                    progress.completed += 1
+
+            if checkpoint and not error:
+                checkpoint.mark_done(self.checkpoint_key(job), job.output_path)
+            if on_result:
+                on_result(job, error)
+            if on_progress:
+                on_progress(progress)
+
+            # The mirrored view was saved (or failed) together with its source
+            if job.mirrored:
+                record(job.mirrored, error)
+
+        if on_progress:
+            on_progress(progress)
+
+        if self.atlas_mode:
+            # One call per vehicle; all of a vehicle's views finish together
+            vehicle_jobs: Dict[str, List[BatchJob]] = {}
+            for job in jobs:
+                vehicle_jobs.setdefault(job.vehicle, []).append(job)
+            self._run_pool(self.run_atlas_jobs, list(vehicle_jobs.values()), prompt, record)
+        elif self.cpu_workers:
+            self._run_staged(jobs, prompt, record)
+        elif isinstance(self.api_client, AsyncReplicateAPIClient):
+            # One event loop drives every prediction - no thread per job
+            get_event_loop_thread().run(self._run_jobs_async(jobs, prompt, record))
+        else:
+            self._run_pool(self.run_job, jobs, prompt, record)
+
+        self.close()
+        if checkpoint and progress.failed == 0 and not self._cancel.cancelled:
+            checkpoint.finish()
+        return progress
+
+    def _run_pool(self, run_one: Callable, units: list, prompt: str,
+                  record: Callable[[BatchJob, Optional[str]], None]) -> None:
+        """Run jobs (or lists of jobs) on a bounded thread pool, recording each job as it finishes"""
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(run_one, unit, prompt): unit for unit in units}
+
+            for future in as_completed(futures):
+                error = None
+                try:
+                    future.result()
+                except Exception as e:
+                    error = str(e)
+                unit = futures[future]
+                for job in (unit if isinstance(unit, list) else [unit]):
+                    record(job, error)
+
+    def _run_staged(self, jobs: List[BatchJob], prompt: str,
+                    record: Callable[[BatchJob, Optional[str]], None]) -> None:
+        """
+        Run jobs as a pipeline of three stages connected by bounded queues
+
+        Preparing (PNG decode, masking, resizing, encoding) and finishing
+        (compositing, PNG encode) run in the process pool, so they use every
+        core instead of contending for the GIL with the API waits. The API
+        stage runs on the client's event loop, or on an I/O thread pool for
+        the blocking client. At most max_in_flight jobs are past the prepare
+        stage at once and as many prepared payloads are queued behind them,
+        so a slow stage holds back the ones before it instead of piling up
+        images in memory.
+        """
+        self._start_cpu_pool()
+        is_async = isinstance(self.api_client, AsyncReplicateAPIClient)
+        prepared: "queue.Queue[Optional[Tuple[BatchJob, Future]]]" = queue.Queue(maxsize=self.max_in_flight)
+        finished: "queue.Queue[Tuple[BatchJob, Optional[BaseException]]]" = queue.Queue()
+        slots = threading.Semaphore(self.max_in_flight)
+
+        def prepare() -> None:
+            # Stage 1: prepare ahead in the pool; blocks while the queue is full
+            for job in jobs:
+                work = self.work_for(job, prompt)
+                prepared.put((job, self.pipeline.submit(work, ["prepare"], self._cancel)))
+            prepared.put(None)
+
+        def finish(job: BatchJob, generation: Future) -> None:
+            # Stage 3: composite and save in the pool
+            try:
+                work = generation.result()
+                future = self.pipeline.submit(work, ["composite", "save"], self._cancel)
+                future.add_done_callback(lambda f: finished.put((job, f.exception())))
+            except Exception as e:
+                finished.put((job, e))
+
+        def generate(io_executor: ThreadPoolExecutor) -> None:
+            # Stage 2: start a prediction for each prepared job while a slot is free
+            for job, preparing in iter(prepared.get, None):
+                slots.acquire()
+                try:
+                    if self._cancel.cancelled:
+                        preparing.cancel()
+                        self._cancel.check()
+                    work = preparing.result()
+                    if is_async:
+                        generation = self.pipeline.submit(work, ["generate"], self._cancel)
+                    else:
+                        generation = io_executor.submit(self.pipeline.run, work, self._cancel, ["generate"])
+                    generation.add_done_callback(functools.partial(finish, job))
+                except Exception as e:
+                    finished.put((job, e))
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="batch-io") as io_executor:
+            threading.Thread(target=prepare, name="batch-prepare", daemon=True).start()
+            threading.Thread(target=generate, args=(io_executor,), name="batch-generate", daemon=True).start()
+
+            for _ in jobs:
+                job, error = finished.get()
+                slots.release()
+                record(job, str(error) if error else None)
+
+    @staticmethod
+    def checkpoint_key(job: BatchJob) -> str:
+        """Key of a job's view in a run checkpoint"""
+        return f"{job.vehicle}/{job.view}"
+
+    def pending_jobs(self, jobs: List[BatchJob], checkpoint: RunCheckpoint,
+                     key: Optional[Callable[[BatchJob], str]] = None) -> List[BatchJob]:
+        """
+        Drop the views a checkpoint lists as finished
+
+        A mirrored view whose source already finished is rebuilt from the
+        saved source right away, without another API call.
+
+        Args:
+            jobs: Jobs from build_jobs
+            checkpoint: Run record to check against
+            key: Checkpoint key of a job (default: checkpoint_key)
+        """
+        key = key or self.checkpoint_key
+        pending = []
+
+        for job in jobs:
+            mirrored = job.mirrored
+            if mirrored and checkpoint.is_done(key(mirrored)):
+                mirrored = None
+
+            if not checkpoint.is_done(key(job)):
+                pending.append(dataclasses.replace(job, mirrored=mirrored))
+            elif mirrored:
+                with Image.open(job.output_path) as source:
+                    self._save_mirrored(mirrored, source.convert("RGB"))
+                checkpoint.mark_done(key(mirrored), mirrored.output_path)
+
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} job(s) finished in an earlier run")
+        return pending
+
+    async def _run_jobs_async(self, jobs: List[BatchJob], prompt: str,
+                              record: Callable[[BatchJob, Optional[str]], None]) -> None:
+        """Run all jobs as coroutines on the event loop, max_in_flight at a time"""
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run_one(job: BatchJob) -> None:
+            async with semaphore:
+                error = None
+                try:
+                    await self._run_job_async(job, prompt)
+                except Exception as e:
+                    error = str(e)
+                record(job, error)
+
+        await asyncio.gather(*(run_one(job) for job in jobs))
+
+    async def _run_job_async(self, job: BatchJob, prompt: str, seed: Optional[int] = None) -> Path:
+        """Async version of run_job; CPU stages run in the default executor"""
+        await self.pipeline.run_async(self.work_for(job, prompt, seed), self._cancel)
+        return job.output_path
+
+    def run_job(self, job: BatchJob, prompt: str, seed: Optional[int] = None,
+                cancel: Optional[CancelToken] = None) -> Path:
+        """Generate, composite and save a single view (cancel defaults to the generator's own token)"""
+        if self.cpu_workers:
+            # The image stages go to the process pool; this thread only waits
+            self._start_cpu_pool()
+        self.pipeline.run(self.work_for(job, prompt, seed), cancel or self._cancel)
+        return job.output_path
+
+    def generate_atlas(self, vehicle: str, prompt: str, views: Optional[List[str]] = None,
+                       context: Optional[Dict[str, Image.Image]] = None, seed: Optional[int] = None
+                       ) -> Tuple[Dict[str, Image.Image], AtlasReport]:
+        """
+        Generate several views of a vehicle with one inpainting call
+
+        The templates and masks are packed into one atlas that fits the
+        model's size limits, generated in one go (one queue wait, one cold
+        start, one style), then split and composited back per view. Each
+        view is sent at a lower resolution than a call of its own would get.
+
+        Args:
+            vehicle: Vehicle name
+            prompt: Livery description
+            views: Views to generate (defaults to all five)
+            context: Finished views (e.g. the approved preview) to include
+                unpainted so the generated views match their style
+            seed: Fixed random seed (None = random)
+
+        Returns:
+            Tuple of (view -> composited image, report)
+        """
+        pieces, report = self._generate_atlas_pieces(vehicle, prompt, views, context, seed)
+        results = {}
+        for view, piece in pieces.items():
+            work = ViewWork(view, self.template_manager.get_template_path(vehicle, view), prompt,
+                            label=f"{vehicle} {view}", generated=piece, whole_template=True)
+            results[view] = self.pipeline.run(work, self._cancel, stages=["composite"]).final
+        return results, report
+
+    def run_atlas_jobs(self, jobs: List[BatchJob], prompt: str, seed: Optional[int] = None) -> AtlasReport:
+        """Generate one vehicle's jobs with a single atlas call and save each view"""
+        self._cancel.check()
+        if self.cpu_workers:
+            self._start_cpu_pool()
+
+        vehicle = jobs[0].vehicle
+        pieces, report = self._generate_atlas_pieces(vehicle, prompt, [job.view for job in jobs], seed=seed)
+        print(f"Atlas for {vehicle}: {report.summary()}")
+
+        for job in jobs:
+            work = self.work_for(job, prompt, seed)
+            work.generated, work.whole_template = pieces.pop(job.view), True
+            self.pipeline.run(work, self._cancel, stages=["composite", "save"])
+        return report
+
+    def _generate_atlas_pieces(self, vehicle: str, prompt: str, views: Optional[List[str]] = None,
+                               context: Optional[Dict[str, Image.Image]] = None, seed: Optional[int] = None
+                               ) -> Tuple[Dict[str, Image.Image], AtlasReport]:
+        """
+        Pack, generate and split an atlas (timed as the prepare and generate stages)
+
+        Returns:
+            Tuple of (view -> generated piece covering its whole template, report)
+        """
+        views = views or TemplateManager.REQUIRED_VIEWS
+        image, mask, atlas, layout = self.pipeline.measure("prepare", self._pack_atlas, vehicle, views, context or {})
+
+        start = time.monotonic()
+        generated = self.pipeline.measure("generate", self._generate_atlas, image, mask, prompt, seed)
+        self._cancel.check()
+        report = AtlasReport(views=len(views), seconds=time.monotonic() - start,
+                             cost=self.api_client.estimated_cost, scale=image.width / atlas.width)
+
+        pieces = self.processor.split_atlas(generated, atlas.size, layout)
+        return {view: pieces[view] for view in views}, report
+
+    def _pack_atlas(self, vehicle: str, views: List[str], context: Dict[str, Image.Image]):
+        """Load the templates and pack them, with any context views, into one API-ready atlas"""
+        images, masks = {}, {}
+        for view in list(views) + [v for v in context if v not in views]:
+            template_path = self.template_manager.get_template_path(vehicle, view)
+            if not template_path:
+                raise FileNotFoundError(f"{vehicle} {view} template not found")
+            if view in views:
+                images[view] = self.processor.load_template(template_path)
+                masks[view] = self.processor.create_mask(images[view])
+            else:
+                # Shown to the model as-is and left unpainted
+                images[view] = context[view]
+                masks[view] = Image.new("L", context[view].size)
+
+        settings = self.api_client.input_settings
+        atlas, atlas_mask, layout = self.processor.pack_atlas(
+            images, masks, max_size=settings["max_size"], max_pixels=settings["max_pixels"]
+        )
+        image, mask = self.processor.prepare_for_api(
+            atlas, atlas_mask, max_size=settings["max_size"], min_size=settings["min_size"],
+            max_pixels=settings["max_pixels"], multiple=settings["multiple"]
+        )
+        return image, mask, atlas, layout
+
+    def _generate_atlas(self, image: Image.Image, mask: Image.Image, prompt: str,
+                        seed: Optional[int]) -> Image.Image:
+        generated = self.api_client.generate_inpainting(image, mask, prompt, seed=seed, cancel=self._cancel)
+        if generated is None:
+            raise GenerationFailed()
+        return generated
+
+    def _save_mirrored(self, job: BatchJob, source: Image.Image) -> Image.Image:
+        """Build and save a view from its mirror image's result (composites into source)"""
+        return self.pipeline.save_mirrored(
+            ViewWork(job.view, job.template_path, "", output_path=job.output_path,
+                     label=f"{job.vehicle} {job.view}"),
+            source
+        )
@@ -0,0 +1,74 @@
+"""
+Cancellation - Cooperative cancellation of generation work
+"""
+import threading
+from typing import Callable, List, Optional
+
+
+class Cancelled(Exception):
+    """Raised by work that stopped because its CancelToken was cancelled"""
+
+    def __init__(self, message: str = "Cancelled"):
+        super().__init__(message)
+
+
+class CancelToken:
+    """
+    Shared flag telling generation work to stop.
+
+    Work checks the token between stages (check) and registers callbacks
+    for what has to happen the moment it is cancelled, such as waking a
+    thread that is polling a prediction. Cancelling is one-way; start new
+    work with a new token.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancel the work and run the registered callbacks (only the first call does anything)"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback failed: {e}")
+
+    def check(self) -> None:
+        """Raise Cancelled if the token was cancelled"""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep until cancelled or the timeout passes; True if cancelled"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Run callback when the token is cancelled (right away if it already is)
+
+        Returns:
+            Function that unregisters the callback again
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
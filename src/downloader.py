@@ -0,0 +1,105 @@
+"""
+Downloader - Shared, pooled HTTP session for fetching generated images
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from lazy_imports import lazy_import
+
+requests = lazy_import("requests")
+
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (10, 60)
+CHUNK_SIZE = 256 * 1024
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 32) -> "requests.Session":
+    """
+    Get the process-wide HTTP session.
+
+    Connections are kept alive and pooled, so downloads for every view and
+    vehicle reuse the same TCP/TLS connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def download_file(url: str, dest: Path, timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                  retries: int = 3) -> Path:
+    """
+    Stream a URL to a file, resuming partial downloads on retry
+
+    Args:
+        url: URL to download
+        dest: Destination file path
+        timeout: (connect, read) timeouts in seconds
+        retries: Number of retries after the first attempt
+
+    Returns:
+        Path to the downloaded file
+    """
+    dest = Path(dest)
+    part_path = dest.with_name(dest.name + ".part")
+    session = get_session()
+    last_error: Optional[Exception] = None
+
+    for attempt in range(retries + 1):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        try:
+            with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+                if response.status_code == 416:
+                    # Requested range is past the end - the part file is already complete
+                    break
+                response.raise_for_status()
+
+                # Server ignored the Range header - start over
+                mode = "ab" if offset and response.status_code == 206 else "wb"
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+            break
+
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            last_error = e
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code < 500:
+                raise
+            last_error = e
+
+        if attempt < retries:
+            print(f"Download failed ({last_error}), retrying...")
+            time.sleep(min(2 ** attempt, 10))
+    else:
+        part_path.unlink(missing_ok=True)
+        raise last_error
+
+    os.replace(part_path, dest)
+    return dest
+
+
+def download_to_temp(url: str, suffix: str = ".png", **kwargs) -> Path:
+    """Download a URL to a new temporary file and return its path"""
+    fd, name = tempfile.mkstemp(suffix=suffix, prefix="livery_")
+    os.close(fd)
+    try:
+        return download_file(url, Path(name), **kwargs)
+    except Exception:
+        Path(name).unlink(missing_ok=True)
+        raise
@@ -1,11 +1,16 @@
 """
 Image Processor - Handles mask generation, image loading, and compositing
 """
-import cv2
-import numpy as np
+import itertools
 from PIL import Image
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
+
+from lazy_imports import lazy_import
+
+# Imported on first use so the window can appear before OpenCV/NumPy load
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 
 class ImageProcessor:
@@ -59,7 +64,8 @@ class ImageProcessor:
         image.save(output_path, "PNG")
 
     def composite_result(self, original: Image.Image, generated: Image.Image,
-                        mask: Image.Image) -> Image.Image:
+                        mask: Image.Image, out: Optional[Image.Image] = None,
+                        box: Optional[Tuple[int, int, int, int]] = None) -> Image.Image:
         """
         Composite generated image over original template using mask.
         This ensures crisp preservation of non-painted areas.
@@ -68,29 +74,349 @@ class ImageProcessor:
             original: Original template image
             generated: AI-generated inpainted image
             mask: Mask used for inpainting (white = painted area)
+            out: Image to write the result into, reused across calls to avoid
+                a full-size allocation per view (must not be shown or kept by
+                the caller between calls); a new image is made if it doesn't
+                match the original's size and mode
+            box: Region of the original the generated image covers, when only
+                a crop was sent (see crop_to_mask); None = the whole image
 
         Returns:
-            Composited final image
+            Composited final image (out, when it was reused)
         """
-        # Ensure all images are the same size
-        if generated.size != original.size:
-            generated = generated.resize(original.size, Image.Resampling.LANCZOS)
+        size = original.size
+        left, top, right, bottom = box or (0, 0, *size)
+        region = (right - left, bottom - top)
+
+        # The generated content is resampled smoothly...
+        if generated.size != region:
+            generated = generated.resize(region, Image.Resampling.LANCZOS)
+
+        # ...but the mask stays binary: threshold to 1-bit (above 127 =
+        # painted) and resize with nearest neighbour. Pasting through a 1-bit
+        # mask copies pixels rather than alpha blending them.
+        mask = self.binary_mask(mask)
+        if mask.size != size:
+            mask = mask.resize(size, Image.Resampling.NEAREST)
+        if region != size:
+            mask = mask.crop((left, top, right, bottom))
+
+        # Where mask is white, use generated; where black, use original
+        if out is None or out.size != size or out.mode != original.mode:
+            out = original.copy()
+        else:
+            out.paste(original)
+        out.paste(generated, (left, top), mask)
+
+        return out
+
+    def mask_bbox(self, mask: Image.Image, padding: int = 32, multiple: int = 64,
+                  min_size: int = 256) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Bounding box of the paintable area, padded and snapped to model-friendly dimensions
 
-        if mask.size != original.size:
-            mask = mask.resize(original.size, Image.Resampling.LANCZOS)
+        Args:
+            mask: Inpainting mask (white = paint)
+            padding: Pixels of context kept around the painted area
+            multiple: Width and height are grown to a multiple of this
+            min_size: Minimum width and height of the box
+
+        Returns:
+            (left, top, right, bottom) inside the mask, or None if nothing is painted
+        """
+        bbox = self.binary_mask(mask).getbbox()
+        if bbox is None:
+            return None
+
+        width, height = mask.size
+        left, top, right, bottom = bbox
+
+        def snap(low: int, high: int, limit: int) -> Tuple[int, int]:
+            # Pad, then grow around the center to a multiple of `multiple`,
+            # shifting back inside the image where it would overflow
+            low, high = max(0, low - padding), min(limit, high + padding)
+            length = max(high - low, min_size)
+            length = min(limit, -(-length // multiple) * multiple)
+            low = max(0, low - (length - (high - low)) // 2)
+            high = low + length
+            if high > limit:
+                low, high = limit - length, limit
+            return low, high
+
+        left, right = snap(left, right, width)
+        top, bottom = snap(top, bottom, height)
+        return left, top, right, bottom
+
+    def crop_to_mask(self, image: Image.Image, mask: Image.Image, padding: int = 32,
+                     multiple: int = 64, min_size: int = 256
+                     ) -> Tuple[Image.Image, Image.Image, Optional[Tuple[int, int, int, int]]]:
+        """
+        Crop template and mask to the paintable area so only that region is sent
 
-        # Convert mask to binary (0 or 255)
-        mask_array = np.array(mask)
-        mask_array = (mask_array > 127).astype(np.uint8) * 255
-        mask_binary = Image.fromarray(mask_array, mode='L')
+        Args:
+            image: Template image
+            mask: Inpainting mask
+            padding: Pixels of context kept around the painted area
+            multiple: Crop width and height are multiples of this where possible
+            min_size: Minimum crop width and height
 
-        # Composite: where mask is white, use generated; where black, use original
-        result = Image.composite(generated, original, mask_binary)
+        Returns:
+            Tuple of (cropped image, cropped mask, box); box is None and the
+            inputs are returned unchanged if cropping wouldn't shrink them
+        """
+        box = self.mask_bbox(mask, padding=padding, multiple=multiple, min_size=min_size)
+        if box is None or box == (0, 0, *image.size):
+            return image, mask, None
+        return image.crop(box), mask.crop(box), box
+
+    def atlas_layout(self, sizes: Dict[str, Tuple[int, int]], max_size: int = 2048,
+                     max_pixels: Optional[int] = None, gutter: int = 64
+                     ) -> Tuple[Tuple[int, int], Dict[str, Tuple[int, int, int, int]]]:
+        """
+        Arrange several images on one canvas so they can be sent as a single request
+
+        Images are packed in rows or in columns (shelf packing). Every order
+        of the images and every row width / column height is tried, keeping
+        the layout that loses the least resolution once the canvas is scaled
+        down to max_size and max_pixels.
+
+        Args:
+            sizes: Name -> (width, height) at full resolution
+            max_size: Longest side the canvas will be scaled to fit
+            max_pixels: Pixel count the canvas will be scaled to fit (None = no limit)
+            gutter: Empty pixels between images, so painting doesn't bleed across
+
+        Returns:
+            Tuple of (canvas size, name -> (left, top, right, bottom)) at full resolution
+        """
+        def scale_of(canvas: Tuple[int, int]) -> float:
+            scale = min(1.0, max_size / max(canvas))
+            if max_pixels:
+                scale = min(scale, (max_pixels / (canvas[0] * canvas[1])) ** 0.5)
+            return scale
+
+        # Columns are rows of the transposed images
+        rows = self._shelf_pack(sizes, gutter, scale_of)
+        transposed = self._shelf_pack({name: (h, w) for name, (w, h) in sizes.items()}, gutter,
+                                      lambda canvas: scale_of(canvas[::-1]))
+        columns = (transposed[0][::-1],
+                   {name: (top, left, bottom, right) for name, (left, top, right, bottom) in transposed[1].items()})
+
+        return max(rows, columns, key=lambda layout: scale_of(layout[0]))
+
+    @staticmethod
+    def _shelf_pack(sizes: Dict[str, Tuple[int, int]], gutter: int, scale_of
+                    ) -> Tuple[Tuple[int, int], Dict[str, Tuple[int, int, int, int]]]:
+        """Best row layout by scale_of(canvas size), over every image order and row width"""
+        names = list(sizes)
+        widths = {sum(sizes[n][0] for n in subset) + gutter * (len(subset) - 1)
+                  for count in range(1, len(names) + 1) for subset in itertools.combinations(names, count)}
+        widths = sorted(w for w in widths if w >= max(width for width, _ in sizes.values()))
+        orders = itertools.permutations(names) if len(names) <= 6 else \
+            [sorted(names, key=lambda n: -sizes[n][1])]
+
+        best = None
+        for order in orders:
+            for row_width in widths:
+                boxes = {}
+                x = y = row_height = canvas_width = 0
+                for name in order:
+                    width, height = sizes[name]
+                    if x and x + width > row_width:
+                        x, y, row_height = 0, y + row_height + gutter, 0
+                    boxes[name] = (x, y, x + width, y + height)
+                    canvas_width = max(canvas_width, x + width)
+                    x += width + gutter
+                    row_height = max(row_height, height)
+                canvas = (canvas_width, y + row_height)
+
+                scale = scale_of(canvas)
+                if best is None or scale > best[0]:
+                    best = (scale, canvas, boxes)
+
+        return best[1], best[2]
+
+    def pack_atlas(self, images: Dict[str, Image.Image], masks: Dict[str, Image.Image],
+                   max_size: int = 2048, max_pixels: Optional[int] = None, gutter: int = 64
+                   ) -> Tuple[Image.Image, Image.Image, Dict[str, Tuple[int, int, int, int]]]:
+        """
+        Pack templates and their masks into one image and mask (see atlas_layout)
+
+        Args:
+            images: View -> template
+            masks: View -> mask (white = paint)
+            max_size: Longest side the atlas will be scaled to fit
+            max_pixels: Pixel count the atlas will be scaled to fit (None = no limit)
+            gutter: Preserved (black) pixels between views
+
+        Returns:
+            Tuple of (atlas image, atlas mask, view -> box in the atlas)
+        """
+        size, layout = self.atlas_layout({view: image.size for view, image in images.items()},
+                                         max_size=max_size, max_pixels=max_pixels, gutter=gutter)
+        atlas = Image.new("RGB", size)
+        atlas_mask = Image.new("L", size)
+        for view, box in layout.items():
+            atlas.paste(images[view], box[:2])
+            atlas_mask.paste(masks[view].convert("L"), box[:2])
+        return atlas, atlas_mask, layout
+
+    def split_atlas(self, generated: Image.Image, atlas_size: Tuple[int, int],
+                    layout: Dict[str, Tuple[int, int, int, int]]) -> Dict[str, Image.Image]:
+        """
+        Cut a generated atlas back into one image per view
 
-        return result
+        The pieces are at the resolution the model returned; composite_result
+        scales each one back up to its template.
+
+        Args:
+            generated: Model output for the atlas (any size with the atlas' aspect ratio)
+            atlas_size: Size of the atlas that was packed
+            layout: View -> box, as returned by pack_atlas
+        """
+        scale_x = generated.width / atlas_size[0]
+        scale_y = generated.height / atlas_size[1]
+        return {
+            view: generated.crop((round(left * scale_x), round(top * scale_y),
+                                  round(right * scale_x), round(bottom * scale_y)))
+            for view, (left, top, right, bottom) in layout.items()
+        }
+
+    def mirror_score(self, mask_a: Image.Image, mask_b: Image.Image) -> float:
+        """
+        How closely one mask is the horizontal flip of another
+
+        Returns:
+            Intersection over union of the flipped first mask and the second
+            (1.0 = exact mirror images, 0.0 = no overlap or different sizes)
+        """
+        if mask_a.size != mask_b.size:
+            return 0.0
+
+        flipped = np.asarray(self.binary_mask(mask_a).transpose(Image.Transpose.FLIP_LEFT_RIGHT))
+        other = np.asarray(self.binary_mask(mask_b))
+        union = np.count_nonzero(flipped | other)
+        if union == 0:
+            return 0.0
+        return float(np.count_nonzero(flipped & other) / union)
+
+    def is_mirror(self, mask_a: Image.Image, mask_b: Image.Image, tolerance: float = 0.01) -> bool:
+        """True if mask_b is the horizontal flip of mask_a, allowing `tolerance` of the area to differ"""
+        return self.mirror_score(mask_a, mask_b) >= 1.0 - tolerance
+
+    def mirror_view(self, source: Image.Image, template: Image.Image, mask: Image.Image,
+                    out: Optional[Image.Image] = None, unmirror_text: bool = False) -> Image.Image:
+        """
+        Build a view from the finished result of its mirror image view
+
+        The source is flipped horizontally and composited over the target
+        template through the target's own mask, so anything outside the
+        paintable area still comes from the target template.
+
+        Args:
+            source: Finished (composited) result of the mirrored view
+            template: Template of the view to build
+            mask: Mask of the view to build (white = painted area)
+            out: Buffer to composite into (see composite_result)
+            unmirror_text: Flip regions that look like lettering back so
+                they read left to right (see find_text_regions)
+
+        Returns:
+            Composited view
+        """
+        flipped = source.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        if flipped.size != template.size:
+            flipped = flipped.resize(template.size, Image.Resampling.LANCZOS)
+
+        if unmirror_text:
+            flipped = self.unmirror_regions(flipped, mask, self.find_text_regions(flipped, mask))
+
+        return self.composite_result(template, flipped, mask, out=out)
+
+    def find_text_regions(self, image: Image.Image, mask: Image.Image,
+                          min_height: int = 12) -> List[Tuple[int, int, int, int]]:
+        """
+        Find lines of lettering (unit numbers, department names) inside the painted area
+
+        A heuristic, not OCR: dense clusters of short high-contrast strokes
+        are joined into horizontal runs and kept if they are wide, not too
+        tall and lie inside the mask. Stripes and large graphics are
+        usually rejected, but small logos can be picked up as text.
+
+        Args:
+            image: Livery image
+            mask: Painted area (white = paint), same size as image
+            min_height: Smallest text line height in pixels
+
+        Returns:
+            List of (left, top, right, bottom) boxes
+        """
+        gray = np.asarray(image.convert("L"))
+        paint = np.asarray(self.binary_mask(mask).resize(image.size, Image.Resampling.NEAREST))
+
+        # Stroke edges; ignore the body outline by eroding the mask first
+        edges = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+        _, edges = cv2.threshold(edges, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        inside = cv2.erode(paint.astype(np.uint8), np.ones((9, 9), np.uint8))
+        edges[inside == 0] = 0
+
+        # Join characters into words and lines
+        gap = max(9, image.height // 100)
+        joined = cv2.morphologyEx(edges, cv2.MORPH_CLOSE,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (gap * 2, gap // 2 + 1)))
+        contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = []
+        max_height = image.height // 4
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if not (min_height <= h <= max_height and w >= 2 * h):
+                continue
+            # Lettering fills part of its box; solid shapes and sparse noise don't
+            density = np.count_nonzero(edges[y:y + h, x:x + w]) / (w * h)
+            if 0.1 <= density <= 0.6 and inside[y:y + h, x:x + w].mean() > 0.9:
+                boxes.append((x, y, x + w, y + h))
+
+        # Merge words on the same line so a line is flipped as a whole
+        # (flipping words one by one would reverse their order)
+        lines: List[List[int]] = []
+        for left, top, right, bottom in sorted(boxes):
+            for line in lines:
+                overlap = min(bottom, line[3]) - max(top, line[1])
+                if overlap > (bottom - top) // 2 and left - line[2] < (bottom - top) * 2:
+                    line[:] = [line[0], min(top, line[1]), max(right, line[2]), max(bottom, line[3])]
+                    break
+            else:
+                lines.append([left, top, right, bottom])
+        return [tuple(line) for line in lines]
+
+    def unmirror_regions(self, image: Image.Image, mask: Image.Image,
+                         boxes: List[Tuple[int, int, int, int]]) -> Image.Image:
+        """Flip each box back horizontally in place, only where the mask is painted"""
+        if not boxes:
+            return image
+
+        image = image.copy()
+        paint = self.binary_mask(mask)
+        if paint.size != image.size:
+            paint = paint.resize(image.size, Image.Resampling.NEAREST)
+        for box in boxes:
+            region = image.crop(box).transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            image.paste(region, box[:2], paint.crop(box))
+        return image
+
+    @staticmethod
+    def binary_mask(mask: Image.Image) -> Image.Image:
+        """Threshold a mask to 1-bit (pixels above 127 become white)"""
+        if mask.mode == "1":
+            return mask
+        if mask.mode != "L":
+            mask = mask.convert("L")
+        return mask.convert("1", dither=Image.Dither.NONE)
 
     def prepare_for_api(self, image: Image.Image, mask: Image.Image,
-                       max_size: int = 4096, min_size: int = 256) -> Tuple[Image.Image, Image.Image]:
+                       max_size: int = 4096, min_size: int = 256,
+                       max_pixels: Optional[int] = None, multiple: int = 1) -> Tuple[Image.Image, Image.Image]:
         """
         Prepare image and mask for API submission by resizing if needed.
         Some APIs have size limits and minimum requirements.
@@ -100,39 +426,42 @@ class ImageProcessor:
             mask: Inpainting mask
             max_size: Maximum dimension size
             min_size: Minimum dimension size (for FLUX and other models)
+            max_pixels: Downscale to at most this many pixels (the resolution
+                the model actually works at); None = no limit
+            multiple: Round width and height to a multiple of this
 
         Returns:
             Tuple of (resized_image, resized_mask)
         """
         width, height = image.size
 
-        # Check if resizing is needed
-        if max(width, height) > max_size:
-            # Calculate new dimensions maintaining aspect ratio
-            if width > height:
-                new_width = max_size
-                new_height = int(height * (max_size / width))
-            else:
-                new_height = max_size
-                new_width = int(width * (max_size / height))
-
-            # Ensure minimum size is met
-            if new_width < min_size:
-                scale = min_size / new_width
-                new_width = min_size
-                new_height = int(new_height * scale)
-            if new_height < min_size:
-                scale = min_size / new_height
-                new_height = min_size
-                new_width = int(new_width * scale)
-
-            # Resize both image and mask
-            image_resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            mask_resized = mask.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            return image_resized, mask_resized
-
-        return image, mask
+        # Scale down (never up) to fit the longest side and pixel budget,
+        # keeping the aspect ratio
+        scale = min(1.0, max_size / max(width, height))
+        if max_pixels:
+            scale = min(scale, (max_pixels / (width * height)) ** 0.5)
+        new_width, new_height = round(width * scale), round(height * scale)
+
+        # Ensure minimum size is met
+        if min(new_width, new_height) < min_size:
+            grow = min_size / min(new_width, new_height)
+            new_width = min(max_size, round(new_width * grow))
+            new_height = min(max_size, round(new_height * grow))
+
+        # Snap to the model's dimension multiple
+        if multiple > 1:
+            limit = max(multiple, max_size // multiple * multiple)
+            new_width = min(limit, max(multiple, round(new_width / multiple) * multiple))
+            new_height = min(limit, max(multiple, round(new_height / multiple) * multiple))
+
+        if (new_width, new_height) == (width, height):
+            return image, mask
+
+        # Resize both image and mask
+        image_resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        mask_resized = mask.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+        return image_resized, mask_resized
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+"""
+Inference Backend - Where ReplicateAPIClient sends its predictions
+"""
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from lazy_imports import lazy_import
+from uploader import FILES_ENDPOINT
+from cancellation import CancelToken, Cancelled
+
+if TYPE_CHECKING:
+    from webhook_receiver import WebhookReceiver
+
+replicate = lazy_import("replicate")
+
+TERMINAL_STATUSES = ("succeeded", "failed", "canceled")
+
+
+class InferenceBackend(ABC):
+    """
+    Interface between the API clients and an inference service.
+
+    Backends expose a replicate.Client for the prediction endpoints (the
+    async client creates, polls and cancels predictions through it) and a
+    blocking run() used by ReplicateAPIClient.
+    """
+
+    name = "base"
+    requires_api_key = True
+    # WebhookReceiver that predictions report completion to (None = poll)
+    webhooks: Optional["WebhookReceiver"] = None
+
+    @property
+    @abstractmethod
+    def client(self) -> "replicate.Client":
+        """replicate.Client for the prediction endpoints"""
+
+    @property
+    @abstractmethod
+    def files_endpoint(self) -> str:
+        """Files API endpoint used in "files" upload mode"""
+
+    def run(self, model: str, input_params: Dict[str, Any], cancel: Optional[CancelToken] = None) -> Any:
+        """
+        Run a model and block until its output is ready
+
+        With a cancel token the prediction is polled here rather than by
+        replicate.run, so cancelling stops the wait right away and cancels
+        the remote prediction (which stops it being billed). With a
+        webhook receiver the completion is pushed instead of polled.
+        """
+        if cancel is None and self.webhooks is None:
+            return self.client.run(model, input=input_params)
+
+        cancel = cancel or CancelToken()
+        cancel.check()
+        if self.webhooks is not None:
+            prediction = self.create_prediction(model, input_params, **self.webhooks.create_params())
+            prediction = self.wait_for_webhook(prediction, cancel)
+        else:
+            prediction = self.create_prediction(model, input_params)
+            # Wake up straight away on cancel instead of after the next poll
+            while prediction.status not in TERMINAL_STATUSES and not cancel.wait(self.client.poll_interval):
+                prediction.reload()
+
+        if prediction.status not in TERMINAL_STATUSES:
+            try:
+                prediction.cancel()
+                print(f"Cancelled prediction {prediction.id}")
+            except Exception as e:
+                print(f"Could not cancel prediction {prediction.id}: {e}")
+            raise Cancelled()
+
+        if prediction.status == "failed":
+            raise replicate.exceptions.ModelError(prediction.error)
+        if prediction.status == "canceled":
+            raise Cancelled(f"Prediction {prediction.id} was cancelled")
+        return prediction.output
+
+    def wait_for_webhook(self, prediction, cancel: CancelToken):
+        """
+        Block until the prediction's completion webhook arrives or cancel is cancelled
+
+        Checks the prediction directly every webhooks.fallback_poll seconds
+        in case a webhook was lost. Returns the prediction, which is still
+        running if the wait was cancelled.
+        """
+        completed = self.webhooks.watch(prediction.id)
+        woken = threading.Event()
+        completed.add_done_callback(lambda _: woken.set())
+        stop_waiting = cancel.on_cancel(woken.set)
+        try:
+            while not completed.done() and not cancel.cancelled:
+                if not woken.wait(self.webhooks.fallback_poll):
+                    prediction.reload()
+                    if prediction.status in TERMINAL_STATUSES:
+                        return prediction
+        finally:
+            stop_waiting()
+            self.webhooks.forget(prediction.id)
+
+        if completed.done():
+            return self.prediction_from_webhook(completed.result())
+        return prediction
+
+    def prediction_from_webhook(self, payload: Dict[str, Any]) -> "replicate.prediction.Prediction":
+        """Prediction object from a webhook's prediction JSON"""
+        prediction = replicate.prediction.Prediction(**payload)
+        prediction._client = self.client
+        return prediction
+
+    def create_prediction(self, model: str, input_params: Dict[str, Any], **params):
+        """Create a prediction without waiting for it ("owner/name" or "owner/name:version")"""
+        if ":" in model:
+            return self.client.predictions.create(version=model.split(":", 1)[1], input=input_params, **params)
+        owner, name = model.split("/", 1)
+        return self.client.models.predictions.create(model=(owner, name), input=input_params, **params)
+
+    def close(self) -> None:
+        """Release anything the backend started"""
+
+
+class ReplicateBackend(InferenceBackend):
+    """The Replicate API, or any server that speaks its HTTP API"""
+
+    name = "replicate"
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        """
+        Initialize Replicate backend
+
+        Args:
+            api_key: Replicate API key
+            base_url: API root to use instead of https://api.replicate.com
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._client: Optional["replicate.Client"] = None
+
+    @property
+    def client(self) -> "replicate.Client":
+        # Created on first use so constructing a backend doesn't import replicate
+        if self._client is None:
+            self._client = replicate.Client(api_token=self.api_key or None, base_url=self.base_url)
+        return self._client
+
+    @property
+    def files_endpoint(self) -> str:
+        return f"{self.base_url}/v1/files" if self.base_url else FILES_ENDPOINT
+
+
+class MockBackend(ReplicateBackend):
+    """
+    Replicate backend pointed at an in-process MockReplicateServer.
+
+    Nothing leaves the machine and nothing is billed; latency, failures and
+    outputs come from the mock server's settings.
+    """
+
+    name = "mock"
+    requires_api_key = False
+
+    def __init__(self, latency: str = "lognormal:8,0.4", error_rate: float = 0.0,
+                 http_error_rate: float = 0.0, output_image: Optional[str] = None,
+                 seed: Optional[int] = None):
+        """
+        Start a mock server and connect to it
+
+        Args:
+            latency: Latency distribution spec (see mock_replicate.LatencyDistribution)
+            error_rate: Fraction of predictions that fail
+            http_error_rate: Fraction of create requests rejected with HTTP 503
+            output_image: Image file returned by every prediction
+            seed: Random seed for reproducible runs
+        """
+        from mock_replicate import MockReplicateServer
+
+        self.server = MockReplicateServer(
+            latency=latency, error_rate=error_rate, http_error_rate=http_error_rate,
+            output_image=output_image, seed=seed
+        ).start()
+        super().__init__("mock", base_url=self.server.base_url)
+
+    def close(self) -> None:
+        self.server.stop()
+
+
+_mock_backend: Optional[MockBackend] = None
+_mock_lock = threading.Lock()
+
+
+def create_backend(config: dict, api_key: str) -> InferenceBackend:
+    """
+    Create the backend selected in config.json
+
+    "inference_backend" is "replicate" (default) or "mock". The mock backend
+    reads its settings from "mock_backend" ({"latency", "error_rate",
+    "http_error_rate", "output_image", "seed"}) and is shared by every
+    client in the process. "replicate_base_url" points the Replicate
+    backend at another server, such as a standalone mock_replicate.py.
+
+    "completion" is "poll" (default) or "webhook". In webhook mode
+    predictions report completion to a WebhookReceiver configured by
+    "webhook_receiver" (see webhook_receiver.get_webhook_receiver); the
+    real Replicate API needs its "public_url" to be reachable from the
+    internet.
+    """
+    global _mock_backend
+    if config.get("inference_backend", "replicate") == "mock":
+        with _mock_lock:
+            if _mock_backend is None:
+                _mock_backend = MockBackend(**config.get("mock_backend", {}))
+            backend = _mock_backend
+    else:
+        backend = ReplicateBackend(api_key, base_url=config.get("replicate_base_url"))
+
+    if config.get("completion", "poll") == "webhook":
+        settings = config.get("webhook_receiver", {})
+        if backend.name == "replicate" and not backend.base_url and not settings.get("public_url"):
+            print("Webhook completion needs webhook_receiver.public_url to be reachable "
+                  "from Replicate - polling instead")
+        else:
+            from webhook_receiver import get_webhook_receiver
+            backend.webhooks = get_webhook_receiver(settings)
+    return backend
@@ -0,0 +1,271 @@
+"""
+Input Cache - Caches prepared templates, masks and encoded API payloads
+"""
+import hashlib
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from image_processor import ImageProcessor
+from api_client import ReplicateAPIClient
+
+
+class PreparedInput:
+    """Everything needed to submit and composite one template"""
+
+    def __init__(self, key: str, template_path: Path, processor: ImageProcessor,
+                 image_png: bytes, mask_png: bytes,
+                 template: Optional[Image.Image] = None, mask: Optional[Image.Image] = None,
+                 mask_path: Optional[Path] = None, crop_box: Optional[Tuple[int, int, int, int]] = None):
+        self.key = key
+        self.template_path = template_path
+        self.image_png = image_png  # Prepared template, PNG encoded
+        self.mask_png = mask_png    # Prepared mask with model polarity, PNG encoded
+        self.crop_box = crop_box    # Region of the template the payloads cover (None = all of it)
+        self._processor = processor
+        self._template = template
+        self._mask = mask
+        self._mask_path = mask_path
+
+    @property
+    def template(self) -> Image.Image:
+        """Full-size template (loaded on first use for disk hits)"""
+        if self._template is None:
+            self._template = self._processor.load_template(self.template_path)
+        return self._template
+
+    @property
+    def mask(self) -> Image.Image:
+        """Full-size mask, white = paint (loaded on first use for disk hits)"""
+        if self._mask is None:
+            self._mask = Image.open(self._mask_path).convert("L")
+        return self._mask
+
+
+class PreparedInputCache:
+    """
+    Content-addressed cache of prepared inputs.
+
+    Entries are keyed by template file hash, mask tolerance, target size,
+    mask polarity and crop settings. Recently used entries are kept in
+    memory; all entries are persisted under cache_dir and evicted
+    least-recently-used first.
+    """
+
+    def __init__(self, processor: ImageProcessor, cache_dir: str = "cache/prepared",
+                 max_memory_entries: int = 10, max_disk_bytes: int = 500 * 1024 * 1024,
+                 crop_padding: Optional[int] = None):
+        """
+        Initialize input cache
+
+        Args:
+            processor: Image processor used on cache misses
+            cache_dir: Directory for on-disk entries
+            max_memory_entries: Number of entries kept in memory
+            max_disk_bytes: Size limit for on-disk entries
+            crop_padding: Crop payloads to the mask's bounding box plus this
+                many pixels of context (None = send the whole template)
+        """
+        self.processor = processor
+        self.crop_padding = crop_padding
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, PreparedInput]" = OrderedDict()
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path: Path) -> str:
+        """SHA-256 of a file, memoized by path, mtime and size"""
+        stat = path.stat()
+        cached = self._hashes.get(str(path))
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        self._hashes[str(path)] = (stat.st_mtime_ns, stat.st_size, file_hash)
+        return file_hash
+
+    def make_key(self, template_path: Path, tolerance: int, max_size: int, min_size: int,
+                 max_pixels: Optional[int], multiple: int, invert_mask: bool) -> str:
+        """Build the cache key for a template and preparation settings"""
+        parts = [
+            self.file_hash(Path(template_path)),
+            f"tol={tolerance}",
+            f"size={min_size}-{max_size}",
+            f"pixels={max_pixels}",
+            f"multiple={multiple}",
+            f"invert={int(invert_mask)}",
+            f"crop={self.crop_padding}",
+        ]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+    def get(self, template_path: Path, tolerance: int = 30, max_size: int = 4096,
+            min_size: int = 256, max_pixels: Optional[int] = None, multiple: int = 1,
+            invert_mask: bool = False) -> PreparedInput:
+        """
+        Get prepared input for a template, building it on a miss
+
+        Args:
+            template_path: Path to the template PNG
+            tolerance: Mask color tolerance
+            max_size: Maximum dimension sent to the API
+            min_size: Minimum dimension sent to the API
+            max_pixels: Maximum pixel count sent to the API (None = no limit)
+            multiple: Round payload dimensions to a multiple of this
+            invert_mask: Encode the mask with inverted polarity (Ideogram)
+
+        Most callers pass ReplicateAPIClient.input_settings, which fills in
+        everything but tolerance from the model registry.
+
+        Returns:
+            PreparedInput with ready-to-send PNG payloads
+        """
+        template_path = Path(template_path)
+        key = self.make_key(template_path, tolerance, max_size, min_size, max_pixels, multiple, invert_mask)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        entry = self._load_from_disk(key, template_path)
+        if entry is None:
+            entry = self._build(key, template_path, tolerance, max_size, min_size,
+                                max_pixels, multiple, invert_mask)
+
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+        return entry
+
+    def invalidate(self, template_path: Path) -> None:
+        """Drop all cached entries built from a template file"""
+        template_path = Path(template_path)
+        self._hashes.pop(str(template_path), None)
+
+        with self._lock:
+            for key in [k for k, e in self._memory.items() if e.template_path == template_path]:
+                del self._memory[key]
+
+        if not self.cache_dir.exists():
+            return
+        for entry_dir in self.cache_dir.iterdir():
+            meta_path = entry_dir / "meta.json"
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if Path(meta.get("template_path", "")) == template_path:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def clear(self) -> None:
+        """Remove all cached entries"""
+        with self._lock:
+            self._memory.clear()
+        self._hashes.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _build(self, key: str, template_path: Path, tolerance: int, max_size: int, min_size: int,
+               max_pixels: Optional[int], multiple: int, invert_mask: bool) -> PreparedInput:
+        """Run the full preparation pipeline and persist the result"""
+        template = self.processor.load_template(template_path)
+        mask = self.processor.create_mask(template, tolerance=tolerance)
+
+        # Optionally send only the paintable region
+        api_template, api_mask, crop_box = template, mask, None
+        if self.crop_padding is not None:
+            api_template, api_mask, crop_box = self.processor.crop_to_mask(
+                template, mask, padding=self.crop_padding, min_size=min_size
+            )
+
+        template_resized, mask_resized = self.processor.prepare_for_api(
+            api_template, api_mask, max_size=max_size, min_size=min_size,
+            max_pixels=max_pixels, multiple=multiple
+        )
+
+        image_png = ReplicateAPIClient.image_to_png(template_resized)
+        mask_png = ReplicateAPIClient.mask_to_png(mask_resized, invert=invert_mask)
+
+        entry = PreparedInput(key, template_path, self.processor, image_png, mask_png,
+                              template=template, mask=mask, crop_box=crop_box)
+        self._save_to_disk(entry, mask)
+        return entry
+
+    def _save_to_disk(self, entry: PreparedInput, mask: Image.Image) -> None:
+        """Write an entry to disk (best effort)"""
+        entry_dir = self.cache_dir / entry.key
+        try:
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            mask.save(entry_dir / "mask.png", "PNG")
+            (entry_dir / "payload_image.png").write_bytes(entry.image_png)
+            (entry_dir / "payload_mask.png").write_bytes(entry.mask_png)
+            with open(entry_dir / "meta.json", "w") as f:
+                json.dump({"template_path": str(entry.template_path), "crop_box": entry.crop_box}, f)
+        except OSError as e:
+            print(f"Could not write input cache entry: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        self._evict_disk()
+
+    def _load_from_disk(self, key: str, template_path: Path) -> Optional[PreparedInput]:
+        """Load an entry from disk, or None if it is missing or incomplete"""
+        entry_dir = self.cache_dir / key
+        try:
+            image_png = (entry_dir / "payload_image.png").read_bytes()
+            mask_png = (entry_dir / "payload_mask.png").read_bytes()
+        except OSError:
+            return None
+
+        if not (entry_dir / "mask.png").exists():
+            return None
+
+        try:
+            with open(entry_dir / "meta.json") as f:
+                crop_box = json.load(f).get("crop_box")
+        except (OSError, ValueError):
+            return None
+
+        # Touch the entry so disk eviction is least-recently-used
+        entry_dir.touch()
+        return PreparedInput(key, template_path, self.processor, image_png, mask_png,
+                             mask_path=entry_dir / "mask.png",
+                             crop_box=tuple(crop_box) if crop_box else None)
+
+    def _evict_disk(self) -> None:
+        """Remove least recently used disk entries until under max_disk_bytes"""
+        entries = []
+        total = 0
+        for entry_dir in self.cache_dir.iterdir():
+            try:
+                if not entry_dir.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+                mtime = entry_dir.stat().st_mtime
+            except OSError:
+                # Removed (or being replaced) by another process or thread meanwhile
+                continue
+            entries.append((mtime, size, entry_dir))
+            total += size
+
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total <= self.max_disk_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
@@ -0,0 +1,151 @@
+"""
+Lazy Imports - Deferred loading of heavy modules and startup import profiling
+"""
+import builtins
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+# Modules that are only needed once generation starts; imported after the
+# window is up (see preload)
+HEAVY_MODULES = ("numpy", "cv2", "requests", "httpx", "replicate")
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Use for modules that are only needed once work starts:
+
+        cv2 = lazy_import("cv2")
+        ...
+        cv2.cvtColor(...)  # cv2 is imported here
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a module proxy that imports `name` on first use"""
+    return LazyModule(name)
+
+
+def preload(modules: Iterable[str] = HEAVY_MODULES,
+            on_done: Optional[Callable[[float], None]] = None) -> threading.Thread:
+    """
+    Import modules on a background thread so the first generation doesn't pay for them
+
+    Args:
+        modules: Module names to import
+        on_done: Called with the elapsed seconds once everything is imported
+
+    Returns:
+        The started thread
+    """
+    def run():
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"Preloading {name} failed: {e}")
+        if on_done:
+            on_done(time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+class ImportProfiler:
+    """
+    Records how long each newly imported module takes, like python -X importtime.
+
+    Wraps builtins.__import__ while installed. Times are recorded per module
+    as cumulative (including the modules it imports) and self time.
+    """
+
+    def __init__(self):
+        self.records: Dict[str, List[float]] = {}  # name -> [self, cumulative]
+        self._original_import = builtins.__import__
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self) -> "ImportProfiler":
+        builtins.__import__ = self._import
+        return self
+
+    def uninstall(self) -> None:
+        builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        try:
+            package = (globals or {}).get("__package__") if level else None
+            resolved = importlib.util.resolve_name("." * level + name, package) if level else name
+        except (ImportError, ValueError):
+            resolved = name
+
+        targets = [resolved] + [f"{resolved}.{f}" for f in (fromlist or ()) if f != "*"]
+        new = [t for t in targets if t and t not in sys.modules]
+        if not new:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # Time spent in nested imports
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+
+            loaded = [t for t in new if t in sys.modules]
+            if loaded:
+                with self._lock:
+                    record = self.records.setdefault(loaded[0], [0.0, 0.0])
+                    record[0] += cumulative - nested
+                    record[1] += cumulative
+
+    @property
+    def total_seconds(self) -> float:
+        """Total time spent importing (sum of self times)"""
+        return sum(r[0] for r in self.records.values())
+
+    def report(self, first_window_seconds: float, budget_seconds: float, top: int = 15) -> str:
+        """Human readable report of the slowest imports and the time-to-first-window budget"""
+        verdict = "OK" if first_window_seconds <= budget_seconds else "OVER BUDGET"
+        lines = [
+            "Startup profile",
+            f"  Time to first window: {first_window_seconds * 1000:.0f} ms "
+            f"(budget {budget_seconds * 1000:.0f} ms) {verdict}",
+            f"  Imports before first window: {self.total_seconds * 1000:.0f} ms "
+            f"across {len(self.records)} modules",
+            "",
+            f"  {'cumulative':>10}  {'self':>8}  module",
+        ]
+        slowest = sorted(self.records.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (self_time, cumulative) in slowest:
+            lines.append(f"  {cumulative * 1000:>7.1f} ms  {self_time * 1000:>5.1f} ms  {name}")
+        return "\n".join(lines)
@@ -4,14 +4,14 @@ Livery Generator Window - Main GUI for the application
 import sys
 import json
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QComboBox,
     QTextEdit, QProgressBar, QMessageBox, QScrollArea,
     QCheckBox, QGroupBox, QGridLayout
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QPixmap, QImage
 from PIL import Image
 import io
@@ -19,75 +19,140 @@ import io
 from template_manager import TemplateManager
 from image_processor import ImageProcessor
 from api_client import ReplicateAPIClient
+from async_api_client import AsyncReplicateAPIClient
+from inference_backend import create_backend
+from batch_generator import AtlasReport, BatchGenerator, BatchJob, BatchProgress
+from input_cache import PreparedInputCache
+from result_cache import ResultCache
+from run_checkpoint import RunCheckpoint
+from livery_pipeline import STAGE_LABELS, GenerationFailed, LiveryPipeline, ViewWork
+from cancellation import CancelToken, Cancelled
+from template_watcher import TemplateWatcher
 
 
 class GenerationWorker(QThread):
-    """Worker thread for image generation"""
+    """Worker thread running one view through the generation pipeline"""
     progress = pyqtSignal(str)
     finished = pyqtSignal(object)  # Emits generated image or None
     error = pyqtSignal(str)
 
-    def __init__(self, api_client, processor, template_path, prompt, view):
+    def __init__(self, pipeline: LiveryPipeline, template_path, prompt, view,
+                 cancel: Optional[CancelToken] = None):
         super().__init__()
-        self.api_client = api_client
-        self.processor = processor
+        self.pipeline = pipeline
         self.template_path = template_path
         self.prompt = prompt
         self.view = view
+        self.cancel = cancel or CancelToken()
 
     def run(self):
         try:
-            self.progress.emit(f"Loading template ({self.view})...")
+            work = self.pipeline.run(
+                ViewWork(self.view, self.template_path, self.prompt),
+                self.cancel,
+                on_stage=lambda stage: self.progress.emit(f"{STAGE_LABELS[stage]} ({self.view})...")
+            )
+            self.progress.emit(f"Complete ({self.view})!")
+            self.finished.emit(work.final)
 
-            # Load template
-            template = self.processor.load_template(self.template_path)
+        except Cancelled:
+            # Whoever cancelled has already moved on - nothing to report
+            pass
 
-            self.progress.emit(f"Creating mask ({self.view})...")
+        except GenerationFailed as e:
+            self.error.emit(str(e))
+            self.finished.emit(None)
 
-            # Generate mask
-            mask = self.processor.create_mask(template)
+        except Exception as e:
+            self.error.emit(f"Error: {str(e)}")
+            self.finished.emit(None)
 
-            self.progress.emit(f"Preparing images ({self.view})...")
 
-            # Prepare for API (resize if needed)
-            template_resized, mask_resized = self.processor.prepare_for_api(template, mask)
+class AtlasWorker(QThread):
+    """Worker thread generating several views with a single atlas call"""
+    finished = pyqtSignal(object, object)  # Emits view -> image dict and AtlasReport (None, None on failure)
+    error = pyqtSignal(str)
 
-            self.progress.emit(f"Generating livery ({self.view})...")
+    def __init__(self, generator: BatchGenerator, vehicle: str, prompt: str, views: List[str],
+                 context: Dict[str, Image.Image]):
+        super().__init__()
+        self.generator = generator
+        self.vehicle = vehicle
+        self.prompt = prompt
+        self.views = views
+        self.context = context
 
-            # Generate with API
-            generated = self.api_client.generate_inpainting(
-                template_resized,
-                mask_resized,
-                self.prompt,
-                self.view
-            )
+    def run(self):
+        try:
+            results, report = self.generator.generate_atlas(self.vehicle, self.prompt, self.views,
+                                                            context=self.context)
+            self.finished.emit(results, report)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.error.emit(f"Error: {str(e)}")
+            self.finished.emit(None, None)
 
-            if generated is None:
-                self.error.emit("Generation failed - check API key and connection")
-                self.finished.emit(None)
-                return
 
-            self.progress.emit(f"Compositing result ({self.view})...")
+class MirrorWorker(QThread):
+    """Worker thread building the views that mirror an already generated view"""
+    finished = pyqtSignal(object)  # Emits view -> image dict (empty on failure)
 
-            # Resize generated back to original size if needed
-            if generated.size != template.size:
-                generated = generated.resize(template.size, Image.Resampling.LANCZOS)
-                mask = mask.resize(template.size, Image.Resampling.LANCZOS)
+    def __init__(self, pipeline: LiveryPipeline, template_manager: TemplateManager, vehicle: str,
+                 finished_views: Dict[str, Image.Image], tolerance: float, cancel: CancelToken):
+        super().__init__()
+        self.pipeline = pipeline
+        self.template_manager = template_manager
+        self.vehicle = vehicle
+        self.finished_views = finished_views
+        self.tolerance = tolerance
+        self.cancel = cancel
 
-            # Composite result
-            final = self.processor.composite_result(template, generated, mask)
+    def run(self):
+        try:
+            self.finished.emit(self.pipeline.mirror_views(self.template_manager, self.vehicle, self.finished_views,
+                                                          tolerance=self.tolerance, cancel=self.cancel))
+        except Cancelled:
+            pass
+        except Exception as e:
+            # Mirroring only saves calls - generate the views instead
+            print(f"Could not mirror views: {e}")
+            self.finished.emit({})
 
-            self.progress.emit(f"Complete ({self.view})!")
-            self.finished.emit(final)
 
-        except Exception as e:
-            self.error.emit(f"Error: {str(e)}")
-            self.finished.emit(None)
+class BatchWorker(QThread):
+    """Worker thread driving a multi-vehicle batch run"""
+    progress = pyqtSignal(object)  # Emits BatchProgress
+    result = pyqtSignal(str, str, str)  # vehicle, view, error message ("" on success)
+    finished = pyqtSignal(object)  # Emits final BatchProgress
+
+    def __init__(self, generator: BatchGenerator, prompt: str, vehicles: List[str],
+                 checkpoint: Optional[RunCheckpoint] = None):
+        super().__init__()
+        self.generator = generator
+        self.prompt = prompt
+        self.vehicles = vehicles
+        self.checkpoint = checkpoint
+
+    def run(self):
+        progress = self.generator.run(
+            self.prompt,
+            self.vehicles,
+            on_progress=self.progress.emit,
+            on_result=self.on_result,
+            checkpoint=self.checkpoint
+        )
+        self.finished.emit(progress)
+
+    def on_result(self, job: BatchJob, error: Optional[str]):
+        self.result.emit(job.vehicle, job.view, error or "")
 
 
 class LiveryGeneratorWindow(QMainWindow):
     """Main window for livery generation"""
 
+    templates_changed = pyqtSignal(object)  # Emits the template watcher's list of TemplateChange
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("ER:LC Livery Maker")
@@ -99,21 +164,65 @@ class LiveryGeneratorWindow(QMainWindow):
         # Initialize components
         self.template_manager = TemplateManager(self.config["templates_directory"])
         self.processor = ImageProcessor()
+        self.input_cache = PreparedInputCache(
+            self.processor,
+            cache_dir=str(Path(self.config.get("cache_directory", "cache")) / "prepared"),
+            crop_padding=self.config.get("crop_padding", 32) if self.config.get("crop_to_mask") else None
+        )
+        self.result_cache = ResultCache(
+            cache_dir=str(Path(self.config.get("cache_directory", "cache")) / "results"),
+            max_bytes=int(self.config.get("result_cache_mb", 1024)) * 1024 * 1024
+        )
         self.api_client = None
+        # Shared by every preview and "Generate All" view, so its stats cover the session
+        self.pipeline = LiveryPipeline(None, self.processor, self.input_cache,
+                                       unmirror_text=bool(self.config.get("unmirror_text", False)))
+        self.runs_dir = Path(self.config.get("cache_directory", "cache")) / "runs"
 
         # State
         self.current_vehicle: Optional[str] = None
         self.current_prompt: str = ""
         self.preview_image: Optional[Image.Image] = None
         self.generated_views: Dict[str, Image.Image] = {}
+        self.run: Optional[RunCheckpoint] = None  # Checkpoint of the current livery's finished views
         self.worker: Optional[GenerationWorker] = None
+        self.cancel_token: Optional[CancelToken] = None  # Cancels the preview / "Generate All" in progress
+        self.abandoned_workers: List[QThread] = []  # Cancelled workers still winding down
+
+        # Concurrent "Generate All Views" state
+        self.view_workers: Dict[str, GenerationWorker] = {}
+        self.pending_views: List[str] = []
+        self.view_status: Dict[str, str] = {}
+        self.failed_views: Dict[str, str] = {}
+        self.batch_worker: Optional[BatchWorker] = None
+        self.batch_errors: List[str] = []
 
         # Setup UI
         self.setup_ui()
 
-        # Initialize API client if key is set
-        if self.config.get("replicate_api_key"):
-            self.api_client = ReplicateAPIClient(self.config["replicate_api_key"])
+        # Initialize API client if key is set (the mock backend needs none)
+        if self.config.get("replicate_api_key") or self.config.get("inference_backend") == "mock":
+            self.api_client = self.pipeline.api_client = self.create_api_client(self.config.get("replicate_api_key", ""))
+
+        # Pick up vehicle folders added, changed or removed while running
+        self.template_watcher: Optional[TemplateWatcher] = None
+        if self.config.get("watch_templates", True):
+            self.templates_changed.connect(self.on_templates_changed)
+            self.template_watcher = TemplateWatcher(self.template_manager, self.input_cache,
+                                                    on_change=self.templates_changed.emit).start()
+
+        # Once the window is up, offer to resume a run that was interrupted
+        QTimer.singleShot(0, self.offer_resume)
+
+    def create_api_client(self, api_key: str) -> ReplicateAPIClient:
+        """Create the API client configured in config.json"""
+        client_class = AsyncReplicateAPIClient if self.config.get("async_client") else ReplicateAPIClient
+        return client_class(
+            api_key,
+            result_cache=self.result_cache,
+            upload_mode=self.config.get("upload_mode", "data_uri"),
+            backend=create_backend(self.config, api_key)
+        )
 
     def load_config(self) -> dict:
         """Load configuration from config.json"""
@@ -186,6 +295,15 @@ class LiveryGeneratorWindow(QMainWindow):
         self.save_btn.clicked.connect(self.save_livery)
         self.save_btn.setEnabled(False)
         button_layout.addWidget(self.save_btn)
+
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_generation)
+        self.cancel_btn.setEnabled(False)
+        button_layout.addWidget(self.cancel_btn)
+
+        self.concurrent_checkbox = QCheckBox("Generate views concurrently")
+        self.concurrent_checkbox.setChecked(self.config.get("concurrent_generation", True))
+        button_layout.addWidget(self.concurrent_checkbox)
         layout.addLayout(button_layout)
 
         # Progress bar
@@ -219,9 +337,9 @@ class LiveryGeneratorWindow(QMainWindow):
         self.vehicle_checkboxes: Dict[str, QCheckBox] = {}
         self.checkbox_layout = QGridLayout()
         multi_layout.addLayout(self.checkbox_layout)
-        apply_btn = QPushButton("Apply to Selected Vehicles")
-        apply_btn.clicked.connect(self.apply_to_vehicles)
-        multi_layout.addWidget(apply_btn)
+        self.apply_btn = QPushButton("Apply to Selected Vehicles")
+        self.apply_btn.clicked.connect(self.apply_to_vehicles)
+        multi_layout.addWidget(self.apply_btn)
         self.multi_vehicle_group.setLayout(multi_layout)
         layout.addWidget(self.multi_vehicle_group)
 
@@ -230,21 +348,139 @@ class LiveryGeneratorWindow(QMainWindow):
         api_key = self.api_key_input.text().strip()
         self.config["replicate_api_key"] = api_key
         self.save_config()
-        self.api_client = ReplicateAPIClient(api_key)
+        self.api_client = self.pipeline.api_client = self.create_api_client(api_key)
         QMessageBox.information(self, "Success", "API key saved!")
 
+    def store_view(self, view: str, image: Image.Image):
+        """Keep a finished view and checkpoint it, so an interrupted run can resume"""
+        self.generated_views[view] = image
+        if self.run:
+            self.run.save_view(view, image)
+
+    def start_run(self, preview: Image.Image):
+        """Start a new run record for a fresh preview"""
+        self.generated_views.clear()
+        self.run = RunCheckpoint.open(self.runs_dir, {
+            "kind": "gui",
+            "vehicle": self.current_vehicle,
+            "prompt": self.current_prompt,
+            "model": self.api_client.model,
+        }, resume=False)
+        self.run.save_view("Left", preview)
+
+    def offer_resume(self):
+        """Offer to pick up the most recent interrupted run"""
+        RunCheckpoint.prune(self.runs_dir)
+        for run in RunCheckpoint.unfinished(self.runs_dir, kind="gui"):
+            vehicle = run.meta.get("vehicle")
+            if vehicle not in self.template_manager.get_vehicle_names() or not run.is_done("Left"):
+                continue
+
+            views = [view for view in TemplateManager.REQUIRED_VIEWS if run.is_done(view)]
+            answer = QMessageBox.question(
+                self,
+                "Resume Livery",
+                f"An unfinished livery for {vehicle} was found ({len(views)}/5 views).\n\n"
+                f"Prompt: {run.meta['prompt']}\n\nResume it?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                run.finish("abandoned")
+                return
+
+            self.vehicle_combo.setCurrentText(vehicle)
+            self.on_vehicle_changed(vehicle)
+            self.current_prompt = run.meta["prompt"]
+            self.prompt_input.setPlainText(self.current_prompt)
+
+            self.run = run
+            self.generated_views = {view: run.load_view(view) for view in views}
+            self.preview_image = self.generated_views["Left"]
+            self.display_image(self.preview_image)
+            self.generate_all_btn.setEnabled(True)
+            if len(self.generated_views) == 5:
+                self.save_btn.setEnabled(True)
+                self.show_multi_vehicle_options()
+            self.status_label.setText(f"Resumed {len(views)}/5 views - click 'Generate All Views' to finish the rest")
+            return
+
+    def begin_generation(self) -> CancelToken:
+        """Start cancellable work (a preview or "Generate All"); returns its cancel token"""
+        self.cancel_token = CancelToken()
+        self.cancel_btn.setEnabled(True)
+        return self.cancel_token
+
+    def end_generation(self):
+        """The current work finished - nothing left to cancel"""
+        self.cancel_token = None
+        self.cancel_btn.setEnabled(bool(self.batch_worker and self.batch_worker.isRunning()))
+
+    @staticmethod
+    def guarded(token: CancelToken, handler: Callable) -> Callable:
+        """Wrap a worker signal handler so results arriving after a cancel are dropped"""
+        return lambda *args: None if token.cancelled else handler(*args)
+
+    def cancel_generation(self):
+        """Stop the work in progress: predictions are cancelled remotely and their slots freed"""
+        if self.cancel_token:
+            self.cancel_token.cancel()
+        if self.batch_worker and self.batch_worker.isRunning():
+            self.batch_worker.generator.cancel()
+
+        # The workers wind down on their own; keep them referenced until they have
+        workers = [self.worker, *self.view_workers.values()]
+        self.abandoned_workers = [w for w in self.abandoned_workers + workers if w and w.isRunning()]
+        self.worker = None
+        self.view_workers.clear()
+        self.pending_views = []
+        self.view_status.clear()
+
+        self.progress_bar.setVisible(False)
+        self.preview_btn.setEnabled(True)
+        self.generate_all_btn.setEnabled(self.preview_image is not None)
+        self.end_generation()
+        self.status_label.setText("Cancelled")
+
     def on_vehicle_changed(self, vehicle_name: str):
         """Handle vehicle selection change"""
+        # Work for the previous vehicle is no longer wanted
+        if self.cancel_token:
+            self.cancel_generation()
+
         self.current_vehicle = vehicle_name
         self.preview_image = None
         self.generated_views.clear()
+        self.run = None
         self.preview_label.setText(f"Selected: {vehicle_name}")
         self.generate_all_btn.setEnabled(False)
         self.save_btn.setEnabled(False)
 
+    def on_templates_changed(self, changes: list):
+        """Refresh the vehicle lists after the template watcher re-read some vehicles"""
+        names = self.template_manager.get_vehicle_names()
+        current = self.vehicle_combo.currentText()
+
+        # Rebuild the combo without treating it as a new selection
+        self.vehicle_combo.blockSignals(True)
+        self.vehicle_combo.clear()
+        self.vehicle_combo.addItems(names)
+        if current in names:
+            self.vehicle_combo.setCurrentText(current)
+        self.vehicle_combo.blockSignals(False)
+        if current not in names:
+            self.on_vehicle_changed(self.vehicle_combo.currentText())
+
+        if self.multi_vehicle_group.isVisible():
+            checked = {v for v, cb in self.vehicle_checkboxes.items() if cb.isChecked()}
+            self.show_multi_vehicle_options()
+            for vehicle, checkbox in self.vehicle_checkboxes.items():
+                checkbox.setChecked(vehicle in checked)
+
+        self.status_label.setText("Templates updated: " + ", ".join(
+            f"{change.vehicle.strip()} {change.kind}" for change in changes))
+
     def generate_preview(self):
         """Generate preview (Left view only)"""
-        if not self.api_client or not self.config.get("replicate_api_key"):
+        if not self.api_client or not self.api_client.is_configured:
             QMessageBox.warning(self, "Error", "Please set your Replicate API key first!")
             return
 
@@ -274,17 +510,12 @@ class LiveryGeneratorWindow(QMainWindow):
         self.generate_all_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
         self.progress_bar.setMaximum(0)  # Indeterminate
+        token = self.begin_generation()
 
-        self.worker = GenerationWorker(
-            self.api_client,
-            self.processor,
-            template_path,
-            prompt,
-            view
-        )
-        self.worker.progress.connect(self.on_progress)
-        self.worker.finished.connect(lambda img: self.on_generation_finished(img, view, is_preview))
-        self.worker.error.connect(self.on_error)
+        self.worker = GenerationWorker(self.pipeline, template_path, prompt, view, cancel=token)
+        self.worker.progress.connect(self.guarded(token, self.on_progress))
+        self.worker.finished.connect(self.guarded(token, lambda img: self.on_generation_finished(img, view, is_preview)))
+        self.worker.error.connect(self.guarded(token, self.on_error))
         self.worker.start()
 
     def on_progress(self, message: str):
@@ -295,6 +526,7 @@ class LiveryGeneratorWindow(QMainWindow):
         """Handle generation completion"""
         self.progress_bar.setVisible(False)
         self.preview_btn.setEnabled(True)
+        self.end_generation()
 
         if image is None:
             self.status_label.setText("Generation failed!")
@@ -303,10 +535,11 @@ class LiveryGeneratorWindow(QMainWindow):
         # Store the result
         if is_preview:
             self.preview_image = image
+            self.start_run(image)
             self.generate_all_btn.setEnabled(True)
             self.status_label.setText(f"Preview generated! Review and click 'Generate All Views' to continue.")
         else:
-            self.generated_views[view] = image
+            self.store_view(view, image)
             self.status_label.setText(f"Generated {view} view ({len(self.generated_views)}/5)")
 
         # Display the image
@@ -322,6 +555,7 @@ class LiveryGeneratorWindow(QMainWindow):
         """Handle generation error"""
         self.progress_bar.setVisible(False)
         self.preview_btn.setEnabled(True)
+        self.end_generation()
         self.status_label.setText(f"Error: {error_msg}")
         QMessageBox.critical(self, "Error", error_msg)
 
@@ -347,20 +581,60 @@ class LiveryGeneratorWindow(QMainWindow):
         self.preview_label.setPixmap(scaled_pixmap)
 
     def generate_all_views(self):
-        """Generate all 5 views sequentially"""
+        """Generate all 5 views (concurrently or one after another)"""
         if not self.preview_image:
             QMessageBox.warning(self, "Error", "Please generate a preview first!")
             return
 
-        # Clear previous results
-        self.generated_views.clear()
+        # Views finished earlier (e.g. before a failure or restart) are kept
         self.save_btn.setEnabled(False)
 
         # Add the preview to results
         self.generated_views["Left"] = self.preview_image
+        self.begin_generation()
+        if self.config.get("mirror_views"):
+            self.derive_mirrored_views()
+        else:
+            self.generate_remaining_views()
+
+    def derive_mirrored_views(self):
+        """Build views that mirror an already generated view (Right from Left) in the background, then generate the rest"""
+        self.preview_btn.setEnabled(False)
+        self.generate_all_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(0)
+        self.status_label.setText("Mirroring views...")
+
+        token = self.cancel_token
+        self.worker = MirrorWorker(self.pipeline, self.template_manager, self.current_vehicle,
+                                   dict(self.generated_views), float(self.config.get("mirror_tolerance", 0.01)),
+                                   token)
+        self.worker.finished.connect(self.guarded(token, self.on_views_mirrored))
+        self.worker.start()
+
+    def on_views_mirrored(self, mirrored: Dict[str, Image.Image]):
+        """Keep the mirrored views and generate whatever is left"""
+        self.progress_bar.setVisible(False)
+        self.preview_btn.setEnabled(True)
+        self.generate_all_btn.setEnabled(True)
+        self.status_label.setText(f"Mirrored {len(mirrored)} view(s)")
+        for view, image in mirrored.items():
+            self.store_view(view, image)
+        self.generate_remaining_views()
+
+    def generate_remaining_views(self):
+        """Generate the views not finished yet (in one atlas call, concurrently or one after another)"""
+        if len(self.generated_views) == 5:
+            self.end_generation()
+            self.save_btn.setEnabled(True)
+            return
 
-        # Generate remaining views
-        self.generate_next_view()
+        if self.config.get("atlas_mode"):
+            self.generate_views_atlas()
+        elif self.concurrent_checkbox.isChecked():
+            self.generate_views_concurrently()
+        else:
+            self.generate_next_view()
 
     def generate_next_view(self):
         """Generate the next view in sequence"""
@@ -374,33 +648,169 @@ class LiveryGeneratorWindow(QMainWindow):
         template_path = self.template_manager.get_template_path(self.current_vehicle, next_view)
 
         if template_path:
-            self.worker = GenerationWorker(
-                self.api_client,
-                self.processor,
-                template_path,
-                self.current_prompt,
-                next_view
-            )
-            self.worker.progress.connect(self.on_progress)
-            self.worker.finished.connect(lambda img: self.on_view_finished(img, next_view))
-            self.worker.error.connect(self.on_error)
+            token = self.cancel_token
+            self.worker = GenerationWorker(self.pipeline, template_path, self.current_prompt, next_view,
+                                           cancel=token)
+            self.worker.progress.connect(self.guarded(token, self.on_progress))
+            self.worker.finished.connect(self.guarded(token, lambda img: self.on_view_finished(img, next_view)))
+            self.worker.error.connect(self.guarded(token, self.on_error))
             self.worker.start()
+        else:
+            self.on_error(f"{next_view} template not found")
 
     def on_view_finished(self, image: Optional[Image.Image], view: str):
         """Handle individual view completion"""
         if image:
-            self.generated_views[view] = image
+            self.store_view(view, image)
             self.display_image(image)
 
             # Continue with next view
             if len(self.generated_views) < 5:
                 self.generate_next_view()
             else:
+                self.end_generation()
                 self.save_btn.setEnabled(True)
                 self.show_multi_vehicle_options()
-                self.status_label.setText("All views complete!")
+                self.status_label.setText(f"All views complete! ({self.result_cache.summary()})")
+                print(f"Pipeline stages:\n{self.pipeline.stats.summary()}")
                 QMessageBox.information(self, "Complete", "All views generated successfully!")
 
+    def generate_views_atlas(self):
+        """Generate all remaining views with a single call, matching the approved preview"""
+        views = [v for v in TemplateManager.REQUIRED_VIEWS if v not in self.generated_views]
+        if not views:
+            return
+
+        self.preview_btn.setEnabled(False)
+        self.generate_all_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(0)
+        self.status_label.setText(f"Generating {len(views)} views in one call...")
+
+        token = self.cancel_token
+        generator = BatchGenerator(self.api_client, self.processor, self.template_manager, self.input_cache,
+                                   pipeline_stats=self.pipeline.stats)
+        token.on_cancel(generator.cancel)
+        self.worker = AtlasWorker(generator, self.current_vehicle, self.current_prompt, views,
+                                  {"Left": self.preview_image})
+        self.worker.finished.connect(self.guarded(token, self.on_atlas_finished))
+        self.worker.error.connect(self.guarded(token, self.on_error))
+        self.worker.start()
+
+    def on_atlas_finished(self, results: Optional[Dict[str, Image.Image]], report: Optional[AtlasReport]):
+        """Handle completion of a single-call atlas run"""
+        self.progress_bar.setVisible(False)
+        self.preview_btn.setEnabled(True)
+        self.generate_all_btn.setEnabled(True)
+        self.end_generation()
+        if not results:
+            return
+
+        for view, image in results.items():
+            self.store_view(view, image)
+        self.display_image(next(iter(results.values())))
+        self.status_label.setText(f"Atlas: {report.summary()}")
+
+        if len(self.generated_views) == 5:
+            self.save_btn.setEnabled(True)
+            self.show_multi_vehicle_options()
+            QMessageBox.information(self, "Complete", "All views generated successfully!")
+
+    def generate_views_concurrently(self):
+        """Submit all remaining views at once, limited by max_concurrent_views"""
+        remaining = [v for v in TemplateManager.REQUIRED_VIEWS if v not in self.generated_views]
+        if not remaining:
+            return
+
+        self.pending_views = remaining
+        self.view_status = {view: "Queued" for view in remaining}
+        self.failed_views.clear()
+
+        self.preview_btn.setEnabled(False)
+        self.generate_all_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(len(remaining))
+        self.progress_bar.setValue(0)
+
+        self.launch_pending_views()
+
+    def launch_pending_views(self):
+        """Start queued views until the concurrency cap is reached"""
+        max_concurrent = max(1, int(self.config.get("max_concurrent_views", 4)))
+
+        while self.pending_views and len(self.view_workers) < max_concurrent:
+            view = self.pending_views.pop(0)
+            template_path = self.template_manager.get_template_path(self.current_vehicle, view)
+
+            if not template_path:
+                self.failed_views[view] = "Template not found"
+                self.view_status[view] = "Failed"
+                continue
+
+            token = self.cancel_token
+            worker = GenerationWorker(self.pipeline, template_path, self.current_prompt, view, cancel=token)
+            worker.progress.connect(self.guarded(token, lambda msg, v=view: self.on_view_progress(v, msg)))
+            worker.finished.connect(self.guarded(token, lambda img, v=view: self.on_concurrent_view_finished(img, v)))
+            worker.error.connect(self.guarded(token, lambda msg, v=view: self.on_view_error(v, msg)))
+            self.view_workers[view] = worker
+            self.view_status[view] = "Starting"
+            worker.start()
+
+        self.update_view_status()
+        # Nothing started (e.g. every remaining view lacks a template) - nothing will call back
+        if not self.view_workers and not self.pending_views:
+            self.on_concurrent_views_done()
+
+    def on_view_progress(self, view: str, message: str):
+        """Record progress message for a single view"""
+        # Worker messages look like "Generating livery (Front)..." - keep the stage only
+        self.view_status[view] = message.split(" (")[0]
+        self.update_view_status()
+
+    def on_view_error(self, view: str, error_msg: str):
+        """Record an error for a single view without interrupting the others"""
+        self.failed_views[view] = error_msg
+
+    def update_view_status(self):
+        """Show per-view progress in the status label"""
+        parts = [f"{view}: {status}" for view, status in self.view_status.items()]
+        self.status_label.setText(" | ".join(parts))
+
+    def on_concurrent_view_finished(self, image: Optional[Image.Image], view: str):
+        """Handle completion of one view in a concurrent run"""
+        worker = self.view_workers.pop(view, None)
+        if worker:
+            worker.wait()
+
+        if image:
+            self.store_view(view, image)
+            self.view_status[view] = "Complete"
+            self.display_image(image)
+        else:
+            self.view_status[view] = "Failed"
+            self.failed_views.setdefault(view, "Generation failed")
+
+        self.progress_bar.setValue(self.progress_bar.value() + 1)
+        self.launch_pending_views()
+
+    def on_concurrent_views_done(self):
+        """All submitted views of a concurrent run have finished (or failed)"""
+        self.progress_bar.setVisible(False)
+        self.preview_btn.setEnabled(True)
+        self.generate_all_btn.setEnabled(True)
+        self.end_generation()
+
+        if len(self.generated_views) == 5:
+            self.save_btn.setEnabled(True)
+            self.show_multi_vehicle_options()
+            self.status_label.setText(f"All views complete! ({self.result_cache.summary()})")
+            print(f"Pipeline stages:\n{self.pipeline.stats.summary()}")
+            QMessageBox.information(self, "Complete", "All views generated successfully!")
+        else:
+            details = "\n".join(f"{v}: {msg}" for v, msg in self.failed_views.items())
+            self.status_label.setText(f"{len(self.failed_views)} view(s) failed")
+            QMessageBox.critical(self, "Error", f"Some views failed to generate:\n\n{details}")
+
     def save_livery(self):
         """Save all generated views"""
         if not self.generated_views:
@@ -414,6 +824,10 @@ class LiveryGeneratorWindow(QMainWindow):
             output_path = output_dir / f"Livery_{view}.png"
             self.processor.save_image(image, output_path)
 
+        # Saved for good - nothing left to resume
+        if self.run:
+            self.run.finish()
+
         QMessageBox.information(
             self,
             "Success",
@@ -459,6 +873,64 @@ class LiveryGeneratorWindow(QMainWindow):
             "This may take several minutes."
         )
 
-        # TODO: Implement batch generation for multiple vehicles
-        # For now, just show a message
-        self.status_label.setText(f"Batch generation for {len(selected)} vehicles - Coming soon!")
+        generator = BatchGenerator(
+            self.api_client,
+            self.processor,
+            self.template_manager,
+            self.input_cache,
+            output_dir=self.config["output_directory"],
+            max_in_flight=int(self.config.get("batch_max_in_flight", 4)),
+            mirror_views=bool(self.config.get("mirror_views", False)),
+            mirror_tolerance=float(self.config.get("mirror_tolerance", 0.01)),
+            unmirror_text=bool(self.config.get("unmirror_text", False)),
+            atlas_mode=bool(self.config.get("atlas_mode", False)),
+            cpu_workers=int(self.config.get("cpu_workers", 0)),
+            pipeline_stats=self.pipeline.stats
+        )
+
+        self.batch_errors = []
+        self.apply_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setMaximum(0)
+
+        # Applying the same design to the same vehicles again resumes an interrupted batch
+        checkpoint = RunCheckpoint.open(self.runs_dir, {
+            "kind": "batch",
+            "prompt": self.current_prompt,
+            "model": self.api_client.model,
+            "vehicles": sorted(selected),
+            "output": str(Path(self.config["output_directory"]).resolve()),
+        })
+
+        self.batch_worker = BatchWorker(generator, self.current_prompt, selected, checkpoint)
+        self.cancel_btn.setEnabled(True)
+        self.batch_worker.progress.connect(self.on_batch_progress)
+        self.batch_worker.result.connect(self.on_batch_result)
+        self.batch_worker.finished.connect(self.on_batch_finished)
+        self.batch_worker.start()
+
+    def on_batch_progress(self, progress: BatchProgress):
+        """Show aggregate batch throughput and ETA"""
+        self.progress_bar.setMaximum(max(progress.total, 1))
+        self.progress_bar.setValue(progress.done)
+        self.status_label.setText(f"Batch: {progress.summary()}")
+
+    def on_batch_result(self, vehicle: str, view: str, error: str):
+        """Record a failed batch view"""
+        if error:
+            self.batch_errors.append(f"{vehicle} {view}: {error}")
+
+    def on_batch_finished(self, progress: BatchProgress):
+        """Handle completion of a batch run"""
+        self.progress_bar.setVisible(False)
+        self.apply_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(self.cancel_token is not None)
+        self.status_label.setText(f"Batch complete: {progress.summary()}")
+        print(f"Pipeline stages:\n{self.pipeline.stats.summary()}")
+
+        message = (f"Generated {progress.completed}/{progress.total} views "
+                   f"in {progress.elapsed / 60:.1f} minutes.\n\n"
+                   f"Saved to: {self.config['output_directory']}")
+        if self.batch_errors:
+            message += "\n\nFailed:\n" + "\n".join(self.batch_errors[:10])
+        QMessageBox.information(self, "Batch Complete", message)
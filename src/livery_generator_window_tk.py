@@ -5,13 +5,23 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict
 from PIL import Image, ImageTk
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from template_manager import TemplateManager
 from image_processor import ImageProcessor
 from api_client import ReplicateAPIClient
+from async_api_client import AsyncReplicateAPIClient
+from inference_backend import create_backend
+from batch_generator import AtlasReport, BatchGenerator
+from input_cache import PreparedInputCache
+from result_cache import ResultCache
+from run_checkpoint import RunCheckpoint
+from livery_pipeline import STAGE_LABELS, GenerationFailed, LiveryPipeline, ViewWork
+from cancellation import CancelToken, Cancelled
+from template_watcher import TemplateWatcher
 
 
 class LiveryGeneratorApp:
@@ -28,22 +38,64 @@ class LiveryGeneratorApp:
         # Initialize components
         self.template_manager = TemplateManager(self.config["templates_directory"])
         self.processor = ImageProcessor()
+        self.input_cache = PreparedInputCache(
+            self.processor,
+            cache_dir=str(Path(self.config.get("cache_directory", "cache")) / "prepared"),
+            crop_padding=self.config.get("crop_padding", 32) if self.config.get("crop_to_mask") else None
+        )
+        self.result_cache = ResultCache(
+            cache_dir=str(Path(self.config.get("cache_directory", "cache")) / "results"),
+            max_bytes=int(self.config.get("result_cache_mb", 1024)) * 1024 * 1024
+        )
         self.api_client = None
+        # Shared by every preview and "Generate All" view, so its stats cover the session
+        self.pipeline = LiveryPipeline(None, self.processor, self.input_cache,
+                                       unmirror_text=bool(self.config.get("unmirror_text", False)))
+        self.runs_dir = Path(self.config.get("cache_directory", "cache")) / "runs"
 
         # State
         self.current_vehicle: Optional[str] = None
         self.current_prompt: str = ""
         self.preview_image: Optional[Image.Image] = None
         self.generated_views: Dict[str, Image.Image] = {}
+        self.run: Optional[RunCheckpoint] = None  # Checkpoint of the current livery's finished views
         self.is_generating = False
+        self.cancel_token: Optional[CancelToken] = None  # Cancels the preview / "Generate All" in progress
+
+        # Concurrent "Generate All Views" state
+        self.view_status: Dict[str, str] = {}
+        self.failed_views: Dict[str, str] = {}
+        self.views_in_flight = 0
 
         # Setup UI
         self.setup_ui()
 
-        # Initialize API client if key is set
-        if self.config.get("replicate_api_key"):
-            model = self.config.get("inpainting_model", "black-forest-labs/flux-fill-pro")
-            self.api_client = ReplicateAPIClient(self.config["replicate_api_key"], model=model)
+        # Initialize API client if key is set (the mock backend needs none)
+        if self.config.get("replicate_api_key") or self.config.get("inference_backend") == "mock":
+            self.api_client = self.pipeline.api_client = self.create_api_client(self.config.get("replicate_api_key", ""))
+
+        # Pick up vehicle folders added, changed or removed while running
+        self.template_watcher: Optional[TemplateWatcher] = None
+        if self.config.get("watch_templates", True):
+            self.template_watcher = TemplateWatcher(
+                self.template_manager, self.input_cache,
+                on_change=lambda changes: self.root.after(0, self.on_templates_changed, changes)
+            ).start()
+
+        # Once the window is up, offer to resume a run that was interrupted
+        self.root.after(100, self.offer_resume)
+
+    def create_api_client(self, api_key: str) -> ReplicateAPIClient:
+        """Create the API client configured in config.json"""
+        model = self.config.get("inpainting_model", "black-forest-labs/flux-fill-pro")
+        client_class = AsyncReplicateAPIClient if self.config.get("async_client") else ReplicateAPIClient
+        return client_class(
+            api_key,
+            model=model,
+            result_cache=self.result_cache,
+            upload_mode=self.config.get("upload_mode", "data_uri"),
+            backend=create_backend(self.config, api_key)
+        )
 
     def load_config(self) -> dict:
         """Load configuration from config.json"""
@@ -90,13 +142,13 @@ class LiveryGeneratorApp:
 
         ttk.Label(vehicle_frame, text="Select Vehicle:").pack(side=tk.LEFT, padx=5)
         self.vehicle_var = tk.StringVar()
-        vehicle_combo = ttk.Combobox(vehicle_frame, textvariable=self.vehicle_var, width=50)
-        vehicle_combo['values'] = self.template_manager.get_vehicle_names()
-        if vehicle_combo['values']:
-            vehicle_combo.current(0)
-            self.current_vehicle = vehicle_combo.get()
-        vehicle_combo.bind('<<ComboboxSelected>>', self.on_vehicle_changed)
-        vehicle_combo.pack(side=tk.LEFT, padx=5)
+        self.vehicle_combo = ttk.Combobox(vehicle_frame, textvariable=self.vehicle_var, width=50)
+        self.vehicle_combo['values'] = self.template_manager.get_vehicle_names()
+        if self.vehicle_combo['values']:
+            self.vehicle_combo.current(0)
+            self.current_vehicle = self.vehicle_combo.get()
+        self.vehicle_combo.bind('<<ComboboxSelected>>', self.on_vehicle_changed)
+        self.vehicle_combo.pack(side=tk.LEFT, padx=5)
 
         # Prompt input
         prompt_frame = ttk.LabelFrame(main_frame, text="Livery Description", padding="5")
@@ -121,6 +173,12 @@ class LiveryGeneratorApp:
         self.save_btn = ttk.Button(button_frame, text="Save Livery", command=self.save_livery, state=tk.DISABLED)
         self.save_btn.pack(side=tk.LEFT, padx=5)
 
+        self.cancel_btn = ttk.Button(button_frame, text="Cancel", command=self.cancel_generation, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+
+        self.concurrent_var = tk.BooleanVar(value=self.config.get("concurrent_generation", True))
+        ttk.Checkbutton(button_frame, text="Generate views concurrently", variable=self.concurrent_var).pack(side=tk.LEFT, padx=5)
+
         # Progress bar
         self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
         self.progress.grid(row=row, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=5)
@@ -150,15 +208,110 @@ class LiveryGeneratorApp:
         api_key = self.api_key_var.get().strip()
         self.config["replicate_api_key"] = api_key
         self.save_config()
-        model = self.config.get("inpainting_model", "black-forest-labs/flux-fill-pro")
-        self.api_client = ReplicateAPIClient(api_key, model=model)
+        self.api_client = self.pipeline.api_client = self.create_api_client(api_key)
         messagebox.showinfo("Success", "API key saved!")
 
+    def store_view(self, view: str, image: Image.Image):
+        """Keep a finished view and checkpoint it, so an interrupted run can resume"""
+        self.generated_views[view] = image
+        if self.run:
+            self.run.save_view(view, image)
+
+    def start_run(self, preview: Image.Image):
+        """Start a new run record for a fresh preview"""
+        self.generated_views.clear()
+        self.run = RunCheckpoint.open(self.runs_dir, {
+            "kind": "gui",
+            "vehicle": self.current_vehicle,
+            "prompt": self.current_prompt,
+            "model": self.api_client.model,
+        }, resume=False)
+        self.run.save_view("Left", preview)
+
+    def offer_resume(self):
+        """Offer to pick up the most recent interrupted run"""
+        RunCheckpoint.prune(self.runs_dir)
+        for run in RunCheckpoint.unfinished(self.runs_dir, kind="gui"):
+            vehicle = run.meta.get("vehicle")
+            if vehicle not in self.template_manager.get_vehicle_names() or not run.is_done("Left"):
+                continue
+
+            views = [view for view in TemplateManager.REQUIRED_VIEWS if run.is_done(view)]
+            if not messagebox.askyesno(
+                "Resume Livery",
+                f"An unfinished livery for {vehicle} was found ({len(views)}/5 views).\n\n"
+                f"Prompt: {run.meta['prompt']}\n\nResume it?"
+            ):
+                run.finish("abandoned")
+                return
+
+            self.vehicle_var.set(vehicle)
+            self.on_vehicle_changed()
+            self.current_prompt = run.meta["prompt"]
+            self.prompt_text.delete(1.0, tk.END)
+            self.prompt_text.insert(1.0, self.current_prompt)
+
+            self.run = run
+            self.generated_views = {view: run.load_view(view) for view in views}
+            self.preview_image = self.generated_views["Left"]
+            self.display_image(self.preview_image)
+            self.generate_all_btn.config(state=tk.NORMAL)
+            if len(self.generated_views) == 5:
+                self.save_btn.config(state=tk.NORMAL)
+            self.status_var.set(f"Resumed {len(views)}/5 views - click 'Generate All Views' to finish the rest")
+            return
+
+    def begin_generation(self) -> CancelToken:
+        """Start cancellable work (a preview or "Generate All"); returns its cancel token"""
+        self.cancel_token = CancelToken()
+        self.cancel_btn.config(state=tk.NORMAL)
+        return self.cancel_token
+
+    def end_generation(self):
+        """The current work finished - nothing left to cancel"""
+        self.cancel_token = None
+        self.cancel_btn.config(state=tk.DISABLED)
+
+    def post(self, token: CancelToken, callback: Callable, *args):
+        """Run callback on the UI thread, unless the work was cancelled by then"""
+        self.root.after(0, lambda: None if token.cancelled else callback(*args))
+
+    def cancel_generation(self):
+        """Stop the work in progress: predictions are cancelled remotely and their slots freed"""
+        if self.cancel_token:
+            self.cancel_token.cancel()
+        self.end_generation()
+
+        self.progress.stop()
+        self.is_generating = False
+        self.views_in_flight = 0
+        self.views_to_generate = []
+        self.view_status.clear()
+        self.preview_btn.config(state=tk.NORMAL)
+        self.generate_all_btn.config(state=tk.NORMAL if self.preview_image else tk.DISABLED)
+        self.status_var.set("Cancelled")
+
+    def on_templates_changed(self, changes: list):
+        """Refresh the vehicle list after the template watcher re-read some vehicles"""
+        names = self.template_manager.get_vehicle_names()
+        self.vehicle_combo['values'] = names
+        if self.vehicle_var.get() not in names:
+            self.vehicle_var.set(names[0] if names else "")
+            self.on_vehicle_changed()
+
+        self.status_var.set("Templates updated: " + ", ".join(
+            f"{change.vehicle.strip()} {change.kind}" for change in changes))
+
     def on_vehicle_changed(self, event=None):
         """Handle vehicle selection change"""
+        # Work for the previous vehicle is no longer wanted
+        if self.cancel_token:
+            self.cancel_generation()
+
         self.current_vehicle = self.vehicle_var.get()
         self.preview_image = None
         self.generated_views.clear()
+        self.run = None
         self.status_var.set(f"Selected: {self.current_vehicle}")
         self.generate_all_btn.config(state=tk.DISABLED)
         self.save_btn.config(state=tk.DISABLED)
@@ -166,7 +319,7 @@ class LiveryGeneratorApp:
 
     def generate_preview(self):
         """Generate preview (Left view only)"""
-        if not self.api_client or not self.config.get("replicate_api_key"):
+        if not self.api_client or not self.api_client.is_configured:
             messagebox.showerror("Error", "Please set your Replicate API key first!")
             return
 
@@ -199,45 +352,36 @@ class LiveryGeneratorApp:
         self.preview_btn.config(state=tk.DISABLED)
         self.generate_all_btn.config(state=tk.DISABLED)
         self.progress.start(10)
+        token = self.begin_generation()
+        self.generate_in_background(token, template_path, prompt, view,
+                                    lambda image: self.on_generation_finished(image, view, is_preview))
+
+    def generate_in_background(self, token: CancelToken, template_path, prompt, view,
+                               on_finished: Callable[[Image.Image], None]):
+        """Run one view through the pipeline on a background thread; errors go to on_error"""
+        def report(stage):
+            message = f"{STAGE_LABELS[stage]} ({view})..."
+            if stage == "generate":
+                message += " This may take 20-60 seconds"
+            self.post(token, self.status_var.set, message)
 
         def generate():
             try:
-                self.status_var.set(f"Loading template ({view})...")
-                template = self.processor.load_template(template_path)
-
-                self.status_var.set(f"Creating mask ({view})...")
-                mask = self.processor.create_mask(template)
-
-                self.status_var.set(f"Preparing images ({view})...")
-                template_resized, mask_resized = self.processor.prepare_for_api(template, mask)
-
-                self.status_var.set(f"Generating livery ({view})... This may take 20-60 seconds")
-                generated = self.api_client.generate_inpainting(
-                    template_resized,
-                    mask_resized,
-                    prompt,
-                    view
-                )
-
-                if generated is None:
-                    error_msg = "Generation failed - check API key and connection\n\nPossible issues:\n- Invalid API key\n- No internet connection\n- Insufficient Replicate credits\n- Model not available"
-                    print(f"ERROR: {error_msg}")
-                    self.root.after(0, lambda: self.on_error(error_msg))
-                    return
-
-                self.status_var.set(f"Compositing result ({view})...")
-                if generated.size != template.size:
-                    generated = generated.resize(template.size, Image.Resampling.LANCZOS)
-                    mask = mask.resize(template.size, Image.Resampling.LANCZOS)
+                work = self.pipeline.run(ViewWork(view, template_path, prompt), token, on_stage=report)
+                self.post(token, on_finished, work.final)
 
-                final = self.processor.composite_result(template, generated, mask)
+            except Cancelled:
+                pass
 
-                self.root.after(0, lambda: self.on_generation_finished(final, view, is_preview))
+            except GenerationFailed as e:
+                error_msg = f"{e}\n\nPossible issues:\n- Invalid API key\n- No internet connection\n- Insufficient Replicate credits\n- Model not available"
+                print(f"ERROR: {error_msg}")
+                self.post(token, self.on_error, error_msg)
 
             except Exception as e:
                 import traceback
                 error_details = f"{str(e)}\n\nDetails:\n{traceback.format_exc()}"
-                self.root.after(0, lambda: self.on_error(error_details))
+                self.post(token, self.on_error, error_details)
 
         thread = threading.Thread(target=generate, daemon=True)
         thread.start()
@@ -247,6 +391,7 @@ class LiveryGeneratorApp:
         self.progress.stop()
         self.preview_btn.config(state=tk.NORMAL)
         self.is_generating = False
+        self.end_generation()
 
         if image is None:
             self.status_var.set("Generation failed!")
@@ -255,10 +400,11 @@ class LiveryGeneratorApp:
         # Store the result
         if is_preview:
             self.preview_image = image
+            self.start_run(image)
             self.generate_all_btn.config(state=tk.NORMAL)
             self.status_var.set(f"Preview generated! Review and click 'Generate All Views' to continue.")
         else:
-            self.generated_views[view] = image
+            self.store_view(view, image)
             self.status_var.set(f"Generated {view} view ({len(self.generated_views)}/5)")
 
         # Display the image
@@ -273,7 +419,9 @@ class LiveryGeneratorApp:
         """Handle generation error"""
         self.progress.stop()
         self.preview_btn.config(state=tk.NORMAL)
+        self.generate_all_btn.config(state=tk.NORMAL if self.preview_image else tk.DISABLED)
         self.is_generating = False
+        self.end_generation()
         self.status_var.set(f"Error: {error_msg}")
         messagebox.showerror("Error", error_msg)
 
@@ -309,21 +457,211 @@ class LiveryGeneratorApp:
         self.canvas.create_image(canvas_width // 2, canvas_height // 2, image=self.photo)
 
     def generate_all_views(self):
-        """Generate all 5 views sequentially"""
+        """Generate all 5 views (concurrently or one after another)"""
         if not self.preview_image:
             messagebox.showerror("Error", "Please generate a preview first!")
             return
 
-        # Clear previous results
-        self.generated_views.clear()
+        # Views finished earlier (e.g. before a failure or restart) are kept
         self.save_btn.config(state=tk.DISABLED)
 
         # Add the preview to results
         self.generated_views["Left"] = self.preview_image
+        self.begin_generation()
+        if self.config.get("mirror_views"):
+            self.derive_mirrored_views()
+        else:
+            self.generate_remaining_views()
+
+    def derive_mirrored_views(self):
+        """Build views that mirror an already generated view (Right from Left) in the background, then generate the rest"""
+        if self.is_generating:
+            return
+
+        vehicle, finished = self.current_vehicle, dict(self.generated_views)
+        tolerance = float(self.config.get("mirror_tolerance", 0.01))
+        token = self.cancel_token
+
+        self.is_generating = True
+        self.preview_btn.config(state=tk.DISABLED)
+        self.generate_all_btn.config(state=tk.DISABLED)
+        self.progress.start(10)
+        self.status_var.set("Mirroring views...")
+
+        def mirror():
+            try:
+                mirrored = self.pipeline.mirror_views(self.template_manager, vehicle, finished,
+                                                      tolerance=tolerance, cancel=token)
+            except Cancelled:
+                return
+            except Exception as e:
+                # Mirroring only saves calls - generate the views instead
+                print(f"Could not mirror views: {e}")
+                mirrored = {}
+            self.post(token, self.on_views_mirrored, mirrored)
+
+        thread = threading.Thread(target=mirror, daemon=True)
+        thread.start()
 
-        # Generate remaining views
-        self.views_to_generate = ["Front", "Rear", "Right", "Top"]
-        self.generate_next_view()
+    def on_views_mirrored(self, mirrored: Dict[str, Image.Image]):
+        """Keep the mirrored views and generate whatever is left"""
+        self.progress.stop()
+        self.is_generating = False
+        self.preview_btn.config(state=tk.NORMAL)
+        self.generate_all_btn.config(state=tk.NORMAL)
+        self.status_var.set(f"Mirrored {len(mirrored)} view(s)")
+        for view, image in mirrored.items():
+            self.store_view(view, image)
+        self.generate_remaining_views()
+
+    def generate_remaining_views(self):
+        """Generate the views not finished yet (in one atlas call, concurrently or one after another)"""
+        if len(self.generated_views) == 5:
+            self.end_generation()
+            self.save_btn.config(state=tk.NORMAL)
+            return
+
+        self.views_to_generate = [v for v in ["Front", "Rear", "Right", "Top"] if v not in self.generated_views]
+        if self.config.get("atlas_mode"):
+            self.generate_views_atlas()
+        elif self.concurrent_var.get():
+            self.generate_views_concurrently()
+        else:
+            self.generate_next_view()
+
+    def generate_views_atlas(self):
+        """Generate all remaining views with a single call, matching the approved preview"""
+        if self.is_generating:
+            return
+
+        views = self.views_to_generate
+        self.views_to_generate = []
+        vehicle, prompt, preview = self.current_vehicle, self.current_prompt, self.preview_image
+        token = self.cancel_token
+        generator = BatchGenerator(self.api_client, self.processor, self.template_manager, self.input_cache,
+                                   pipeline_stats=self.pipeline.stats)
+        token.on_cancel(generator.cancel)
+
+        self.is_generating = True
+        self.preview_btn.config(state=tk.DISABLED)
+        self.generate_all_btn.config(state=tk.DISABLED)
+        self.progress.start(10)
+        self.status_var.set(f"Generating {len(views)} views in one call...")
+
+        def generate():
+            try:
+                results, report = generator.generate_atlas(vehicle, prompt, views, context={"Left": preview})
+                self.post(token, self.on_atlas_finished, results, report)
+            except Cancelled:
+                pass
+            except Exception as e:
+                self.post(token, self.on_error, str(e))
+
+        thread = threading.Thread(target=generate, daemon=True)
+        thread.start()
+
+    def on_atlas_finished(self, results: Dict[str, Image.Image], report: AtlasReport):
+        """Handle completion of a single-call atlas run"""
+        self.progress.stop()
+        self.is_generating = False
+        self.preview_btn.config(state=tk.NORMAL)
+        self.generate_all_btn.config(state=tk.NORMAL)
+        self.end_generation()
+
+        for view, image in results.items():
+            self.store_view(view, image)
+        self.display_image(next(iter(results.values())))
+        self.status_var.set(f"Atlas: {report.summary()}")
+
+        if len(self.generated_views) == 5:
+            self.save_btn.config(state=tk.NORMAL)
+            messagebox.showinfo("Complete", "All views generated successfully!")
+
+    def generate_views_concurrently(self):
+        """Submit all remaining views at once, limited by max_concurrent_views"""
+        if self.is_generating:
+            return
+
+        views = self.views_to_generate
+        self.views_to_generate = []
+        max_concurrent = max(1, int(self.config.get("max_concurrent_views", 4)))
+
+        self.is_generating = True
+        self.preview_btn.config(state=tk.DISABLED)
+        self.generate_all_btn.config(state=tk.DISABLED)
+        self.progress.start(10)
+
+        self.view_status = {view: "Queued" for view in views}
+        self.failed_views.clear()
+        self.views_in_flight = len(views)
+        self.update_view_status()
+
+        executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="view")
+        for view in views:
+            template_path = self.template_manager.get_template_path(self.current_vehicle, view)
+            executor.submit(self.run_concurrent_view, template_path, self.current_prompt, view, self.cancel_token)
+        executor.shutdown(wait=False)
+
+    def run_concurrent_view(self, template_path, prompt, view, token: CancelToken):
+        """Worker body for one view of a concurrent run (runs off the UI thread)"""
+        def report(stage):
+            self.post(token, self.on_view_progress, view, stage)
+
+        try:
+            if not template_path:
+                raise FileNotFoundError(f"{view} template not found")
+
+            work = self.pipeline.run(ViewWork(view, template_path, prompt), token,
+                                     on_stage=lambda stage: report(STAGE_LABELS[stage]))
+            self.post(token, self.on_concurrent_view_finished, work.final, view, None)
+
+        except Cancelled:
+            pass
+
+        except Exception as e:
+            self.post(token, self.on_concurrent_view_finished, None, view, str(e))
+
+    def on_view_progress(self, view: str, stage: str):
+        """Record progress for a single view"""
+        self.view_status[view] = stage
+        self.update_view_status()
+
+    def update_view_status(self):
+        """Show per-view progress in the status bar"""
+        self.status_var.set(" | ".join(f"{view}: {status}" for view, status in self.view_status.items()))
+
+    def on_concurrent_view_finished(self, image: Optional[Image.Image], view: str, error_msg: Optional[str]):
+        """Handle completion of one view in a concurrent run"""
+        self.views_in_flight -= 1
+
+        if image:
+            self.store_view(view, image)
+            self.view_status[view] = "Complete"
+            self.display_image(image)
+        else:
+            self.view_status[view] = "Failed"
+            self.failed_views[view] = error_msg or "Generation failed"
+        self.update_view_status()
+
+        if self.views_in_flight > 0:
+            return
+
+        # All submitted views have finished
+        self.progress.stop()
+        self.is_generating = False
+        self.preview_btn.config(state=tk.NORMAL)
+        self.generate_all_btn.config(state=tk.NORMAL)
+        self.end_generation()
+
+        if len(self.generated_views) == 5:
+            self.save_btn.config(state=tk.NORMAL)
+            self.status_var.set(f"All views complete! ({self.result_cache.summary()})")
+            print(f"Pipeline stages:\n{self.pipeline.stats.summary()}")
+            messagebox.showinfo("Complete", "All views generated successfully!")
+        else:
+            details = "\n".join(f"{v}: {msg}" for v, msg in self.failed_views.items())
+            self.status_var.set(f"{len(self.failed_views)} view(s) failed")
+            messagebox.showerror("Error", f"Some views failed to generate:\n\n{details}")
 
     def generate_next_view(self):
         """Generate the next view in sequence"""
@@ -338,6 +676,8 @@ class LiveryGeneratorApp:
                 self.on_view_finished(img, view)
 
             self.start_generation_with_callback(template_path, self.current_prompt, next_view, on_finished)
+        else:
+            self.on_error(f"{next_view} template not found")
 
     def start_generation_with_callback(self, template_path, prompt, view, callback):
         """Start generation with callback"""
@@ -346,37 +686,8 @@ class LiveryGeneratorApp:
 
         self.is_generating = True
         self.progress.start(10)
-
-        def generate():
-            try:
-                self.status_var.set(f"Generating {view} view...")
-                template = self.processor.load_template(template_path)
-                mask = self.processor.create_mask(template)
-                template_resized, mask_resized = self.processor.prepare_for_api(template, mask)
-
-                generated = self.api_client.generate_inpainting(
-                    template_resized,
-                    mask_resized,
-                    prompt,
-                    view
-                )
-
-                if generated:
-                    if generated.size != template.size:
-                        generated = generated.resize(template.size, Image.Resampling.LANCZOS)
-                        mask = mask.resize(template.size, Image.Resampling.LANCZOS)
-                    final = self.processor.composite_result(template, generated, mask)
-                    self.root.after(0, lambda: callback(final, view))
-                else:
-                    self.root.after(0, lambda: callback(None, view))
-
-            except Exception as e:
-                import traceback
-                error_details = f"{str(e)}\n\nDetails:\n{traceback.format_exc()}"
-                self.root.after(0, lambda: self.on_error(error_details))
-
-        thread = threading.Thread(target=generate, daemon=True)
-        thread.start()
+        self.generate_in_background(self.cancel_token, template_path, prompt, view,
+                                    lambda image: callback(image, view))
 
     def on_view_finished(self, image: Optional[Image.Image], view: str):
         """Handle individual view completion"""
@@ -384,16 +695,20 @@ class LiveryGeneratorApp:
         self.is_generating = False
 
         if image:
-            self.generated_views[view] = image
+            self.store_view(view, image)
             self.display_image(image)
 
             # Continue with next view
             if self.views_to_generate:
                 self.root.after(100, self.generate_next_view)
             else:
+                self.end_generation()
                 self.save_btn.config(state=tk.NORMAL)
-                self.status_var.set("All views complete!")
+                self.status_var.set(f"All views complete! ({self.result_cache.summary()})")
+                print(f"Pipeline stages:\n{self.pipeline.stats.summary()}")
                 messagebox.showinfo("Complete", "All views generated successfully!")
+        else:
+            self.end_generation()
 
     def save_livery(self):
         """Save all generated views"""
@@ -408,6 +723,10 @@ class LiveryGeneratorApp:
             output_path = output_dir / f"Livery_{view}.png"
             self.processor.save_image(image, output_path)
 
+        # Saved for good - nothing left to resume
+        if self.run:
+            self.run.finish()
+
         messagebox.showinfo(
             "Success",
             f"Livery saved to: {output_dir}\n\n{len(self.generated_views)} views saved."
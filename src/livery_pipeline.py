@@ -0,0 +1,533 @@
+"""
+Livery Pipeline - The prepare, generate, composite and save stages every view goes through
+"""
+import asyncio
+import multiprocessing
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from async_api_client import AsyncReplicateAPIClient
+from cancellation import CancelToken, Cancelled
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+STAGES = ("prepare", "generate", "composite", "save")
+# Stages that only do image work, so they can run in a process pool
+CPU_STAGES = ("prepare", "composite", "save")
+STAGE_LABELS = {
+    "prepare": "Preparing images",
+    "generate": "Generating livery",
+    "composite": "Compositing result",
+    "save": "Saving",
+}
+
+
+class GenerationFailed(RuntimeError):
+    """The API client returned no result"""
+
+    def __init__(self, message: str = "Generation failed - check API key and connection"):
+        super().__init__(message)
+
+
+@dataclass
+class StageSample:
+    """One run of one stage"""
+    stage: str
+    seconds: float
+    bytes_out: int = 0    # Size of what the stage produced (payloads, decoded images, saved file)
+    peak_growth: int = 0  # How far the stage raised its process's peak memory (bytes)
+
+
+@dataclass
+class ViewWork:
+    """One view on its way through the pipeline; each stage fills in its result"""
+    view: str
+    template_path: Path
+    prompt: str
+    seed: Optional[int] = None
+    output_path: Optional[Path] = None   # Where the save stage writes the result (None = not saved)
+    label: str = ""                      # Name used in log messages (default: the view)
+    mirrored: Optional["ViewWork"] = None  # View saved by flipping this one's result
+    whole_template: bool = False  # generated covers the whole template (an atlas piece), not the prepared crop
+
+    settings: Optional[Dict[str, Any]] = None  # Input settings of the API client (set by the pipeline)
+    image_png: Optional[bytes] = None          # prepare: template payload
+    mask_png: Optional[bytes] = None           # prepare: mask payload
+    generated: Optional[Image.Image] = None    # generate: raw model output
+    final: Optional[Image.Image] = None        # composite: finished view (dropped once saved)
+    samples: List[StageSample] = field(default_factory=list)
+
+
+@dataclass
+class StageStats:
+    """Counters for one stage"""
+    runs: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    bytes_out: int = 0
+    peak_growth: int = 0  # Largest peak_growth of a single run
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def percentile(self, pct: float) -> float:
+        """Wall time percentile over the most recent runs"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def to_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "mean_s": round(self.seconds / self.runs, 3) if self.runs else 0.0,
+            "p50_s": round(self.percentile(50), 3),
+            "p99_s": round(self.percentile(99), 3),
+            "max_s": round(self.max_seconds, 3),
+            "mb_out": round(self.bytes_out / 1024 / 1024, 1),
+            "peak_growth_mb": round(self.peak_growth / 1024 / 1024, 1),
+        }
+
+
+class PipelineStats:
+    """Per-stage wall time and memory counters, shared by every view a pipeline runs"""
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {stage: StageStats() for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, samples: Sequence[StageSample]) -> None:
+        with self._lock:
+            for sample in samples:
+                stats = self.stages[sample.stage]
+                stats.runs += 1
+                stats.seconds += sample.seconds
+                stats.max_seconds = max(stats.max_seconds, sample.seconds)
+                stats.bytes_out += sample.bytes_out
+                stats.peak_growth = max(stats.peak_growth, sample.peak_growth)
+                stats.recent.append(sample.seconds)
+
+    def record_error(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages[stage]
+            stats.errors += 1
+            stats.seconds += seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {stage: stats.to_dict() for stage, stats in self.stages.items()}
+
+    def summary(self) -> str:
+        """One line per stage that ran"""
+        lines = []
+        for stage, stats in self.to_dict().items():
+            if stats["runs"] or stats["errors"]:
+                lines.append(f"{stage}: {stats['runs']} runs ({stats['errors']} failed), "
+                             f"p50 {stats['p50_s']}s, p99 {stats['p99_s']}s, total {stats['seconds']}s, "
+                             f"{stats['mb_out']} MB out, peak memory up to +{stats['peak_growth_mb']} MB")
+        return "\n".join(lines) or "No views run yet"
+
+
+class LiveryPipeline:
+    """
+    The stages that turn a template and a prompt into a finished view.
+
+    prepare loads the template, builds the mask and resizes and encodes
+    the payloads (through the PreparedInputCache); generate runs the
+    prediction; composite resizes the result back and pastes it over the
+    template; save writes it to work.output_path, together with a mirrored
+    view built from it. Views without an output_path stop after composite.
+
+    Each stage runs on the executor set for it in executors, or inline on
+    the calling thread if there is none. Consecutive stages on the same
+    executor (or inline) are run together, so with a process pool for
+    composite and save the full-size result never travels back to this
+    process, and composite only reuses its per-thread buffer when save
+    follows on the same thread.
+    generate always runs in this process. Every stage is timed and its
+    memory use recorded in stats, wherever it ran.
+    """
+
+    def __init__(self, api_client, processor: ImageProcessor, input_cache: PreparedInputCache,
+                 executors: Optional[Dict[str, Executor]] = None, unmirror_text: bool = False,
+                 stats: Optional[PipelineStats] = None):
+        """
+        Initialize pipeline
+
+        Args:
+            api_client: ReplicateAPIClient (or AsyncReplicateAPIClient) for the generate stage
+            processor: Image processor for masks and compositing
+            input_cache: Cache of prepared templates, masks and payloads
+            executors: Executor per stage name (missing = run inline); see create_process_pool
+            unmirror_text: Flip lettering in mirrored views back so it reads correctly
+            stats: Counters to record into (default: new ones)
+        """
+        self.api_client = api_client
+        self.processor = processor
+        self.input_cache = input_cache
+        self.executors: Dict[str, Executor] = dict(executors or {})
+        self.unmirror_text = unmirror_text
+        self.stats = stats or PipelineStats()
+        self._buffers = threading.local()  # Per-thread composite buffer
+
+    def create_process_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Process pool whose workers can run the CPU_STAGES with this pipeline's cache settings"""
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            # Spawned rather than forked: the parent runs GUI, event loop and HTTP threads
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(self.input_cache.cache_dir), self.input_cache.crop_padding,
+                      self.unmirror_text, sys.stdout is sys.stderr)
+        )
+
+    def run(self, work: ViewWork, cancel: Optional[CancelToken] = None,
+            stages: Optional[Sequence[str]] = None,
+            on_stage: Optional[Callable[[str], None]] = None) -> ViewWork:
+        """
+        Run a view through the pipeline and block until it is done
+
+        Args:
+            work: The view
+            cancel: Token checked before every stage and passed to the API client
+            stages: Stages to run (default: all, without save if there is no output_path)
+            on_stage: Called with each stage's name as it starts
+
+        Returns:
+            The finished work (a new object when a stage ran in another process)
+
+        Raises:
+            Cancelled: If cancel was cancelled
+            GenerationFailed: If the API client returned no result
+        """
+        for group in self._groups(work, stages):
+            if self.executors.get(group[0]) is None:
+                work = self._run_here(group, work, cancel, on_stage)
+            else:
+                if on_stage:
+                    on_stage(group[0])
+                work = self.submit(work, group, cancel).result()
+        return work
+
+    def submit(self, work: ViewWork, stages: Sequence[str], cancel: Optional[CancelToken] = None) -> Future:
+        """
+        Start stages that share an executor without waiting for them
+
+        generate with an AsyncReplicateAPIClient runs on its event loop
+        without taking a thread. Stages without an executor run inline
+        before this returns.
+
+        Returns:
+            Future of the work after the stages; errors are raised by the future
+        """
+        stages = tuple(stages)
+        executor = self.executors.get(stages[0])
+        try:
+            self._bind(work)
+            if cancel:
+                cancel.check()
+
+            if stages == ("generate",) and executor is None and isinstance(self.api_client, AsyncReplicateAPIClient):
+                return self._submit_async_generate(work, cancel)
+            if executor is None:
+                done = Future()
+                done.set_result(self._run_here(stages, work, cancel))
+                return done
+            if isinstance(executor, ProcessPoolExecutor):
+                if "generate" in stages:
+                    raise ValueError("generate can't run in a process pool")
+                # The token can't cross processes; it was checked just above
+                return self._chain(executor.submit(_run_in_worker, stages, work), stages)
+            return self._chain(executor.submit(self._run_stages, stages, work, cancel), stages)
+
+        except Exception as e:
+            failed = Future()
+            failed.set_exception(e)
+            return failed
+
+    async def run_async(self, work: ViewWork, cancel: Optional[CancelToken] = None,
+                        stages: Optional[Sequence[str]] = None) -> ViewWork:
+        """run for coroutines: inline stages run in the loop's default executor"""
+        loop = asyncio.get_running_loop()
+        self._bind(work)
+        async_generate = isinstance(self.api_client, AsyncReplicateAPIClient) and self.executors.get("generate") is None
+
+        # Consecutive inline stages go to the default executor as one call,
+        # so composite and save run on the same thread
+        for group in self._groups(work, stages, separate=("generate",) if async_generate else ()):
+            if group == ("generate",) and async_generate:
+                if cancel:
+                    cancel.check()
+                start = time.perf_counter()
+                try:
+                    generated = await self.api_client.generate(work.image_png, work.mask_png, work.prompt,
+                                                               work.view, seed=work.seed, cancel=cancel)
+                    self._finish_generate(work, generated, start)
+                except Exception as e:
+                    self._record_error(e, group, time.perf_counter() - start)
+                    raise
+            elif self.executors.get(group[0]) is None:
+                work = await loop.run_in_executor(None, self._run_here, group, work, cancel)
+            else:
+                work = await asyncio.wrap_future(self.submit(work, group, cancel))
+        return work
+
+    def measure(self, stage: str, run: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run stage work done outside the stage methods (e.g. packing and
+        generating an atlas) and record it in stats like any other stage
+
+        Returns:
+            Whatever run returns; its images count as the stage's output
+        """
+        start = time.perf_counter()
+        peak = _peak_rss()
+        try:
+            result = run(*args, **kwargs)
+        except Exception as e:
+            e.stage, e.stage_seconds = stage, time.perf_counter() - start
+            self._record_error(e, (stage,))
+            raise
+        images = result if isinstance(result, tuple) else (result,)
+        bytes_out = sum(_image_bytes(image) for image in images if isinstance(image, Image.Image))
+        self.stats.record([StageSample(stage, time.perf_counter() - start, bytes_out, _peak_rss() - peak)])
+        return result
+
+    def save_mirrored(self, work: ViewWork, source: Image.Image) -> Image.Image:
+        """Build and save a view from its mirror image's result (composites into source)"""
+        template = self.processor.load_template(work.template_path)
+        mask = self.processor.create_mask(template)
+        final = self.processor.mirror_view(source, template, mask, out=source,
+                                           unmirror_text=self.unmirror_text)
+        self.processor.save_image(final, work.output_path)
+        print(f"Saved {work.label or work.view} (mirrored) to {work.output_path}")
+        return final
+
+    def mirror_views(self, template_manager, vehicle: str, finished: Dict[str, Image.Image],
+                     tolerance: float = 0.01, cancel: Optional[CancelToken] = None) -> Dict[str, Image.Image]:
+        """
+        Build the views of a vehicle that mirror one of its finished views, instead of generating them
+
+        Reads templates and composites, so GUIs call this from a worker thread.
+
+        Args:
+            template_manager: TemplateManager the vehicle's templates come from
+            vehicle: Vehicle name
+            finished: View name -> result for the views generated so far (not modified)
+            tolerance: Fraction of the masks' area allowed to differ for two views to count as mirror images
+            cancel: Stops between views once cancelled
+
+        Returns:
+            View name -> image for each mirrored view not already in finished
+        """
+        mirrored = {}
+        for view, source in template_manager.find_mirrored_views(vehicle, self.processor, tolerance=tolerance).items():
+            if source not in finished or view in finished:
+                continue
+            if cancel:
+                cancel.check()
+            template = self.processor.load_template(template_manager.get_template_path(vehicle, view))
+            mirrored[view] = self.processor.mirror_view(finished[source], template,
+                                                        self.processor.create_mask(template),
+                                                        unmirror_text=self.unmirror_text)
+            print(f"Mirrored {view} view from {source}")
+        return mirrored
+
+    # Stages. Each fills in its result on the work and returns the size of what it produced.
+
+    def _prepare(self, work: ViewWork, cancel: Optional[CancelToken]) -> int:
+        prepared = self.input_cache.get(work.template_path, **work.settings)
+        work.image_png, work.mask_png = prepared.image_png, prepared.mask_png
+        return len(work.image_png) + len(work.mask_png)
+
+    def _generate(self, work: ViewWork, cancel: Optional[CancelToken]) -> int:
+        generated = self.api_client.generate_inpainting(work.image_png, work.mask_png, work.prompt,
+                                                        work.view, seed=work.seed, cancel=cancel)
+        return self._store_generated(work, generated)
+
+    def _composite(self, work: ViewWork, cancel: Optional[CancelToken]) -> int:
+        if work.whole_template:
+            template = self.processor.load_template(work.template_path)
+            mask, box = self.processor.create_mask(template), None
+        else:
+            prepared = self.input_cache.get(work.template_path, **work.settings)
+            template, mask, box = prepared.template, prepared.mask, prepared.crop_box
+        # Saved results aren't kept, so each thread composites into the same
+        # buffer instead of allocating a full-size image per view - but only
+        # when save follows in the same call on this thread, or another
+        # view's composite could overwrite the buffer before it is saved
+        buffer = getattr(self._buffers, "image", None) if getattr(self._buffers, "saving", False) else None
+        work.final = self.processor.composite_result(template, work.generated, mask, out=buffer, box=box)
+        work.generated = None
+        return _image_bytes(work.final)
+
+    def _save(self, work: ViewWork, cancel: Optional[CancelToken]) -> int:
+        self.processor.save_image(work.final, work.output_path)
+        print(f"Saved {work.label or work.view} to {work.output_path}")
+
+        final = work.final
+        if work.mirrored:
+            final = self.save_mirrored(work.mirrored, final)
+        self._buffers.image = final
+        work.final = None
+        return work.output_path.stat().st_size
+
+    def _store_generated(self, work: ViewWork, generated: Optional[Image.Image]) -> int:
+        if generated is None:
+            raise GenerationFailed()
+        work.generated = generated
+        # The payloads aren't needed any more, so they don't travel on to the next stage
+        work.image_png = work.mask_png = None
+        return _image_bytes(generated)
+
+    # Plumbing
+
+    def _bind(self, work: ViewWork) -> None:
+        if work.settings is None:
+            work.settings = self.api_client.input_settings
+
+    def _groups(self, work: ViewWork, stages: Optional[Sequence[str]],
+                separate: Sequence[str] = ()) -> List[Tuple[str, ...]]:
+        """Split stages into runs sharing an executor or running inline (stages in separate run alone)"""
+        if stages is None:
+            stages = STAGES if work.output_path else STAGES[:-1]
+        groups: List[List[str]] = []
+        for stage in stages:
+            executor = self.executors.get(stage)
+            if groups and stage not in separate and groups[-1][0] not in separate \
+                    and self.executors.get(groups[-1][0]) is executor:
+                groups[-1].append(stage)
+            else:
+                groups.append([stage])
+        return [tuple(group) for group in groups]
+
+    def _run_stages(self, stages: Sequence[str], work: ViewWork, cancel: Optional[CancelToken],
+                    on_stage: Optional[Callable[[str], None]] = None) -> ViewWork:
+        """Run stages here, appending a sample per stage to the work"""
+        self._buffers.saving = "composite" in stages and "save" in stages
+        for stage in stages:
+            if cancel:
+                cancel.check()
+            if on_stage:
+                on_stage(stage)
+            start = time.perf_counter()
+            peak = _peak_rss()
+            try:
+                bytes_out = getattr(self, f"_{stage}")(work, cancel)
+            except Exception as e:
+                # Picked up by _record_error, also across processes
+                e.stage, e.stage_seconds = stage, time.perf_counter() - start
+                raise
+            work.samples.append(StageSample(stage, time.perf_counter() - start, bytes_out, _peak_rss() - peak))
+        return work
+
+    def _run_here(self, stages: Sequence[str], work: ViewWork, cancel: Optional[CancelToken],
+                  on_stage: Optional[Callable[[str], None]] = None) -> ViewWork:
+        self._bind(work)
+        try:
+            work = self._run_stages(stages, work, cancel, on_stage)
+        except Exception as e:
+            self._record_error(e, stages)
+            raise
+        self._collect(work)
+        return work
+
+    def _chain(self, inner: Future, stages: Sequence[str]) -> Future:
+        """Future of inner's work once its samples are recorded"""
+        outer = Future()
+        outer.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+
+        def done(f: Future) -> None:
+            if outer.cancelled():
+                return
+            if f.cancelled():
+                outer.cancel()
+                return
+            error = f.exception()
+            if error is not None:
+                self._record_error(error, stages)
+                outer.set_exception(error)
+            else:
+                outer.set_result(self._collect(f.result()))
+
+        inner.add_done_callback(done)
+        return outer
+
+    def _submit_async_generate(self, work: ViewWork, cancel: Optional[CancelToken]) -> Future:
+        outer = Future()
+        start = time.perf_counter()
+
+        def done(f: Future) -> None:
+            try:
+                outer.set_result(self._finish_generate(work, f.result(), start))
+            except BaseException as e:
+                self._record_error(e, ("generate",), time.perf_counter() - start)
+                outer.set_exception(e)
+
+        self.api_client.submit(work.image_png, work.mask_png, work.prompt, work.view,
+                               seed=work.seed, cancel=cancel).add_done_callback(done)
+        return outer
+
+    def _finish_generate(self, work: ViewWork, generated: Optional[Image.Image], start: float) -> ViewWork:
+        bytes_out = self._store_generated(work, generated)
+        work.samples.append(StageSample("generate", time.perf_counter() - start, bytes_out))
+        return self._collect(work)
+
+    def _collect(self, work: ViewWork) -> ViewWork:
+        self.stats.record(work.samples)
+        work.samples = []
+        return work
+
+    def _record_error(self, error: BaseException, stages: Sequence[str], seconds: float = 0.0) -> None:
+        if not isinstance(error, (Cancelled, asyncio.CancelledError)):
+            self.stats.record_error(getattr(error, "stage", stages[0]), getattr(error, "stage_seconds", seconds))
+
+
+def _image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+def _peak_rss() -> int:
+    """Peak memory of this process in bytes (0 where it can't be read)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Process pool workers (see create_process_pool). Each worker process keeps
+# its own pipeline, image processor and input cache from view to view.
+_worker: Optional[LiveryPipeline] = None
+
+
+def _init_worker(cache_dir: str, crop_padding: Optional[int], unmirror_text: bool,
+                 log_to_stderr: bool) -> None:
+    """Set up a worker process"""
+    global _worker
+    if log_to_stderr:
+        # Keep stdout clean for the parent (e.g. the CLI's JSONL results)
+        sys.stdout = sys.stderr
+
+    processor = ImageProcessor()
+    input_cache = PreparedInputCache(processor, cache_dir=cache_dir, crop_padding=crop_padding)
+    # Only the image stages run here - no API client needed
+    _worker = LiveryPipeline(None, processor, input_cache, unmirror_text=unmirror_text)
+
+
+def _run_in_worker(stages: Sequence[str], work: ViewWork) -> ViewWork:
+    return _worker._run_stages(stages, work, None)
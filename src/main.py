@@ -1,21 +1,53 @@
 """
 ER:LC Livery Maker - Main Entry Point
 """
+import time
+
+START_TIME = time.perf_counter()
+
+import argparse
+import multiprocessing
 import sys
-from PyQt6.QtWidgets import QApplication
-from livery_generator_window import LiveryGeneratorWindow
+
+from lazy_imports import ImportProfiler, preload
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ER:LC Livery Maker")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print per-module import cost and time to first window, then exit")
+    parser.add_argument("--startup-budget", type=float, default=1.5,
+                        help="Time-to-first-window budget in seconds for --startup-profile (exit 1 if over)")
+    return parser.parse_args()
 
 
 def main():
     """Main application entry point"""
-    app = QApplication(sys.argv)
+    args = parse_args()
+    profiler = ImportProfiler().install() if args.startup_profile else None
+
+    from PyQt6.QtWidgets import QApplication
+    from livery_generator_window import LiveryGeneratorWindow
+
+    app = QApplication(sys.argv[:1])
     app.setApplicationName("ER:LC Livery Maker")
 
     window = LiveryGeneratorWindow()
     window.show()
+    app.processEvents()
+    first_window = time.perf_counter() - START_TIME
+
+    if profiler:
+        profiler.uninstall()
+        print(profiler.report(first_window, args.startup_budget))
+        sys.exit(1 if first_window > args.startup_budget else 0)
 
+    # Warm up the heavy modules while the user is picking a vehicle
+    preload()
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
+    # Needed for the CPU worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
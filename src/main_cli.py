@@ -0,0 +1,347 @@
+"""
+ER:LC Livery Maker - Headless batch entry point
+
+Reads jobs as JSON lines, one job per line:
+
+    {"id": "unit-12", "vehicle": "Bullhorn Determinator SFP Fury 2022 ",
+     "views": ["Left", "Right"], "prompt": "police livery, blue stripes",
+     "model": "black-forest-labs/flux-fill-pro", "seed": 42}
+
+Only "vehicle" and "prompt" are required; "views" defaults to all five.
+Results are saved to <output>/<vehicle>/Livery_<view>.png, where a job may
+set "output_dir" to override <output>. One JSON result line is written to
+stdout per finished view. Log output goes to stderr so stdout stays valid
+JSONL.
+
+Every finished view is recorded in a run manifest under
+<cache_directory>/runs. After a crash or dropped connection, run the same
+command with --resume to generate only the views that are still missing.
+
+Usage:
+    python main_cli.py jobs.jsonl --output output --max-in-flight 8
+    python main_cli.py jobs.jsonl --output output --resume
+    cat jobs.jsonl | python main_cli.py -
+"""
+import argparse
+import dataclasses
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from template_manager import TemplateManager
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from result_cache import ResultCache
+from api_client import ReplicateAPIClient, DEFAULT_MODEL
+from inference_backend import create_backend
+from batch_generator import BatchGenerator, BatchJob
+from livery_pipeline import PipelineStats
+from run_checkpoint import RunCheckpoint
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from config.json if it exists"""
+    path = Path(config_path)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def read_jobs(stream: TextIO) -> Iterator[dict]:
+    """Lazily yield jobs from a JSONL stream, skipping blank and comment lines"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            yield {"id": line_number, "error": f"Invalid JSON: {e}"}
+            continue
+        if not isinstance(job, dict):
+            yield {"id": line_number, "error": "Job must be a JSON object"}
+            continue
+        job.setdefault("id", line_number)
+        yield job
+
+
+class CLIRunner:
+    """Streams jobs through the generation pipeline with a bounded in-flight window"""
+
+    def __init__(self, config: dict, output_dir: str, max_in_flight: int, out: TextIO,
+                 checkpoint: Optional[RunCheckpoint] = None):
+        self.config = config
+        self.checkpoint = checkpoint
+        self.output_dir = output_dir
+        self.max_in_flight = max_in_flight
+        self.out = out
+        self.api_key = config.get("replicate_api_key") or os.environ.get("REPLICATE_API_TOKEN", "")
+        self.backend = create_backend(config, self.api_key)
+
+        cache_dir = Path(config.get("cache_directory", "cache"))
+        self.template_manager = TemplateManager(config.get("templates_directory", "templates"))
+        self.processor = ImageProcessor()
+        self.input_cache = PreparedInputCache(
+            self.processor,
+            cache_dir=str(cache_dir / "prepared"),
+            crop_padding=config.get("crop_padding", 32) if config.get("crop_to_mask") else None
+        )
+        self.result_cache = ResultCache(
+            cache_dir=str(cache_dir / "results"),
+            max_bytes=int(config.get("result_cache_mb", 1024)) * 1024 * 1024
+        )
+
+        self.generators: Dict[str, BatchGenerator] = {}
+        self.stats = PipelineStats()  # Stage counters of every generator
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+
+    def get_generator(self, model: Optional[str]) -> BatchGenerator:
+        """One generator (and API client) per model"""
+        model = model or self.config.get("inpainting_model") or DEFAULT_MODEL
+        with self.lock:
+            if model not in self.generators:
+                client = ReplicateAPIClient(
+                    self.api_key,
+                    model=model,
+                    result_cache=self.result_cache,
+                    upload_mode=self.config.get("upload_mode", "data_uri"),
+                    backend=self.backend
+                )
+                self.generators[model] = BatchGenerator(
+                    client, self.processor, self.template_manager, self.input_cache,
+                    output_dir=self.output_dir, max_in_flight=self.max_in_flight,
+                    mirror_views=bool(self.config.get("mirror_views", False)),
+                    mirror_tolerance=float(self.config.get("mirror_tolerance", 0.01)),
+                    unmirror_text=bool(self.config.get("unmirror_text", False)),
+                    atlas_mode=bool(self.config.get("atlas_mode", False)),
+                    cpu_workers=int(self.config.get("cpu_workers", 0)),
+                    pipeline_stats=self.stats
+                )
+            return self.generators[model]
+
+    def emit(self, record: dict) -> None:
+        """Write one JSONL result record"""
+        with self.lock:
+            if record["status"] == "ok":
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.out.write(json.dumps(record) + "\n")
+            self.out.flush()
+
+    def run(self, jobs: Iterator[dict]) -> None:
+        """Run jobs; only max_in_flight views are ever queued or running"""
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="cli") as executor:
+            try:
+                for job in jobs:
+                    view_jobs = list(self.expand(job))
+                    if view_jobs and view_jobs[0][1].atlas_mode:
+                        # All of the job's views go out as one call
+                        self.slots.acquire()
+                        executor.submit(self.run_atlas, job, view_jobs[0][1], [v[2] for v in view_jobs])
+                        continue
+
+                    for view_job in view_jobs:
+                        # Block reading further input until a slot frees up
+                        self.slots.acquire()
+                        executor.submit(self.run_view, *view_job)
+                executor.shutdown(wait=True)
+            except KeyboardInterrupt:
+                # Cancel the predictions in flight too, rather than waiting (and paying) for them
+                print("Interrupted - cancelling the views in flight")
+                self.cancel()
+                raise
+
+        for generator in self.generators.values():
+            generator.close()
+
+    def cancel(self) -> None:
+        """Cancel every view that is running or not started yet"""
+        with self.lock:
+            generators = list(self.generators.values())
+        for generator in generators:
+            generator.cancel()
+
+    def expand(self, job: dict) -> Iterator[tuple]:
+        """Turn one input job into (job, generator, batch job) tuples, emitting errors directly"""
+        base = {"id": job.get("id"), "vehicle": job.get("vehicle")}
+
+        if "error" in job:
+            self.emit(dict(base, view=None, status="error", error=job["error"]))
+            return
+        if not job.get("vehicle") or not job.get("prompt"):
+            self.emit(dict(base, view=None, status="error", error="Job needs 'vehicle' and 'prompt'"))
+            return
+
+        try:
+            views = TemplateManager.check_views(job.get("views"))
+        except ValueError as e:
+            self.emit(dict(base, view=None, status="error", error=str(e)))
+            return
+
+        generator = self.get_generator(job.get("model"))
+        batch_jobs = {j.view: j for j in generator.build_jobs([job["vehicle"]], views)}
+        # Views mirrored from another view are built by that view's job
+        mirrored = {j.mirrored.view for j in batch_jobs.values() if j.mirrored}
+
+        for view in views:
+            if view in mirrored:
+                continue
+            if view not in batch_jobs:
+                self.emit(dict(base, view=view, status="error", error="Template not found"))
+                continue
+            batch_job = batch_jobs[view]
+            if job.get("output_dir"):
+                batch_job = self.relocate(batch_job, Path(job["output_dir"]))
+
+            if self.checkpoint:
+                # Skip views finished in an earlier run of the same jobs
+                key = functools.partial(self.view_key, job)
+                targets = [j for j in (batch_job, batch_job.mirrored) if j]
+                done = {j.view for j in targets if self.checkpoint.is_done(key(j))}
+                pending = generator.pending_jobs([batch_job], self.checkpoint, key=key)
+                for j in targets:
+                    if j.view in done:
+                        self.emit_record(job, j, None, 0.0, resumed=True)
+                    elif not pending:
+                        # Rebuilt from its already finished source
+                        self.emit_record(job, j, None, 0.0, mirrored_from=batch_job.view)
+                if not pending:
+                    continue
+                batch_job = pending[0]
+
+            yield job, generator, batch_job
+
+    @staticmethod
+    def view_key(job: dict, batch_job: BatchJob) -> str:
+        """Checkpoint key of one view of an input job (changes with its prompt, model, seed or output)"""
+        settings = json.dumps([job.get("prompt"), job.get("model"), job.get("seed"), str(batch_job.output_path)])
+        return f"{job.get('id')}/{batch_job.view}/{hashlib.sha256(settings.encode()).hexdigest()[:12]}"
+
+    @staticmethod
+    def relocate(batch_job: BatchJob, output_dir: Path) -> BatchJob:
+        """Copy of a batch job (and its mirrored view) saving under another output directory"""
+        mirrored = batch_job.mirrored and CLIRunner.relocate(batch_job.mirrored, output_dir)
+        output_path = output_dir / batch_job.vehicle / batch_job.output_path.name
+        return dataclasses.replace(batch_job, output_path=output_path, mirrored=mirrored)
+
+    def run_view(self, job: dict, generator: BatchGenerator, batch_job: BatchJob) -> None:
+        """Generate one view and emit its result record"""
+        start = time.monotonic()
+        error = None
+        try:
+            generator.run_job(batch_job, job["prompt"], seed=job.get("seed"))
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.slots.release()
+
+        self.emit_view(job, batch_job, error, time.monotonic() - start)
+
+    def run_atlas(self, job: dict, generator: BatchGenerator, batch_jobs: List[BatchJob]) -> None:
+        """Generate all of a job's views with one atlas call and emit a result record per view"""
+        start = time.monotonic()
+        error = None
+        try:
+            generator.run_atlas_jobs(batch_jobs, job["prompt"], seed=job.get("seed"))
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.slots.release()
+
+        for batch_job in batch_jobs:
+            self.emit_view(job, batch_job, error, time.monotonic() - start, atlas=True)
+
+    def emit_view(self, job: dict, batch_job: BatchJob, error: Optional[str], seconds: float,
+                  **extra) -> None:
+        """Emit (and checkpoint) the result of a view, and of the view mirrored from it"""
+        if self.checkpoint and not error:
+            self.checkpoint.mark_done(self.view_key(job, batch_job), batch_job.output_path)
+        self.emit_record(job, batch_job, error, seconds, **extra)
+
+        if batch_job.mirrored:
+            # Saved (or failed) together with its source view
+            self.emit_view(job, batch_job.mirrored, error, seconds, mirrored_from=batch_job.view, **extra)
+
+    def emit_record(self, job: dict, batch_job: BatchJob, error: Optional[str], seconds: float,
+                    **extra) -> None:
+        """Emit the result record of a single view"""
+        record = {"id": job.get("id"), "vehicle": batch_job.vehicle, "view": batch_job.view}
+        if error:
+            record.update(status="error", error=error)
+        else:
+            record.update(status="ok", output=str(batch_job.output_path))
+        record.update(extra, seconds=round(seconds, 2))
+        self.emit(record)
+
+
+def main():
+    """Headless batch entry point"""
+    parser = argparse.ArgumentParser(description="Generate liveries from a JSONL job file without a display")
+    parser.add_argument("jobs", help="JSONL job file, or '-' to read from stdin")
+    parser.add_argument("--output", default=None, help="Output directory (default: config output_directory)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Maximum views generated at once (default: config batch_max_in_flight or 4)")
+    parser.add_argument("--config", default="config.json", help="Path to config.json")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip views finished by an earlier, interrupted run of the same jobs")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    output_dir = args.output or config.get("output_directory", "output")
+    max_in_flight = max(1, args.max_in_flight or int(config.get("batch_max_in_flight", 4)))
+
+    # Keep stdout for JSONL results; everything printed by the pipeline goes to stderr
+    results_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    runs_dir = Path(config.get("cache_directory", "cache")) / "runs"
+    run_meta = {
+        "kind": "cli",
+        "jobs": args.jobs if args.jobs == "-" else os.path.abspath(args.jobs),
+        "output": os.path.abspath(output_dir),
+    }
+    RunCheckpoint.prune(runs_dir)
+    checkpoint = RunCheckpoint.open(runs_dir, run_meta, resume=args.resume)
+
+    runner = CLIRunner(config, output_dir, max_in_flight, results_out, checkpoint=checkpoint)
+    if not runner.api_key and runner.backend.requires_api_key:
+        print("No Replicate API key: set replicate_api_key in config.json or REPLICATE_API_TOKEN")
+        sys.exit(2)
+
+    start = time.monotonic()
+    interrupted = False
+    try:
+        if args.jobs == "-":
+            runner.run(read_jobs(sys.stdin))
+        else:
+            with open(args.jobs) as f:
+                runner.run(read_jobs(f))
+    except KeyboardInterrupt:
+        interrupted = True
+
+    print(f"Finished {runner.succeeded + runner.failed} views "
+          f"({runner.failed} failed) in {time.monotonic() - start:.1f}s")
+    print(runner.stats.summary())
+    if runner.failed or interrupted:
+        print("Run again with --resume to retry only the missing views")
+    else:
+        checkpoint.finish()
+    sys.exit(130 if interrupted else 1 if runner.failed else 0)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,502 @@
+"""
+ER:LC Livery Maker - Local HTTP service
+
+Runs the generation pipeline once for a whole team: every client submits
+jobs to the same queue and shares one API key, one template index, one
+set of prepared-input and result caches and one rate limit, instead of
+each GUI scanning, masking and uploading on its own.
+
+    POST   /jobs                       {"vehicle": ..., "prompt": ..., "views": [...],
+                                        "model": ..., "seed": ...}  -> 202 job
+    GET    /jobs                       all jobs, newest first
+    GET    /jobs/<id>                  job status with a status per view
+    GET    /jobs/<id>/views/<view>     finished view (PNG)
+    DELETE /jobs/<id>                  cancel the job's unfinished views
+    GET    /vehicles                   vehicles in the template library
+    GET    /status                     queue depth, cache and pipeline stage counters
+
+Only "vehicle" and "prompt" are required; "views" defaults to all five.
+Results are saved to <output>/<job id>/<vehicle>/Livery_<view>.png. With
+"service_token" set in config.json, requests need an
+"Authorization: Bearer <token>" header.
+
+Usage:
+    python main_service.py --port 8800
+    python main_service.py --host 0.0.0.0 --port 8800 --workers 8 --rate-limit 60
+"""
+import argparse
+import dataclasses
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from template_manager import TemplateManager
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from result_cache import ResultCache
+from api_client import ReplicateAPIClient, DEFAULT_MODEL
+from model_registry import MODELS, model_ref
+from inference_backend import create_backend
+from batch_generator import BatchGenerator, BatchJob
+from livery_pipeline import PipelineStats
+from cancellation import CancelToken, Cancelled
+from template_watcher import TemplateWatcher
+
+
+# Finished jobs kept for status queries before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from config.json if it exists"""
+    path = Path(config_path)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+class RateLimiter:
+    """Token bucket shared by every job: at most per_minute views started per minute"""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cancel: CancelToken) -> None:
+        """Wait for a token (raises Cancelled if cancel is cancelled while waiting)"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if cancel.wait(wait):
+                raise Cancelled()
+
+
+@dataclass
+class ServiceJob:
+    """A submitted job and the state of each of its views"""
+    id: str
+    vehicle: str
+    prompt: str
+    model: Optional[str] = None
+    seed: Optional[int] = None
+    cancel: CancelToken = field(default_factory=CancelToken)
+    # view -> {"status", "output", "error", "seconds"}; all views are added by submit, and each
+    # dict is replaced (set_view), never mutated, so status requests can read without the lock
+    views: Dict[str, dict] = field(default_factory=dict)
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        """"queued", "running", then "done", "failed" or "cancelled" """
+        statuses = {view["status"] for view in self.views.values()}
+        if statuses <= {"queued"}:
+            return "cancelled" if self.cancel.cancelled else "queued"
+        if statuses & {"queued", "running"}:
+            return "running"
+        if "failed" in statuses:
+            return "failed"
+        return "cancelled" if "cancelled" in statuses else "done"
+
+    def set_view(self, view: str, **changes) -> None:
+        """Update a view's state by replacing its dict, so readers never see one change size"""
+        self.views[view] = dict(self.views[view], **changes)
+
+    def to_json(self) -> dict:
+        views = {}
+        for name, view in self.views.items():
+            views[name] = {key: value for key, value in view.items() if key != "output"}
+            if view["status"] == "done":
+                views[name]["url"] = f"/jobs/{self.id}/views/{name}"
+        return {
+            "id": self.id,
+            "status": self.status,
+            "vehicle": self.vehicle,
+            "prompt": self.prompt,
+            "model": self.model,
+            "seed": self.seed,
+            "created_at": self.created,
+            "finished_at": self.finished,
+            "views": views,
+        }
+
+
+class LiveryService:
+    """
+    One shared job queue in front of the generation pipeline.
+
+    Views from every job go into a single FIFO queue served by a fixed
+    number of worker threads, so workers is the global limit on views in
+    flight; rate_limit additionally caps how many start per minute (views
+    answered from the result cache count too). All jobs share the
+    template index, prepared-input cache, result cache and one API client
+    per model, so templates are scanned and masked once for everybody.
+    """
+
+    def __init__(self, config: dict, output_dir: str, workers: int, rate_limit: float = 0):
+        """
+        Initialize service
+
+        Args:
+            config: Parsed config.json
+            output_dir: Root directory for results (<output>/<job id>/<vehicle>/...)
+            workers: Views generated at once, across all jobs
+            rate_limit: Views started per minute across all jobs (0 = no limit)
+        """
+        self.config = config
+        self.output_dir = Path(output_dir)
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate_limit, burst=self.workers) if rate_limit > 0 else None
+        self.api_key = config.get("replicate_api_key") or os.environ.get("REPLICATE_API_TOKEN", "")
+        self.backend = create_backend(config, self.api_key)
+
+        cache_dir = Path(config.get("cache_directory", "cache"))
+        self.template_manager = TemplateManager(config.get("templates_directory", "templates"))
+        self.processor = ImageProcessor()
+        self.input_cache = PreparedInputCache(
+            self.processor,
+            cache_dir=str(cache_dir / "prepared"),
+            crop_padding=config.get("crop_padding", 32) if config.get("crop_to_mask") else None
+        )
+        self.result_cache = ResultCache(
+            cache_dir=str(cache_dir / "results"),
+            max_bytes=int(config.get("result_cache_mb", 1024)) * 1024 * 1024
+        )
+        self.stats = PipelineStats()  # Stage counters of every generator
+        self.template_watcher: Optional[TemplateWatcher] = None
+
+        self.generators: Dict[str, BatchGenerator] = {}
+        self.jobs: "OrderedDict[str, ServiceJob]" = OrderedDict()
+        self.tasks: "queue.Queue[Tuple[ServiceJob, BatchGenerator, BatchJob]]" = queue.Queue()
+        self.busy = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> "LiveryService":
+        """Start the worker threads (and the template watcher, unless watch_templates is off)"""
+        if self.config.get("watch_templates", True):
+            self.template_watcher = TemplateWatcher(self.template_manager, self.input_cache).start()
+        for i in range(self.workers):
+            threading.Thread(target=self.work, name=f"service-worker-{i}", daemon=True).start()
+        return self
+
+    def get_generator(self, model: Optional[str]) -> BatchGenerator:
+        """One generator (and API client) per model, shared by every job"""
+        model = model or self.config.get("inpainting_model") or DEFAULT_MODEL
+        with self.lock:
+            if model not in self.generators:
+                client = ReplicateAPIClient(
+                    self.api_key,
+                    model=model,
+                    result_cache=self.result_cache,
+                    upload_mode=self.config.get("upload_mode", "data_uri"),
+                    backend=self.backend
+                )
+                self.generators[model] = BatchGenerator(
+                    client, self.processor, self.template_manager, self.input_cache,
+                    output_dir=str(self.output_dir), max_in_flight=self.workers,
+                    mirror_views=bool(self.config.get("mirror_views", False)),
+                    mirror_tolerance=float(self.config.get("mirror_tolerance", 0.01)),
+                    unmirror_text=bool(self.config.get("unmirror_text", False)),
+                    cpu_workers=int(self.config.get("cpu_workers", 0)),
+                    pipeline_stats=self.stats
+                )
+            return self.generators[model]
+
+    def submit(self, request: dict) -> ServiceJob:
+        """
+        Queue a job
+
+        Raises:
+            ValueError: If the request is invalid or names an unknown vehicle, view or model
+        """
+        vehicle, prompt = request.get("vehicle"), request.get("prompt")
+        if not isinstance(vehicle, str) or not isinstance(prompt, str) or not prompt.strip():
+            raise ValueError("Job needs 'vehicle' and 'prompt'")
+        if vehicle not in self.template_manager.get_vehicle_names():
+            raise ValueError(f"Unknown vehicle '{vehicle}'")
+        views = TemplateManager.check_views(request.get("views"))
+
+        # Every model gets its own generator and client for good, so only known ones are accepted
+        model = request.get("model")
+        if model is not None:
+            if not isinstance(model, str):
+                raise ValueError("'model' must be a string")
+            if model in MODELS:
+                model = model_ref(model)
+            elif model not in {model_ref(model_id) for model_id in MODELS} | {self.config.get("inpainting_model")}:
+                raise ValueError(f"Unknown model '{model}'")
+        seed = request.get("seed")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            raise ValueError("'seed' must be an integer")
+
+        job = ServiceJob(uuid.uuid4().hex[:12], vehicle, prompt, model=model, seed=seed)
+        generator = self.get_generator(job.model)
+        batch_jobs = [self.relocate(batch_job, self.output_dir / job.id)
+                      for batch_job in generator.build_jobs([vehicle], views)]
+
+        for view in views:
+            job.views[view] = {"status": "failed", "error": "Template not found"}
+        for batch_job in batch_jobs:
+            job.views[batch_job.view] = {"status": "queued"}
+            if batch_job.mirrored:
+                job.views[batch_job.mirrored.view] = {"status": "queued", "mirrored_from": batch_job.view}
+
+        if not batch_jobs:
+            job.finished = time.time()
+        with self.lock:
+            self.jobs[job.id] = job
+            self.forget_finished()
+        for batch_job in batch_jobs:
+            self.tasks.put((job, generator, batch_job))
+        print(f"Queued job {job.id}: {vehicle}, {len(batch_jobs)} view(s)")
+        return job
+
+    @staticmethod
+    def relocate(batch_job: BatchJob, output_dir: Path) -> BatchJob:
+        """Copy of a batch job (and its mirrored view) saving under another output directory"""
+        mirrored = batch_job.mirrored and LiveryService.relocate(batch_job.mirrored, output_dir)
+        output_path = output_dir / batch_job.vehicle / batch_job.output_path.name
+        return dataclasses.replace(batch_job, output_path=output_path, mirrored=mirrored)
+
+    def cancel(self, job_id: str) -> Optional[ServiceJob]:
+        """Cancel a job: queued views are dropped and running predictions cancelled"""
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel.cancel()
+        return job
+
+    def work(self) -> None:
+        """Worker thread: generate queued views one at a time"""
+        while True:
+            job, generator, batch_job = self.tasks.get()
+            targets = [j for j in (batch_job, batch_job.mirrored) if j]
+            start = time.monotonic()
+            error = None
+            with self.lock:
+                self.busy += 1
+            try:
+                job.cancel.check()
+                if self.limiter:
+                    self.limiter.acquire(job.cancel)
+                for target in targets:
+                    job.set_view(target.view, status="running")
+                generator.run_job(batch_job, job.prompt, seed=job.seed, cancel=job.cancel)
+            except Cancelled:
+                error = "Cancelled"
+            except Exception as e:
+                error = str(e)
+            finally:
+                with self.lock:
+                    self.busy -= 1
+
+            seconds = round(time.monotonic() - start, 2)
+            with self.lock:
+                for target in targets:
+                    if error is None:
+                        job.set_view(target.view, status="done", seconds=seconds, output=str(target.output_path))
+                    else:
+                        job.set_view(target.view, status="cancelled" if error == "Cancelled" else "failed",
+                                     seconds=seconds, error=error)
+                finished = job.finished is None and job.status not in ("queued", "running")
+                if finished:
+                    job.finished = time.time()
+            if finished:
+                print(f"Job {job.id} {job.status}")
+
+    def forget_finished(self) -> None:
+        """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS (call with the lock held)"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def status(self) -> dict:
+        """Queue depth, cache savings and pipeline counters"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+            busy = self.busy
+        return {
+            "workers": self.workers,
+            "busy": busy,
+            "queued_views": self.tasks.qsize(),
+            "jobs": {status: sum(1 for job in jobs if job.status == status)
+                     for status in ("queued", "running", "done", "failed", "cancelled")},
+            "rate_limit_per_minute": self.limiter.rate * 60 if self.limiter else None,
+            "result_cache": self.result_cache.stats(),
+            "stages": self.stats.to_dict(),
+        }
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; `service` and `token` are set on a per-server subclass"""
+
+    service: LiveryService
+    token: Optional[str]
+    protocol_version = "HTTP/1.1"
+
+    JOB_RE = re.compile(r"^/jobs/([0-9a-f]+)$")
+    VIEW_RE = re.compile(r"^/jobs/([0-9a-f]+)/views/([A-Za-z]+)$")
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, code: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def authorized(self) -> bool:
+        if not self.token:
+            return True
+        given = self.headers.get("Authorization", "")
+        if hmac.compare_digest(given, f"Bearer {self.token}"):
+            return True
+        self.send_json(401, {"detail": "Missing or wrong bearer token"})
+        return False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.authorized():
+            return
+        if self.path != "/jobs":
+            self.send_json(404, {"detail": "Not found"})
+            return
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            job = self.service.submit(request)
+        except ValueError as e:
+            self.send_json(400, {"detail": str(e)})
+            return
+        self.send_json(202, job.to_json())
+
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        match = self.JOB_RE.match(self.path)
+        job = self.service.cancel(match.group(1)) if match else None
+        if job is None:
+            self.send_json(404, {"detail": "Not found"})
+        else:
+            self.send_json(200, job.to_json())
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        service = self.service
+
+        if self.path == "/jobs":
+            with service.lock:
+                jobs = list(service.jobs.values())
+            self.send_json(200, [job.to_json() for job in reversed(jobs)])
+            return
+        if self.path == "/vehicles":
+            self.send_json(200, service.template_manager.get_vehicle_names())
+            return
+        if self.path == "/status":
+            self.send_json(200, service.status())
+            return
+
+        match = self.JOB_RE.match(self.path)
+        if match:
+            job = service.jobs.get(match.group(1))
+            if job is None:
+                self.send_json(404, {"detail": "Not found"})
+            else:
+                self.send_json(200, job.to_json())
+            return
+
+        match = self.VIEW_RE.match(self.path)
+        job = service.jobs.get(match.group(1)) if match else None
+        view = job.views.get(match.group(2)) if job else None
+        if view is None:
+            self.send_json(404, {"detail": "Not found"})
+        elif view["status"] != "done":
+            self.send_json(409, {"detail": f"View is {view['status']}"})
+        else:
+            data = Path(view["output"]).read_bytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+
+def create_server(service: LiveryService, host: str, port: int, token: Optional[str] = None) -> ThreadingHTTPServer:
+    """HTTP server exposing a service (port 0 = any free port)"""
+    handler = type("LiveryServiceHandler", (_Handler,), {"service": service, "token": token})
+    return _HTTPServer((host, port), handler)
+
+
+def main():
+    """Service entry point"""
+    parser = argparse.ArgumentParser(description="Serve the livery generation pipeline over a local HTTP API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for the whole LAN)")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--output", default=None, help="Output directory (default: config output_directory)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Views generated at once across all jobs (default: config batch_max_in_flight or 4)")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Views started per minute across all jobs (default: config service_rate_limit, 0 = none)")
+    parser.add_argument("--config", default="config.json", help="Path to config.json")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    workers = args.workers or int(config.get("batch_max_in_flight", 4))
+    rate_limit = args.rate_limit if args.rate_limit is not None else float(config.get("service_rate_limit", 0))
+    token = config.get("service_token") or None
+
+    service = LiveryService(config, args.output or config.get("output_directory", "output"), workers, rate_limit)
+    if not service.api_key and service.backend.requires_api_key:
+        print("No Replicate API key: set replicate_api_key in config.json or REPLICATE_API_TOKEN")
+        sys.exit(2)
+    if args.host not in ("127.0.0.1", "localhost") and not token:
+        print("Warning: listening beyond this machine without a service_token - anyone on the network can submit jobs")
+
+    server = create_server(service.start(), args.host, args.port, token)
+    print(f"Livery service listening on http://{args.host}:{server.server_address[1]} "
+          f"({service.workers} workers"
+          + (f", {rate_limit:g} views/min" if rate_limit > 0 else "") + ")")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down - cancelling unfinished jobs")
+        with service.lock:
+            jobs = list(service.jobs.values())
+        for job in jobs:
+            job.cancel.cancel()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -1,17 +1,55 @@
 """
 ER:LC Livery Maker - Main Entry Point (Tkinter version)
 """
+import time
+
+START_TIME = time.perf_counter()
+
+import argparse
+import multiprocessing
 import sys
 import tkinter as tk
-from livery_generator_window_tk import LiveryGeneratorApp
+
+from lazy_imports import ImportProfiler, preload
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ER:LC Livery Maker")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print per-module import cost and time to first window, then exit")
+    parser.add_argument("--startup-budget", type=float, default=1.5,
+                        help="Time-to-first-window budget in seconds for --startup-profile (exit 1 if over)")
+    return parser.parse_args()
 
 
 def main():
     """Main application entry point"""
+    args = parse_args()
+    profiler = ImportProfiler().install() if args.startup_profile else None
+
+    # Imported here so the profiler sees it; OpenCV, NumPy and replicate are
+    # loaded lazily and only pulled in after the window is up
+    from livery_generator_window_tk import LiveryGeneratorApp
+
     root = tk.Tk()
     app = LiveryGeneratorApp(root)
+
+    root.wait_visibility()
+    root.update_idletasks()
+    first_window = time.perf_counter() - START_TIME
+
+    if profiler:
+        profiler.uninstall()
+        print(profiler.report(first_window, args.startup_budget))
+        root.destroy()
+        sys.exit(1 if first_window > args.startup_budget else 0)
+
+    # Warm up the heavy modules while the user is picking a vehicle
+    preload()
     root.mainloop()
 
 
 if __name__ == "__main__":
+    # Needed for the CPU worker processes in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,478 @@
+"""
+Mock Replicate - Local stand-in for the Replicate HTTP API
+
+Implements the parts of the API the app uses (creating, polling and
+cancelling predictions, completion webhooks, model versions, Files API
+uploads and output downloads) with configurable latency, error rates and
+output images, so the full pipeline can be load-tested offline without
+spending money.
+
+Run standalone and point config.json "replicate_base_url" at it:
+
+    python mock_replicate.py --port 8765 --latency lognormal:8,0.4 --error-rate 0.05
+"""
+import argparse
+import base64
+import colorsys
+import heapq
+import io
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+DEFAULT_OUTPUT_SIZE = (1024, 1024)
+
+
+class LatencyDistribution:
+    """
+    Prediction latency in seconds, parsed from a spec string:
+
+        fixed:5             always 5s
+        uniform:2,10        uniformly between 2s and 10s
+        normal:8,2          mean 8s, standard deviation 2s
+        lognormal:8,0.4     median 8s, sigma 0.4 (long right tail, like real queues)
+        exponential:8       mean 8s
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+    def __init__(self, spec: str = "fixed:1", rng: Optional[random.Random] = None):
+        kind, _, args = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}', expected one of {self.KINDS}")
+        self.spec = spec
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        """Draw one latency in seconds (never negative)"""
+        a = self.args
+        if self.kind == "fixed":
+            value = a[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(a[0], a[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(a[0], a[1])
+        elif self.kind == "lognormal":
+            value = self.rng.lognormvariate(math.log(a[0]), a[1])
+        else:
+            value = self.rng.expovariate(1 / a[0])
+        return max(0.0, value)
+
+
+class MockPrediction:
+    """Server-side state of one mock prediction"""
+
+    def __init__(self, prediction_id: str, model: str, version: Optional[str], inputs: dict,
+                 latency: float, fails: bool, output_size: Tuple[int, int],
+                 webhook: Optional[str] = None, webhook_events_filter: Optional[List[str]] = None):
+        self.id = prediction_id
+        self.model = model
+        self.version = version
+        self.input = inputs
+        self.latency = latency
+        self.fails = fails
+        self.output_size = output_size
+        self.webhook = webhook
+        self.webhook_events_filter = webhook_events_filter
+        self.created = time.time()
+        self.canceled_at: Optional[float] = None
+        self.webhook_sent = False
+
+    @property
+    def status(self) -> str:
+        if self.canceled_at is not None:
+            return "canceled"
+        elapsed = time.time() - self.created
+        if elapsed >= self.latency:
+            return "failed" if self.fails else "succeeded"
+        return "starting" if elapsed < min(0.5, self.latency / 10) else "processing"
+
+    def to_json(self, base_url: str) -> dict:
+        status = self.status
+        stamp = lambda t: datetime.fromtimestamp(t, timezone.utc).isoformat()
+        finished = status in ("succeeded", "failed", "canceled")
+        return {
+            "id": self.id,
+            "model": self.model,
+            "version": self.version or "mock",
+            "status": status,
+            "input": {k: v for k, v in self.input.items() if k not in ("image", "mask")},
+            "output": f"{base_url}/outputs/{self.id}.png" if status == "succeeded" else None,
+            "logs": "",
+            "error": "Mock prediction failed" if status == "failed" else None,
+            "metrics": {"predict_time": self.latency} if finished else {},
+            "created_at": stamp(self.created),
+            "started_at": stamp(self.created),
+            "completed_at": stamp(self.canceled_at or self.created + self.latency) if finished else None,
+            "webhook": self.webhook,
+            "urls": {
+                "get": f"{base_url}/v1/predictions/{self.id}",
+                "cancel": f"{base_url}/v1/predictions/{self.id}/cancel",
+            },
+        }
+
+
+class MockReplicateServer:
+    """
+    Threaded HTTP server that behaves like the Replicate API.
+
+    Predictions finish after a latency drawn from a LatencyDistribution; a
+    share of them fail (error_rate) and a share of create requests are
+    rejected with HTTP 503 (http_error_rate). Outputs are either a fixed
+    image file or a solid color image the size of the submitted template.
+
+    Predictions created with a webhook get the "completed" webhook POSTed
+    when they finish or are cancelled (other events are not sent). One
+    scheduler thread covers every pending prediction, so thousands can be
+    waiting at once.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:1",
+                 error_rate: float = 0.0, http_error_rate: float = 0.0,
+                 output_image: Optional[str] = None, seed: Optional[int] = None):
+        """
+        Initialize mock server
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 = pick a free port)
+            latency: Latency distribution spec (see LatencyDistribution)
+            error_rate: Fraction of predictions that end with status "failed"
+            http_error_rate: Fraction of create requests answered with HTTP 503
+            output_image: Image file returned as every prediction's output
+            seed: Random seed for reproducible runs
+        """
+        self.rng = random.Random(seed)
+        self.latency = LatencyDistribution(latency, self.rng)
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.output_png = Path(output_image).read_bytes() if output_image else None
+
+        self.predictions: Dict[str, MockPrediction] = {}
+        self.files: Dict[str, bytes] = {}
+        self.counts = {"created": 0, "rejected": 0, "canceled": 0, "polls": 0, "downloads": 0,
+                       "uploads": 0, "webhooks": 0, "webhook_errors": 0}
+        self._outputs: Dict[Tuple[int, int, int], bytes] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # (due time, prediction ID) of webhooks still to send
+        self._webhook_queue: List[Tuple[float, str]] = []
+        self._webhook_wakeup = threading.Condition(self._lock)
+        self._webhook_senders: Optional[ThreadPoolExecutor] = None
+        self._stopping = False
+
+        handler = type("MockReplicateHandler", (_Handler,), {"mock": self})
+        self.httpd = _HTTPServer((host, port), handler)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockReplicateServer":
+        """Serve requests in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-replicate", daemon=True)
+        self.thread.start()
+        self._webhook_senders = ThreadPoolExecutor(max_workers=8, thread_name_prefix="mock-webhook")
+        threading.Thread(target=self._schedule_webhooks, name="mock-webhook-scheduler", daemon=True).start()
+        print(f"Mock Replicate API listening on {self.base_url} (latency {self.latency.spec}, "
+              f"error rate {self.error_rate:.0%}, HTTP error rate {self.http_error_rate:.0%})")
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down"""
+        with self._lock:
+            self._stopping = True
+            self._webhook_wakeup.notify()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._webhook_senders:
+            self._webhook_senders.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Counts of predictions by status plus request counters"""
+        with self._lock:
+            statuses = [p.status for p in self.predictions.values()]
+            counts = dict(self.counts)
+        for status in ("starting", "processing", "succeeded", "failed"):
+            counts[status] = statuses.count(status)
+        return counts
+
+    def create_prediction(self, model: str, version: Optional[str], inputs: dict,
+                          webhook: Optional[str] = None,
+                          webhook_events_filter: Optional[List[str]] = None) -> Optional[MockPrediction]:
+        """Register a new prediction, or None to simulate a rejected request"""
+        with self._lock:
+            if self.rng.random() < self.http_error_rate:
+                self.counts["rejected"] += 1
+                return None
+            prediction = MockPrediction(
+                f"mock{next(self._ids):06d}", model, version, inputs,
+                latency=self.latency.sample(),
+                fails=self.rng.random() < self.error_rate,
+                output_size=self._input_size(inputs.get("image")),
+                webhook=webhook, webhook_events_filter=webhook_events_filter,
+            )
+            self.predictions[prediction.id] = prediction
+            self.counts["created"] += 1
+            if webhook and "completed" in (webhook_events_filter or ["completed"]):
+                self._queue_webhook(prediction.created + prediction.latency, prediction.id)
+        return prediction
+
+    def cancel_prediction(self, prediction_id: str) -> Optional[MockPrediction]:
+        with self._lock:
+            prediction = self.predictions.get(prediction_id)
+            if prediction and prediction.status in ("starting", "processing"):
+                prediction.canceled_at = time.time()
+                self.counts["canceled"] += 1
+                if prediction.webhook and "completed" in (prediction.webhook_events_filter or ["completed"]):
+                    self._queue_webhook(prediction.canceled_at, prediction.id)
+        return prediction
+
+    def _queue_webhook(self, due: float, prediction_id: str) -> None:
+        """Schedule a prediction's completion webhook (call with the lock held)"""
+        heapq.heappush(self._webhook_queue, (due, prediction_id))
+        self._webhook_wakeup.notify()
+
+    def _schedule_webhooks(self) -> None:
+        """Hand each completion webhook to a sender thread once it is due"""
+        with self._lock:
+            while not self._stopping:
+                now = time.time()
+                if not self._webhook_queue or self._webhook_queue[0][0] > now:
+                    timeout = self._webhook_queue[0][0] - now if self._webhook_queue else None
+                    self._webhook_wakeup.wait(timeout)
+                    continue
+
+                _, prediction_id = heapq.heappop(self._webhook_queue)
+                prediction = self.predictions[prediction_id]
+                # A cancelled prediction is also queued for its original finish time
+                if prediction.webhook_sent:
+                    continue
+                prediction.webhook_sent = True
+                self._webhook_senders.submit(self._send_webhook, prediction)
+
+    def _send_webhook(self, prediction: MockPrediction, retries: int = 3) -> None:
+        """POST the prediction to its webhook, retrying like Replicate does"""
+        body = json.dumps(prediction.to_json(self.base_url)).encode()
+        for attempt in range(retries + 1):
+            request = urllib.request.Request(
+                prediction.webhook, data=body, headers={"Content-Type": "application/json"}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=10):
+                    pass
+                with self._lock:
+                    self.counts["webhooks"] += 1
+                return
+            except OSError:
+                if attempt < retries:
+                    time.sleep(0.5 * 2 ** attempt)
+        with self._lock:
+            self.counts["webhook_errors"] += 1
+
+    def output_for(self, prediction_id: str) -> Optional[bytes]:
+        """PNG bytes of a succeeded prediction's output"""
+        prediction = self.predictions.get(prediction_id)
+        if prediction is None or prediction.status != "succeeded":
+            return None
+        with self._lock:
+            self.counts["downloads"] += 1
+        if self.output_png is not None:
+            return self.output_png
+
+        # One of a few hues per size, so encoding cost doesn't dominate load tests
+        hue = int(prediction.id[4:]) % 8
+        key = (*prediction.output_size, hue)
+        if key not in self._outputs:
+            rgb = tuple(int(c * 255) for c in colorsys.hsv_to_rgb(hue / 8, 0.7, 0.9))
+            buffered = io.BytesIO()
+            Image.new("RGB", prediction.output_size, rgb).save(buffered, format="PNG")
+            self._outputs[key] = buffered.getvalue()
+        return self._outputs[key]
+
+    def store_file(self, data: bytes) -> str:
+        with self._lock:
+            file_id = f"file{next(self._ids):06d}"
+            self.files[file_id] = data
+            self.counts["uploads"] += 1
+        return f"{self.base_url}/files/{file_id}"
+
+    def _input_size(self, image) -> Tuple[int, int]:
+        """Size of the submitted template (data URI or uploaded file URL)"""
+        data = None
+        if isinstance(image, str) and image.startswith("data:"):
+            data = base64.b64decode(image.split(",", 1)[1])
+        elif isinstance(image, str) and "/files/" in image:
+            data = self.files.get(image.rsplit("/", 1)[1])
+        if not data:
+            return DEFAULT_OUTPUT_SIZE
+        try:
+            # Only reads the header
+            with Image.open(io.BytesIO(data)) as img:
+                return img.size
+        except OSError:
+            return DEFAULT_OUTPUT_SIZE
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; `mock` is set on a per-server subclass"""
+
+    mock: MockReplicateServer
+    protocol_version = "HTTP/1.1"
+
+    PREDICTION_RE = re.compile(r"^/v1/predictions/([^/]+)$")
+    CANCEL_RE = re.compile(r"^/v1/predictions/([^/]+)/cancel$")
+    MODEL_PREDICTIONS_RE = re.compile(r"^/v1/models/([^/]+)/([^/]+)/predictions$")
+    VERSION_RE = re.compile(r"^/v1/models/([^/]+)/([^/]+)/versions/([^/]+)$")
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, code: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_png(self, data: bytes) -> None:
+        # Honor "Range: bytes=N-" so resumed downloads work
+        start = 0
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match and int(match.group(1)) < len(data):
+            start = int(match.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        body = self.read_body()
+
+        if self.path == "/v1/files":
+            # Keep just the file part of the multipart body
+            start = body.find(b"\x89PNG")
+            data = body[start:] if start >= 0 else body
+            self.send_json(201, {"urls": {"get": self.mock.store_file(data)}})
+            return
+
+        match = self.CANCEL_RE.match(self.path)
+        if match:
+            prediction = self.mock.cancel_prediction(match.group(1))
+            if prediction is None:
+                self.send_json(404, {"detail": "Not found"})
+            else:
+                self.send_json(200, prediction.to_json(self.mock.base_url))
+            return
+
+        match = self.MODEL_PREDICTIONS_RE.match(self.path)
+        if self.path != "/v1/predictions" and not match:
+            self.send_json(404, {"detail": "Not found"})
+            return
+
+        request = json.loads(body or b"{}")
+        model = "/".join(match.groups()) if match else "mock/model"
+        prediction = self.mock.create_prediction(
+            model, request.get("version"), request.get("input", {}),
+            webhook=request.get("webhook"), webhook_events_filter=request.get("webhook_events_filter")
+        )
+        if prediction is None:
+            self.send_json(503, {"detail": "Mock server is overloaded"})
+        else:
+            self.send_json(201, prediction.to_json(self.mock.base_url))
+
+    def do_GET(self):
+        match = self.PREDICTION_RE.match(self.path)
+        if match:
+            with self.mock._lock:
+                self.mock.counts["polls"] += 1
+            prediction = self.mock.predictions.get(match.group(1))
+            if prediction is None:
+                self.send_json(404, {"detail": "Not found"})
+            else:
+                self.send_json(200, prediction.to_json(self.mock.base_url))
+            return
+
+        match = self.VERSION_RE.match(self.path)
+        if match:
+            self.send_json(200, {
+                "id": match.group(3),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "cog_version": "0.9.0",
+                "openapi_schema": {"components": {"schemas": {"Output": {"type": "string", "format": "uri"}}}},
+            })
+            return
+
+        data = None
+        if self.path.startswith("/outputs/"):
+            data = self.mock.output_for(Path(self.path).stem)
+        elif self.path.startswith("/files/"):
+            data = self.mock.files.get(self.path.rsplit("/", 1)[1])
+
+        if data is None:
+            self.send_json(404, {"detail": "Not found"})
+        else:
+            self.send_png(data)
+
+
+def main():
+    """Run the mock server until interrupted"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the Replicate API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:8,0.4",
+                        help="Latency distribution, e.g. fixed:5, uniform:2,10, lognormal:8,0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of predictions that fail")
+    parser.add_argument("--http-error-rate", type=float, default=0.0,
+                        help="Fraction of create requests rejected with HTTP 503")
+    parser.add_argument("--output-image", default=None, help="Image returned by every prediction")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockReplicateServer(
+        host=args.host, port=args.port, latency=args.latency,
+        error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+        output_image=args.output_image, seed=args.seed
+    ).start()
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Stats: {server.stats()}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Model Registry - What each inpainting model accepts, costs and expects
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Capabilities and input conventions of one inpainting model"""
+    id: str                    # owner/name, without a version hash
+    name: str                  # Display name
+    cost: float                # Approximate USD per generated image (see MODELS.md)
+    max_size: int              # Longest side the model accepts
+    optimal_pixels: int        # Pixel count the model works at; larger inputs are downscaled to this
+    multiple: int = 8          # Width and height are rounded to a multiple of this
+    min_size: int = 256        # Shortest side the model accepts
+    inverts_mask: bool = False  # True if the model expects black = inpaint, white = preserve
+    # Generic parameter -> model input name ("negative_prompt", "steps",
+    # "guidance"); parameters the model doesn't take are left out
+    param_names: Dict[str, str] = field(default_factory=dict)
+    guidance_multiplier: float = 1.0  # Applied to the generic 1-20 guidance scale
+    extra_params: Dict[str, Any] = field(default_factory=dict)
+    quality: str = ""
+    cost_note: str = ""
+
+    def build_input_params(self, prompt: str, negative_prompt: str, num_inference_steps: int,
+                           guidance_scale: float, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Map generic generation settings to this model's input names (image and mask are added later)"""
+        generic = {
+            "negative_prompt": negative_prompt,
+            "steps": num_inference_steps,
+            "guidance": guidance_scale * self.guidance_multiplier,
+        }
+        input_params: Dict[str, Any] = {"prompt": prompt}
+        for name, value in generic.items():
+            if name in self.param_names:
+                input_params[self.param_names[name]] = value
+        input_params.update(self.extra_params)
+
+        if seed is not None:
+            input_params["seed"] = seed
+
+        return input_params
+
+
+# Parameter conventions shared by each model family
+IDEOGRAM_PARAMS = dict(
+    inverts_mask=True,
+    # Optimize prompts automatically
+    extra_params={"magic_prompt_option": "Auto", "style_type": "Auto"},
+)
+FLUX_PARAMS = dict(
+    param_names={"steps": "steps", "guidance": "guidance"},
+    guidance_multiplier=8,  # FLUX uses a higher scale (1.5-100 vs 1-20)
+    extra_params={"output_format": "png"},
+)
+SD_PARAMS = dict(
+    param_names={"negative_prompt": "negative_prompt", "steps": "num_inference_steps",
+                 "guidance": "guidance_scale"},
+)
+
+
+MODELS: Dict[str, ModelSpec] = {spec.id: spec for spec in [
+    ModelSpec(
+        id="ideogram-ai/ideogram-v3-turbo",
+        name="Ideogram v3 Turbo - BEST FOR TEXT",
+        cost=0.03, max_size=1536, optimal_pixels=1024 * 1024, multiple=16,
+        quality="⭐⭐⭐⭐⭐ (text)", cost_note="$0.03/image ($0.15/livery)",
+        **IDEOGRAM_PARAMS
+    ),
+    ModelSpec(
+        id="black-forest-labs/flux-fill-pro",
+        name="FLUX.1 Fill [pro] - BEST QUALITY",
+        cost=0.05, max_size=2048, optimal_pixels=2 * 1024 * 1024, multiple=32,
+        quality="⭐⭐⭐⭐⭐", cost_note="$0.05/image ($0.25/livery)",
+        **FLUX_PARAMS
+    ),
+    ModelSpec(
+        id="zsxkib/flux-dev-inpainting",
+        name="FLUX Dev Inpainting - HIGH QUALITY",
+        cost=0.015, max_size=1440, optimal_pixels=1024 * 1024, multiple=16,
+        quality="⭐⭐⭐⭐", cost_note="$0.01-0.02/image ($0.05-0.10/livery)",
+        **FLUX_PARAMS
+    ),
+    ModelSpec(
+        id="stability-ai/stable-diffusion-inpainting",
+        name="Stable Diffusion - BUDGET (Testing Only)",
+        cost=0.0027, max_size=1024, optimal_pixels=512 * 512, multiple=64,
+        quality="⭐⭐", cost_note="$0.0027/image ($0.01/livery)",
+        **SD_PARAMS
+    ),
+]}
+
+# Versioned references for models that need one
+MODEL_VERSIONS = {
+    "stability-ai/stable-diffusion-inpainting":
+        "95b7223104132402a9ae91cc677285bc5eb997834bd2349fa486f53910fd68b3",
+}
+
+DEFAULT_MODEL = "stability-ai/stable-diffusion-inpainting:" + MODEL_VERSIONS["stability-ai/stable-diffusion-inpainting"]
+
+
+def model_ref(model_id: str) -> str:
+    """Reference to pass to Replicate (owner/name, plus the version where one is pinned)"""
+    if ":" in model_id or model_id not in MODEL_VERSIONS:
+        return model_id
+    return f"{model_id}:{MODEL_VERSIONS[model_id]}"
+
+
+def get_model_spec(model: str) -> ModelSpec:
+    """
+    Look up a model by reference (a version hash is ignored)
+
+    Models that aren't registered get a spec for their family (Ideogram,
+    FLUX or Stable Diffusion style parameters) with conservative limits.
+    """
+    model_id = model.split(":")[0]
+    if model_id in MODELS:
+        return MODELS[model_id]
+
+    lowered = model_id.lower()
+    if "ideogram" in lowered:
+        family = IDEOGRAM_PARAMS
+    elif "flux" in lowered:
+        family = FLUX_PARAMS
+    else:
+        family = SD_PARAMS
+    return ModelSpec(id=model_id, name=model_id, cost=0.0, max_size=2048,
+                     optimal_pixels=1024 * 1024, **family)
@@ -0,0 +1,158 @@
+"""
+Result Cache - Content-addressed cache of generated images
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from PIL import Image
+
+
+class ResultCache:
+    """
+    Stores downloaded generation results on disk, keyed by a hash of the
+    model and every input parameter (template, mask, prompt, steps,
+    guidance, seed...). Identical requests are served from disk instead of
+    running the model again.
+    """
+
+    def __init__(self, cache_dir: str = "cache/results", max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize result cache
+
+        Args:
+            cache_dir: Directory for cached results
+            max_bytes: Size limit; least recently used results are evicted first
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.cost_saved = 0.0
+
+    @staticmethod
+    def make_key(model: str, input_params: Dict[str, Any]) -> str:
+        """Hash the model and input parameters into a cache key"""
+        digest = hashlib.sha256(model.encode())
+        for name in sorted(input_params):
+            digest.update(b"\0" + name.encode() + b"=")
+            digest.update(str(input_params[name]).encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """Return the cached result for a key, or None on a miss"""
+        image_path = self.cache_dir / f"{key}.png"
+        meta_path = self.cache_dir / f"{key}.json"
+
+        try:
+            with Image.open(image_path) as img:
+                img.load()
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Touch so eviction is least-recently-used
+        os.utime(image_path)
+
+        with self._lock:
+            self.hits += 1
+            self.seconds_saved += meta.get("latency_seconds", 0.0)
+            self.cost_saved += meta.get("cost", 0.0)
+
+        print(f"Result cache hit ({self.hits} hits, {self.misses} misses)")
+        return img
+
+    def put(self, key: str, image: Union[bytes, Path], latency_seconds: float = 0.0,
+            cost: float = 0.0, model: str = "") -> None:
+        """
+        Store a downloaded result
+
+        Args:
+            key: Cache key from make_key
+            image: Encoded image exactly as downloaded, either as bytes or as
+                a downloaded file (which is moved into the cache)
+            latency_seconds: How long the generation took (for savings stats)
+            cost: Approximate cost of the generation in USD
+            model: Model identifier (informational)
+        """
+        meta = {
+            "model": model,
+            "latency_seconds": latency_seconds,
+            "cost": cost,
+            "created": time.time(),
+        }
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{key}.png.tmp"
+            if isinstance(image, bytes):
+                tmp_path.write_bytes(image)
+            else:
+                shutil.move(str(image), tmp_path)
+            with open(self.cache_dir / f"{key}.json", "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self.cache_dir / f"{key}.png")
+        except OSError as e:
+            print(f"Could not write result cache entry: {e}")
+            return
+
+        self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and estimated savings"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 1),
+                "cost_saved": round(self.cost_saved, 4),
+            }
+
+    def summary(self) -> str:
+        """Human readable one-line summary of cache savings"""
+        stats = self.stats()
+        return (f"{stats['hits']} cache hits, {stats['misses']} misses, "
+                f"~{stats['seconds_saved']:.0f}s and ${stats['cost_saved']:.2f} saved")
+
+    def clear(self) -> None:
+        """Remove all cached results"""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.iterdir():
+            path.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        """Remove least recently used results until under max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob("*.png"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    # Evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                path.with_suffix(".json").unlink(missing_ok=True)
+                total -= size
@@ -0,0 +1,231 @@
+"""
+Run Checkpoint - Persists finished views so interrupted runs can resume
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from PIL import Image
+
+
+class RunCheckpoint:
+    """
+    On-disk record of a generation run.
+
+    The run manifest (manifest.json in the run directory) records the
+    prompt, model and other settings, the run state ("running",
+    "complete" or "abandoned") and every finished view with the file it
+    was saved to. It is rewritten atomically after each view, so a crash
+    or dropped connection only costs the views that hadn't finished.
+
+    Runs are identified by a hash of their settings: opening a run with
+    the same settings again resumes it unless it already completed.
+    """
+
+    MANIFEST_VERSION = 1
+    MAX_AGE = 7 * 24 * 3600  # Seconds an interrupted run is kept for resuming
+
+    def __init__(self, run_dir: Path, manifest: Dict[str, Any]):
+        self.run_dir = Path(run_dir)
+        self.manifest = manifest
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+
+    @staticmethod
+    def make_id(meta: Dict[str, Any]) -> str:
+        """Run ID for a set of run settings"""
+        return hashlib.sha256(json.dumps(meta, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+    @classmethod
+    def open(cls, runs_dir: Union[str, Path], meta: Dict[str, Any], resume: bool = True) -> "RunCheckpoint":
+        """
+        Resume the unfinished run with these settings, or start a new one
+
+        Args:
+            runs_dir: Directory holding one folder per run
+            meta: Run settings (prompt, model, vehicles...); must be JSON serializable
+            resume: False to discard any earlier run with the same settings
+        """
+        run_dir = Path(runs_dir) / cls.make_id(meta)
+        if resume:
+            existing = cls.load(run_dir)
+            if existing and existing.state == "running":
+                print(f"Resuming run {existing.id}: {len(existing.finished)} view(s) already finished")
+                return existing
+
+        shutil.rmtree(run_dir, ignore_errors=True)
+        now = time.time()
+        run = cls(run_dir, {
+            "version": cls.MANIFEST_VERSION,
+            "id": run_dir.name,
+            "created": now,
+            "updated": now,
+            "state": "running",
+            "meta": meta,
+            "views": {},
+        })
+        run.save_manifest()
+        return run
+
+    @classmethod
+    def load(cls, run_dir: Union[str, Path]) -> Optional["RunCheckpoint"]:
+        """Load a run from its directory, or None if it has no usable manifest"""
+        try:
+            with open(Path(run_dir) / "manifest.json") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if manifest.get("version") != cls.MANIFEST_VERSION:
+            return None
+        return cls(Path(run_dir), manifest)
+
+    @classmethod
+    def unfinished(cls, runs_dir: Union[str, Path], kind: Optional[str] = None) -> List["RunCheckpoint"]:
+        """Interrupted runs (optionally only those whose meta has this "kind"), most recent first"""
+        runs_dir = Path(runs_dir)
+        if not runs_dir.is_dir():
+            return []
+
+        runs = []
+        for run_dir in runs_dir.iterdir():
+            run = cls.load(run_dir)
+            if run and run.state == "running" and (kind is None or run.meta.get("kind") == kind):
+                runs.append(run)
+        return sorted(runs, key=lambda run: run.manifest["updated"], reverse=True)
+
+    @classmethod
+    def prune(cls, runs_dir: Union[str, Path], max_age: Optional[float] = None) -> int:
+        """
+        Delete run directories that can no longer be resumed
+
+        Removes finished runs, runs without a usable manifest and
+        interrupted runs not updated for max_age seconds.
+
+        Args:
+            runs_dir: Directory holding one folder per run
+            max_age: Seconds to keep interrupted runs (defaults to MAX_AGE)
+
+        Returns:
+            Number of run directories removed
+        """
+        runs_dir = Path(runs_dir)
+        if not runs_dir.is_dir():
+            return 0
+
+        cutoff = time.time() - (cls.MAX_AGE if max_age is None else max_age)
+        removed = 0
+        for run_dir in runs_dir.iterdir():
+            if not run_dir.is_dir():
+                continue
+            run = cls.load(run_dir)
+            if run and run.state == "running" and run.manifest["updated"] >= cutoff:
+                continue
+            shutil.rmtree(run_dir, ignore_errors=True)
+            removed += 1
+        if removed:
+            print(f"Removed {removed} old run(s) from {runs_dir}")
+        return removed
+
+    @property
+    def id(self) -> str:
+        return self.manifest["id"]
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.manifest["meta"]
+
+    @property
+    def state(self) -> str:
+        return self.manifest["state"]
+
+    @property
+    def finished(self) -> Dict[str, str]:
+        """Key -> saved file of every finished view"""
+        return {key: entry["path"] for key, entry in self.manifest["views"].items()}
+
+    def is_done(self, key: str) -> bool:
+        """True if the view finished and its file is still there"""
+        entry = self.manifest["views"].get(key)
+        return bool(entry) and Path(entry["path"]).exists()
+
+    def mark_done(self, key: str, path: Union[str, Path]) -> None:
+        """Record a finished view that was saved to path"""
+        with self._lock:
+            self.manifest["views"][key] = {"path": str(path), "finished": time.time()}
+            self.manifest["updated"] = time.time()
+            self.save_manifest()
+
+    def save_view(self, key: str, image: Image.Image) -> Future:
+        """
+        Save a finished view into the run directory and record it
+
+        Encoding runs on a background thread so callers on the UI thread
+        don't wait for it. The image must not be modified afterwards.
+        """
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint")
+
+        def write():
+            path = self.run_dir / f"{key.replace('/', '__')}.png"
+            tmp_path = path.with_suffix(".tmp")
+            image.save(tmp_path, "PNG")
+            os.replace(tmp_path, path)
+            self.mark_done(key, path)
+
+        future = self._writer.submit(write)
+        self._pending.append(future)
+        return future
+
+    def load_view(self, key: str) -> Optional[Image.Image]:
+        """Load a finished view, or None if it is missing"""
+        if not self.is_done(key):
+            return None
+        with Image.open(self.manifest["views"][key]["path"]) as img:
+            return img.convert("RGB")
+
+    def flush(self) -> None:
+        """Wait for views still being saved"""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Could not checkpoint view: {e}")
+
+    def finish(self, state: str = "complete") -> None:
+        """Mark the run as no longer resumable and delete the views saved into the run directory"""
+        self.flush()
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
+        with self._lock:
+            self.manifest["state"] = state
+            self.manifest["updated"] = time.time()
+            self.save_manifest()
+
+        # Views saved elsewhere (batch output files) are the results themselves and stay
+        for path in self.run_dir.glob("*.png"):
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"Could not remove {path}: {e}")
+
+    def save_manifest(self) -> None:
+        """Persist the manifest (best effort)"""
+        try:
+            self.run_dir.mkdir(parents=True, exist_ok=True)
+            path = self.run_dir / "manifest.json"
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self.manifest, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not save run manifest: {e}")
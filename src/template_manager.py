@@ -3,19 +3,45 @@ Template Manager - Scans and manages vehicle template files
 """
 import os
 import sys
+import json
+import hashlib
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+from PIL import Image
 
 
 class TemplateManager:
     """Manages vehicle template files and folders"""
 
     REQUIRED_VIEWS = ["Front", "Rear", "Left", "Right", "Top"]
+    # View -> the view it may be a mirror image of (checked by find_mirrored_views)
+    MIRROR_CANDIDATES = {"Right": "Left"}
+    MANIFEST_VERSION = 1
 
-    def __init__(self, templates_dir: str):
+    def __init__(self, templates_dir: str, manifest_path: Optional[str] = None, scan: bool = True):
+        """
+        Initialize template manager
+
+        Args:
+            templates_dir: Directory containing one folder per vehicle
+            manifest_path: Where to persist the template manifest
+                (defaults to <templates_dir>.manifest.json next to the templates folder)
+            scan: Rescan changed folders now; if False only the saved manifest is used
+        """
         self.templates_dir = self._resolve_templates_dir(templates_dir)
+        if manifest_path:
+            self.manifest_path = Path(manifest_path)
+        else:
+            self.manifest_path = self.templates_dir.with_name(f"{self.templates_dir.name}.manifest.json")
         self.vehicles: Dict[str, Dict[str, Path]] = {}
-        self.scan_templates()
+        self.manifest: Dict[str, Any] = self._load_manifest()
+        self._manifest_lock = threading.Lock()
+
+        if scan:
+            self.scan_templates()
+        else:
+            self._index_from_manifest()
 
     def _resolve_templates_dir(self, templates_dir: str) -> Path:
         """Resolve templates directory, checking multiple locations"""
@@ -41,39 +67,190 @@ class TemplateManager:
         # Return original path even if it doesn't exist
         return Path(templates_dir)
 
-    def scan_templates(self) -> None:
-        """Scan templates directory for vehicle folders"""
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the persisted manifest, or an empty one if missing/outdated"""
+        empty = {"version": self.MANIFEST_VERSION, "vehicles": {}}
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return empty
+
+        if manifest.get("version") != self.MANIFEST_VERSION:
+            return empty
+        return manifest
+
+    def save_manifest(self, mirrors: Optional[Dict[str, float]] = None) -> None:
+        """
+        Persist the manifest (best effort - the templates folder may be read-only)
+
+        Args:
+            mirrors: New mirror scores to add first, under the same lock as
+                the write so it never sees the dict change size
+        """
+        try:
+            with self._manifest_lock:
+                if mirrors:
+                    self.manifest["mirrors"] = dict(self.manifest.get("mirrors", {}), **mirrors)
+                tmp_path = self.manifest_path.with_suffix(".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(self.manifest, f, indent=2)
+                os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"Could not save template manifest: {e}")
+
+    def _index_from_manifest(self) -> None:
+        """Build the vehicle index from the manifest without touching the filesystem"""
+        vehicles = {}
+        for name, entry in self.manifest["vehicles"].items():
+            templates = {view: Path(info["path"]) for view, info in entry["templates"].items()}
+            if len(templates) == 5:
+                vehicles[name] = templates
+        self.vehicles = vehicles
+
+    def scan_templates(self, full: bool = False) -> None:
+        """
+        Scan templates directory for vehicle folders
+
+        Only folders whose modification time changed since the last scan are
+        re-read; everything else comes from the manifest. Overwriting a
+        template in place does not change its folder's mtime, so use
+        full=True after editing templates.
+
+        Args:
+            full: Re-read every folder, ignoring the manifest
+        """
         self.vehicles.clear()
 
         if not self.templates_dir.exists():
             print(f"Templates directory not found: {self.templates_dir}")
             return
 
+        known = self.manifest["vehicles"]
+        seen = set()
+        rescanned = 0
+
         # Scan each subdirectory
         for vehicle_dir in self.templates_dir.iterdir():
             if not vehicle_dir.is_dir():
                 continue
 
-            # Look for template files
-            templates = self._find_templates(vehicle_dir)
+            name = vehicle_dir.name
+            seen.add(name)
+            mtime_ns = vehicle_dir.stat().st_mtime_ns
+            entry = known.get(name)
 
-            # Only add if all 5 views are present
-            if len(templates) == 5:
-                self.vehicles[vehicle_dir.name] = templates
-                print(f"Found vehicle: {vehicle_dir.name} with {len(templates)} views")
+            if full or entry is None or entry["mtime_ns"] != mtime_ns:
+                entry = self._scan_vehicle(vehicle_dir, mtime_ns, entry)
+                known[name] = entry
+                rescanned += 1
+                found = len(entry["templates"])
+                if found == 5:
+                    print(f"Found vehicle: {name} with {found} views")
+                else:
+                    print(f"Skipping {name}: only found {found}/5 views")
+
+        # Forget folders that were removed
+        removed = [name for name in known if name not in seen]
+        for name in removed:
+            del known[name]
+
+        self._index_from_manifest()
+        print(f"Loaded {len(self.vehicles)} vehicles ({rescanned} folders rescanned)")
+
+        if rescanned or removed:
+            self.save_manifest()
+
+    def update_vehicle(self, name: str) -> List[Path]:
+        """
+        Re-read a single vehicle folder after it was added, changed or removed
+
+        Only this vehicle's index and manifest entries are replaced (the
+        index is swapped, never mutated, so other threads can keep reading
+        it), and unchanged files keep their hashes.
+
+        Args:
+            name: Vehicle folder name
+
+        Returns:
+            Template files that were replaced or removed, so anything cached
+            from them can be invalidated
+        """
+        vehicle_dir = self.templates_dir / name
+        previous = self.manifest["vehicles"].get(name)
+        old_hashes = {info["path"]: info["sha256"] for info in previous["templates"].values()} if previous else {}
+
+        known = dict(self.manifest["vehicles"])
+        try:
+            if vehicle_dir.is_dir():
+                known[name] = self._scan_vehicle(vehicle_dir, vehicle_dir.stat().st_mtime_ns, previous)
             else:
-                print(f"Skipping {vehicle_dir.name}: only found {len(templates)}/5 views")
+                known.pop(name, None)
+        except OSError as e:
+            # Usually a template still being written; the next change event retries
+            print(f"Could not read templates for {name}: {e}")
+            return []
+        self.manifest["vehicles"] = known
+
+        entry = known.get(name)
+        new_hashes = {info["path"]: info["sha256"] for info in entry["templates"].values()} if entry else {}
+        vehicles = dict(self.vehicles)
+        if entry and len(entry["templates"]) == 5:
+            vehicles[name] = {view: Path(info["path"]) for view, info in entry["templates"].items()}
+        else:
+            vehicles.pop(name, None)
+        self.vehicles = vehicles
+
+        self.save_manifest()
+        return [Path(path) for path, sha256 in old_hashes.items() if new_hashes.get(path) != sha256]
+
+    def _scan_vehicle(self, vehicle_dir: Path, mtime_ns: int,
+                      previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Read template metadata for one vehicle folder"""
+        previous_templates = previous["templates"] if previous else {}
+        templates = {}
+
+        for view, path in self._find_templates(vehicle_dir).items():
+            stat = path.stat()
+            old = previous_templates.get(view)
+
+            # Unchanged file - keep hash and dimensions
+            if old and old["path"] == str(path) and old["mtime_ns"] == stat.st_mtime_ns \
+                    and old["size"] == stat.st_size:
+                templates[view] = old
+                continue
+
+            with Image.open(path) as img:
+                width, height = img.size
+            templates[view] = {
+                "path": str(path),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "width": width,
+                "height": height,
+                "sha256": self._hash_file(path),
+            }
+
+        return {"mtime_ns": mtime_ns, "templates": templates}
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        """SHA-256 of a template file"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
 
     def _find_templates(self, vehicle_dir: Path) -> Dict[str, Path]:
         """Find all template files for a vehicle"""
         templates = {}
 
-        for view in self.REQUIRED_VIEWS:
-            # Look for files matching pattern: *_<View>.png
-            matches = list(vehicle_dir.glob(f"*_{view}.png"))
-
-            if matches:
-                templates[view] = matches[0]
+        # Single directory listing; files match pattern: *_<View>.png
+        for path in sorted(vehicle_dir.iterdir()):
+            for view in self.REQUIRED_VIEWS:
+                if view not in templates and path.name.endswith(f"_{view}.png"):
+                    templates[view] = path
 
         return templates
 
@@ -81,6 +258,29 @@ class TemplateManager:
         """Get list of all available vehicle names"""
         return sorted(self.vehicles.keys())
 
+    @classmethod
+    def check_views(cls, views: Any) -> List[str]:
+        """
+        Validate a requested list of views (None means all five)
+
+        Args:
+            views: View names from a job or request
+
+        Returns:
+            The views, without duplicates
+
+        Raises:
+            ValueError: If views is not a non-empty list of known view names
+        """
+        if views is None:
+            return list(cls.REQUIRED_VIEWS)
+        if not isinstance(views, list) or not views or not all(isinstance(view, str) for view in views):
+            raise ValueError("'views' must be a non-empty list of view names")
+        unknown = [view for view in views if view not in cls.REQUIRED_VIEWS]
+        if unknown:
+            raise ValueError(f"Unknown view(s): {', '.join(unknown)}")
+        return list(dict.fromkeys(views))
+
     def get_vehicle_templates(self, vehicle_name: str) -> Optional[Dict[str, Path]]:
         """Get template paths for a specific vehicle"""
         return self.vehicles.get(vehicle_name)
@@ -92,6 +292,61 @@ class TemplateManager:
             return templates.get(view)
         return None
 
+    def get_template_info(self, vehicle_name: str, view: str) -> Optional[Dict[str, Any]]:
+        """Get manifest metadata (path, mtime, size, dimensions, hash) for a template"""
+        entry = self.manifest["vehicles"].get(vehicle_name)
+        if entry:
+            return entry["templates"].get(view)
+        return None
+
+    def find_templates_by_hash(self, sha256: str) -> List[Dict[str, str]]:
+        """Find every vehicle/view whose template has the given content hash"""
+        matches = []
+        for name, entry in self.manifest["vehicles"].items():
+            for view, info in entry["templates"].items():
+                if info["sha256"] == sha256:
+                    matches.append({"vehicle": name, "view": view, "path": info["path"]})
+        return matches
+
+    def find_mirrored_views(self, vehicle_name: str, processor, tolerance: float = 0.01) -> Dict[str, str]:
+        """
+        Find views whose mask is the horizontal flip of another view's mask
+
+        Scores are saved in the manifest by template hash, so each pair of
+        templates is only compared once.
+
+        Args:
+            vehicle_name: Vehicle to check
+            processor: ImageProcessor used to build and compare the masks
+            tolerance: Fraction of the masks' area allowed to differ
+
+        Returns:
+            Dict of view -> the view it can be mirrored from (e.g. {"Right": "Left"})
+        """
+        scores = self.manifest.get("mirrors", {})
+        new_scores = {}
+        mirrored = {}
+
+        for view, source in self.MIRROR_CANDIDATES.items():
+            view_info = self.get_template_info(vehicle_name, view)
+            source_info = self.get_template_info(vehicle_name, source)
+            if not view_info or not source_info:
+                continue
+
+            key = f"{source_info['sha256']}:{view_info['sha256']}"
+            score = scores.get(key)
+            if score is None:
+                masks = [processor.create_mask(processor.load_template(Path(info["path"])))
+                         for info in (source_info, view_info)]
+                score = new_scores[key] = round(processor.mirror_score(*masks), 5)
+
+            if score >= 1.0 - tolerance:
+                mirrored[view] = source
+
+        if new_scores:
+            self.save_manifest(mirrors=new_scores)
+        return mirrored
+
 
 if __name__ == "__main__":
     # Test the template manager
@@ -0,0 +1,284 @@
+"""
+Template Watcher - Picks up added, changed and removed vehicle templates while running
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from template_manager import TemplateManager
+
+
+# inotify(7) event bits
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+ROOT_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+VEHICLE_EVENTS = IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+@dataclass
+class TemplateChange:
+    """What happened to one vehicle"""
+    vehicle: str
+    kind: str  # "added", "removed" or "changed"
+    paths: List[Path] = field(default_factory=list)  # Template files replaced or removed
+
+
+class TemplateWatcher:
+    """
+    Keeps a TemplateManager in sync with its templates folder.
+
+    Uses inotify on Linux, so nothing is read until a file actually
+    changes; elsewhere (or if inotify is unavailable) the vehicle folders
+    are listed every poll_interval seconds. Either way, only the vehicles
+    that changed are re-read (TemplateManager.update_vehicle), cached
+    masks and payloads built from replaced files are invalidated, and
+    on_change is called from the watcher thread with the changes.
+    """
+
+    def __init__(self, template_manager: TemplateManager, input_cache=None,
+                 on_change: Optional[Callable[[List[TemplateChange]], None]] = None,
+                 poll_interval: float = 2.0, debounce: float = 0.5, use_inotify: bool = True):
+        """
+        Initialize template watcher
+
+        Args:
+            template_manager: Manager whose index is kept up to date
+            input_cache: PreparedInputCache to invalidate for changed templates
+            on_change: Called (on the watcher thread) with each batch of changes
+            poll_interval: Seconds between folder listings when polling
+            debounce: Quiet period before acting on inotify events, so a
+                folder being copied in is read once, when complete
+            use_inotify: Use inotify where available (False = always poll)
+        """
+        self.template_manager = template_manager
+        self.input_cache = input_cache
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.backend: Optional[str] = None  # "inotify" or "polling" once started
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._libc = None
+        self._fd = -1
+        self._watches: Dict[int, Optional[str]] = {}  # wd -> vehicle name (None = templates folder)
+
+    @property
+    def templates_dir(self) -> Path:
+        return self.template_manager.templates_dir
+
+    def start(self) -> "TemplateWatcher":
+        """Start watching in a background thread"""
+        if self.use_inotify and self._open_inotify():
+            self.backend = "inotify"
+            target = self._run_inotify
+        else:
+            self.backend = "polling"
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="template-watcher", daemon=True)
+        self._thread.start()
+        print(f"Watching {self.templates_dir} for template changes ({self.backend})")
+        return self
+
+    def stop(self) -> None:
+        """Stop watching"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def refresh(self, names: Set[str]) -> List[TemplateChange]:
+        """
+        Re-read the given vehicle folders and report what changed
+
+        Args:
+            names: Vehicle folder names to re-read
+
+        Returns:
+            One TemplateChange per vehicle that was added, removed or changed
+        """
+        changes = []
+        for name in sorted(names):
+            was_available = self.template_manager.get_vehicle_templates(name) is not None
+            paths = self.template_manager.update_vehicle(name)
+            is_available = self.template_manager.get_vehicle_templates(name) is not None
+
+            if self.input_cache is not None:
+                for path in paths:
+                    self.input_cache.invalidate(path)
+
+            if is_available and not was_available:
+                kind = "added"
+            elif was_available and not is_available:
+                kind = "removed"
+            elif is_available and paths:
+                kind = "changed"
+            else:
+                continue
+            changes.append(TemplateChange(name, kind, paths))
+            print(f"Template {kind}: {name}")
+
+        if changes and self.on_change:
+            try:
+                self.on_change(changes)
+            except Exception as e:
+                print(f"Template change handler failed: {e}")
+        return changes
+
+    # -- inotify --
+
+    def _open_inotify(self) -> bool:
+        """Set up inotify watches on the templates folder and each vehicle folder"""
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if self._fd < 0:
+            return False
+
+        if not self._add_watch(self.templates_dir, None, ROOT_EVENTS):
+            # Missing folder or out of watches - polling copes with both
+            os.close(self._fd)
+            self._fd = -1
+            return False
+        for vehicle_dir in self.templates_dir.iterdir():
+            if vehicle_dir.is_dir():
+                self._add_watch(vehicle_dir, vehicle_dir.name, VEHICLE_EVENTS)
+        return True
+
+    def _add_watch(self, path: Path, vehicle: Optional[str], mask: int) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            print(f"Could not watch {path}: {os.strerror(ctypes.get_errno())}")
+            return False
+        self._watches[wd] = vehicle
+        return True
+
+    def _run_inotify(self) -> None:
+        dirty: Set[str] = set()
+        last_event = 0.0
+
+        while not self._stop.is_set():
+            timeout = self.debounce if dirty else 1.0
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                dirty |= self._parse_events(data)
+                last_event = time.monotonic()
+            elif dirty and time.monotonic() - last_event >= self.debounce:
+                names, dirty = dirty, set()
+                self.refresh(names)
+
+    def _parse_events(self, data: bytes) -> Set[str]:
+        """Vehicles touched by a buffer of inotify events (watching new folders as they appear)"""
+        dirty = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped - compare every folder against the index instead
+                dirty |= self._all_vehicle_names()
+                watched = set(self._watches.values())
+                for vehicle_dir in self.templates_dir.iterdir():
+                    if vehicle_dir.is_dir() and vehicle_dir.name not in watched:
+                        self._add_watch(vehicle_dir, vehicle_dir.name, VEHICLE_EVENTS)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                continue
+
+            vehicle = self._watches[wd]
+            if vehicle is None:
+                if not mask & IN_ISDIR:
+                    continue
+                dirty.add(name)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watch(self.templates_dir / name, name, VEHICLE_EVENTS)
+                elif mask & IN_MOVED_FROM:
+                    # A moved folder keeps its watch; drop it so it can't report under the old name
+                    for old_wd, watched in list(self._watches.items()):
+                        if watched == name:
+                            self._libc.inotify_rm_watch(self._fd, old_wd)
+                            self._watches.pop(old_wd, None)
+            elif name.endswith(".png") or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                dirty.add(vehicle)
+        return dirty
+
+    # -- polling --
+
+    def _run_polling(self) -> None:
+        snapshot = self._snapshot()
+        pending: Dict[str, Optional[tuple]] = {}  # Vehicles that changed, and their listing when last seen
+
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            settled = set()
+            for name in snapshot.keys() | current.keys() | pending.keys():
+                listing = current.get(name)
+                if name in pending and pending[name] == listing:
+                    # Unchanged for a whole interval - finished copying
+                    settled.add(name)
+                    del pending[name]
+                elif listing != snapshot.get(name):
+                    pending[name] = listing
+            snapshot = current
+            if settled:
+                self.refresh(settled)
+
+    def _snapshot(self) -> Dict[str, Tuple[Tuple[str, int, int], ...]]:
+        """Vehicle -> (name, mtime, size) of its PNG files"""
+        snapshot = {}
+        try:
+            vehicle_dirs = [entry for entry in os.scandir(self.templates_dir) if entry.is_dir()]
+        except OSError:
+            return snapshot
+        for vehicle_dir in vehicle_dirs:
+            files = []
+            try:
+                for entry in os.scandir(vehicle_dir.path):
+                    if entry.name.endswith(".png"):
+                        stat = entry.stat()
+                        files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                continue
+            snapshot[vehicle_dir.name] = tuple(sorted(files))
+        return snapshot
+
+    def _all_vehicle_names(self) -> Set[str]:
+        names = set(self.template_manager.manifest["vehicles"])
+        if self.templates_dir.exists():
+            names |= {path.name for path in self.templates_dir.iterdir() if path.is_dir()}
+        return names
@@ -0,0 +1,74 @@
+"""
+Uploader - Uploads image payloads to the Replicate Files API
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Tuple
+
+from downloader import get_session
+
+
+FILES_ENDPOINT = "https://api.replicate.com/v1/files"
+
+# Uploaded files are reused for this long before being uploaded again
+UPLOAD_TTL_SECONDS = 12 * 60 * 60
+
+
+class FileUploader:
+    """
+    Uploads raw PNG bytes once and reuses the returned file URL.
+
+    Payloads are identified by content hash, so the same template or mask is
+    uploaded once and shared by every view and vehicle that sends it.
+    """
+
+    def __init__(self, api_key: str, endpoint: str = FILES_ENDPOINT,
+                 timeout: Tuple[float, float] = (10, 120)):
+        """
+        Initialize uploader
+
+        Args:
+            api_key: Replicate API key
+            endpoint: Files API endpoint
+            timeout: (connect, read) timeouts in seconds
+        """
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._uploaded: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def upload(self, data: bytes, filename: str = "image.png",
+               content_type: str = "image/png") -> Tuple[str, bool]:
+        """
+        Upload bytes, or reuse an earlier upload of the same content
+
+        Args:
+            data: Raw file bytes
+            filename: File name reported to the API
+            content_type: MIME type of the data
+
+        Returns:
+            Tuple of (file URL, whether an earlier upload was reused)
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            cached = self._uploaded.get(content_hash)
+            if cached and time.time() - cached[1] < UPLOAD_TTL_SECONDS:
+                return cached[0], True
+
+        response = get_session().post(
+            self.endpoint,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            files={"content": (filename, data, content_type)},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        url = response.json()["urls"]["get"]
+
+        with self._lock:
+            self._uploaded[content_hash] = (url, time.time())
+
+        return url, False
@@ -0,0 +1,215 @@
+"""
+Webhook Receiver - Embedded HTTP endpoint for prediction completion webhooks
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from inference_backend import TERMINAL_STATUSES
+
+
+# Replicate rejects signatures older than this, so do we
+SIGNATURE_TOLERANCE = 5 * 60
+# Completions for predictions nobody is watching are dropped after this long
+UNCLAIMED_TTL = 10 * 60
+
+
+class WebhookReceiver:
+    """
+    Small HTTP server that turns completion webhooks into futures.
+
+    Predictions are created with webhook=receiver.url; watch() returns a
+    Future that is resolved with the prediction JSON when the "completed"
+    webhook arrives, so a pending prediction costs no thread and no
+    polling. Completions that arrive before watch() is called (a fast
+    prediction can finish before create returns) are kept until claimed.
+
+    The URL path carries a random token so stray POSTs are ignored. With a
+    signing_secret (the "whsec_..." secret from Replicate's
+    /v1/webhooks/default/secret) the webhook signature is checked as well.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, public_url: Optional[str] = None,
+                 signing_secret: Optional[str] = None, fallback_poll: float = 30.0):
+        """
+        Initialize webhook receiver
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 = pick a free port)
+            public_url: URL the inference service should call instead of the
+                local address (e.g. a tunnel or reverse proxy forwarding to this port)
+            signing_secret: Webhook signing secret; unsigned requests are rejected when set
+            fallback_poll: Seconds to wait for a webhook before checking the
+                prediction directly, in case a webhook got lost
+        """
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.signing_secret = signing_secret
+        self.fallback_poll = fallback_poll
+        self.token = secrets.token_urlsafe(16)
+        self.counts = {"received": 0, "rejected": 0, "unclaimed": 0}
+
+        self._watched: Dict[str, Future] = {}
+        self._unclaimed: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+        handler = type("WebhookHandler", (_Handler,), {"receiver": self})
+        self.httpd = _HTTPServer((host, port), handler)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Webhook URL to pass when creating predictions"""
+        if self.public_url:
+            return f"{self.public_url}/webhook/{self.token}"
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/webhook/{self.token}"
+
+    def create_params(self) -> Dict[str, Any]:
+        """Extra prediction create parameters that route completion here"""
+        return {"webhook": self.url, "webhook_events_filter": ["completed"]}
+
+    def start(self) -> "WebhookReceiver":
+        """Serve webhooks in a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="webhook-receiver", daemon=True)
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        print(f"Webhook receiver listening on http://{host}:{port}"
+              + (f" (public URL {self.public_url})" if self.public_url else ""))
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def watch(self, prediction_id: str) -> Future:
+        """
+        Future resolved with the prediction JSON once it completes
+
+        Call forget() when no longer interested, whether or not it resolved.
+        """
+        with self._lock:
+            future = self._watched.get(prediction_id)
+            if future is None:
+                future = self._watched[prediction_id] = Future()
+            unclaimed = self._unclaimed.pop(prediction_id, None)
+        if unclaimed is not None and not future.done():
+            future.set_result(unclaimed[1])
+        return future
+
+    def forget(self, prediction_id: str) -> None:
+        """Stop watching a prediction"""
+        with self._lock:
+            self._watched.pop(prediction_id, None)
+
+    def deliver(self, payload: Dict[str, Any]) -> None:
+        """Hand a webhook's prediction JSON to whoever is watching it"""
+        if payload.get("status") not in TERMINAL_STATUSES:
+            return
+
+        prediction_id = payload.get("id")
+        now = time.monotonic()
+        with self._lock:
+            self.counts["received"] += 1
+            future = self._watched.get(prediction_id)
+            if future is None:
+                self._unclaimed = {
+                    key: value for key, value in self._unclaimed.items()
+                    if now - value[0] < UNCLAIMED_TTL
+                }
+                self._unclaimed[prediction_id] = (now, payload)
+                self.counts["unclaimed"] += 1
+                return
+        if not future.done():
+            future.set_result(payload)
+
+    def verify(self, headers, body: bytes) -> bool:
+        """Check a webhook's signature (always passes without a signing secret)"""
+        if not self.signing_secret:
+            return True
+
+        webhook_id = headers.get("webhook-id", "")
+        timestamp = headers.get("webhook-timestamp", "")
+        signatures = headers.get("webhook-signature", "")
+        try:
+            if abs(time.time() - int(timestamp)) > SIGNATURE_TOLERANCE:
+                return False
+        except ValueError:
+            return False
+
+        key = base64.b64decode(self.signing_secret.split("_", 1)[-1])
+        signed = f"{webhook_id}.{timestamp}.".encode() + body
+        expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+        return any(
+            hmac.compare_digest(expected, signature.split(",", 1)[-1])
+            for signature in signatures.split()
+        )
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # A large batch can complete hundreds of predictions at once
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler; `receiver` is set on a per-server subclass"""
+
+    receiver: WebhookReceiver
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, code: int) -> None:
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        receiver = self.receiver
+
+        if self.path.split("?", 1)[0] != f"/webhook/{receiver.token}":
+            self.reply(404)
+            return
+        if not receiver.verify(self.headers, body):
+            with receiver._lock:
+                receiver.counts["rejected"] += 1
+            self.reply(401)
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.reply(400)
+            return
+        receiver.deliver(payload)
+        self.reply(200)
+
+
+_receiver: Optional[WebhookReceiver] = None
+_receiver_lock = threading.Lock()
+
+
+def get_webhook_receiver(settings: Dict[str, Any]) -> WebhookReceiver:
+    """
+    Get the process-wide webhook receiver, starting it on first use
+
+    Args:
+        settings: config.json "webhook_receiver" ({"host", "port",
+            "public_url", "signing_secret", "fallback_poll"})
+    """
+    global _receiver
+    with _receiver_lock:
+        if _receiver is None:
+            _receiver = WebhookReceiver(**settings).start()
+        return _receiver
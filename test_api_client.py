@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for coalescing identical in-flight requests (ReplicateAPIClient.single_flight)
+"""
+import sys
+import threading
+import time
+
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from api_client import ReplicateAPIClient
+from inference_backend import MockBackend
+from cancellation import CancelToken, Cancelled
+
+IMAGE = Image.new("RGB", (64, 64), (40, 80, 120))
+MASK = Image.new("L", (64, 64), 255)
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Caller(threading.Thread):
+    """Generates IMAGE/MASK in the background and keeps the result (or "cancelled")"""
+
+    def __init__(self, client: ReplicateAPIClient, cancel: CancelToken = None):
+        super().__init__(daemon=True)
+        self.client = client
+        self.cancel = cancel
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.client.generate_inpainting(IMAGE, MASK, "test livery", view="Left", seed=1,
+                                                          cancel=self.cancel)
+        except Cancelled:
+            self.result = "cancelled"
+
+
+def start_callers(client: ReplicateAPIClient, backend: MockBackend, cancels):
+    """Start the first caller, then the others once its prediction is running"""
+    callers = [Caller(client, cancel) for cancel in cancels]
+    callers[0].start()
+    wait_for(lambda: backend.server.counts["created"] == 1)
+    for caller in callers[1:]:
+        caller.start()
+    wait_for(lambda: client.coalesced_requests == len(callers) - 1)
+    return callers
+
+
+def test_identical_requests_share_one_prediction():
+    backend = MockBackend(latency="fixed:0.5")
+    try:
+        client = ReplicateAPIClient("", backend=backend)
+        callers = start_callers(client, backend, [None, None, None])
+        for caller in callers:
+            caller.join(10)
+
+        assert backend.server.counts["created"] == 1
+        assert all(isinstance(caller.result, Image.Image) for caller in callers)
+        assert not client._in_flight
+    finally:
+        backend.close()
+
+
+def test_cancelled_follower_leaves_others_running():
+    backend = MockBackend(latency="fixed:0.5")
+    try:
+        client = ReplicateAPIClient("", backend=backend)
+        leader, quitter, follower = start_callers(client, backend, [CancelToken(), CancelToken(), CancelToken()])
+        quitter.cancel.cancel()
+        quitter.join(5)
+        assert quitter.result == "cancelled"
+
+        leader.join(10)
+        follower.join(10)
+        assert isinstance(leader.result, Image.Image)
+        assert isinstance(follower.result, Image.Image)
+        assert backend.server.counts["created"] == 1
+        assert backend.server.counts["canceled"] == 0
+    finally:
+        backend.close()
+
+
+def test_cancelled_leader_keeps_serving_followers():
+    backend = MockBackend(latency="fixed:0.5")
+    try:
+        client = ReplicateAPIClient("", backend=backend)
+        leader, follower = start_callers(client, backend, [CancelToken(), CancelToken()])
+        leader.cancel.cancel()
+
+        follower.join(10)
+        leader.join(10)
+        assert leader.result == "cancelled"
+        assert isinstance(follower.result, Image.Image)
+        assert backend.server.counts["canceled"] == 0
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    test_identical_requests_share_one_prediction()
+    test_cancelled_follower_leaves_others_running()
+    test_cancelled_leader_keeps_serving_followers()
+    print("✓ API client tests passed")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tests for cropping requests to the painted area, packing views into an
+atlas, and compositing results back
+"""
+import sys
+
+from PIL import Image, ImageDraw
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from image_processor import ImageProcessor
+
+
+def make_mask(size, *rects) -> Image.Image:
+    """Black mask with white (painted) rectangles, given as (left, top, right, bottom) like getbbox"""
+    mask = Image.new("L", size)
+    draw = ImageDraw.Draw(mask)
+    for left, top, right, bottom in rects:
+        draw.rectangle((left, top, right - 1, bottom - 1), fill=255)
+    return mask
+
+
+def test_mask_bbox_pads_and_rounds():
+    processor = ImageProcessor()
+    mask = make_mask((1000, 600), (400, 100, 700, 200))
+    box = processor.mask_bbox(mask, padding=32, multiple=64, min_size=256)
+
+    # 300 x 100 painted, + 32 each side = 364 x 164 -> 384 x 256, grown evenly around it
+    assert box == (358, 22, 742, 278)
+    left, top, right, bottom = box
+    assert (right - left) % 64 == 0 and (bottom - top) % 64 == 0
+    assert left <= 400 - 32 and right >= 700 + 32 and top <= 100 - 32 and bottom >= 200 + 32
+
+
+def test_mask_bbox_stays_inside_image():
+    processor = ImageProcessor()
+
+    # Painted near the bottom right corner: the box shifts back inside rather than shrinking
+    corner = processor.mask_bbox(make_mask((1000, 600), (960, 560, 990, 590)), padding=32, multiple=64, min_size=256)
+    assert corner == (744, 344, 1000, 600)
+
+    # Near the top left corner
+    assert processor.mask_bbox(make_mask((1000, 600), (10, 10, 50, 50)),
+                               padding=32, multiple=64, min_size=256) == (0, 0, 256, 256)
+
+    # A side shorter than min_size is used whole, even though it isn't a multiple of 64
+    assert processor.mask_bbox(make_mask((300, 200), (100, 50, 120, 70)),
+                               padding=32, multiple=64, min_size=256) == (0, 0, 256, 200)
+
+
+def test_mask_bbox_empty_mask():
+    assert ImageProcessor().mask_bbox(Image.new("L", (100, 100))) is None
+
+
+def test_crop_to_mask():
+    processor = ImageProcessor()
+    image = Image.new("RGB", (1000, 600), (255, 0, 0))
+    mask = make_mask((1000, 600), (400, 100, 700, 200))
+
+    cropped, cropped_mask, box = processor.crop_to_mask(image, mask, padding=32, multiple=64, min_size=256)
+    assert box == (358, 22, 742, 278)
+    assert cropped.size == cropped_mask.size == (384, 256)
+    assert cropped_mask.getpixel((400 - 358, 100 - 22)) == 255
+    assert cropped_mask.getpixel((0, 0)) == 0
+
+    # Nothing to gain when the box is the whole image
+    whole = make_mask((200, 200), (0, 0, 200, 200))
+    assert processor.crop_to_mask(image.crop((0, 0, 200, 200)), whole)[2] is None
+
+
+def test_composite_cropped_result_lands_in_place():
+    processor = ImageProcessor()
+    original = Image.new("RGB", (1000, 600), (255, 0, 0))
+    mask = make_mask((1000, 600), (400, 100, 700, 200))
+    _, _, box = processor.crop_to_mask(original, mask, padding=32, multiple=64, min_size=256)
+
+    # The model answers at half resolution; the result is scaled back up to the box
+    generated = Image.new("RGB", ((box[2] - box[0]) // 2, (box[3] - box[1]) // 2), (0, 0, 255))
+    final = processor.composite_result(original, generated, mask, box=box)
+
+    assert final.size == original.size
+    for pixel in [(400, 100), (699, 199), (550, 150)]:
+        assert final.getpixel(pixel) == (0, 0, 255), pixel
+    # Inside the box but not painted, and outside the box, the template is kept
+    for pixel in [(399, 100), (700, 150), (box[0], box[1]), (0, 0), (999, 599)]:
+        assert final.getpixel(pixel) == (255, 0, 0), pixel
+
+
+def test_composite_matches_uncropped():
+    processor = ImageProcessor()
+    original = Image.radial_gradient("L").resize((640, 384)).convert("RGB")
+    mask = make_mask((640, 384), (100, 50, 200, 120), (150, 200, 260, 300))
+    generated = Image.linear_gradient("L").resize((640, 384)).convert("RGB")
+
+    _, _, box = processor.crop_to_mask(original, mask, padding=16, multiple=64, min_size=64)
+    assert box is not None
+    assert (processor.composite_result(original, generated.crop(box), mask, box=box).tobytes()
+            == processor.composite_result(original, generated, mask).tobytes())
+
+
+VIEW_SIZES = {"Front": (400, 300), "Rear": (400, 300), "Left": (1000, 250), "Right": (1000, 250), "Top": (900, 300)}
+
+
+def make_views():
+    """Differently sized views, each a solid colour, and their masks"""
+    images = {view: Image.new("RGB", size, (i * 50, 255 - i * 50, 100))
+              for i, (view, size) in enumerate(VIEW_SIZES.items())}
+    masks = {view: make_mask(size, (10, 10, size[0] - 10, size[1] - 10)) for view, size in VIEW_SIZES.items()}
+    return images, masks
+
+
+def test_atlas_layout_does_not_overlap():
+    size, layout = ImageProcessor().atlas_layout(VIEW_SIZES, gutter=64)
+    assert set(layout) == set(VIEW_SIZES)
+    for view, (left, top, right, bottom) in layout.items():
+        assert (right - left, bottom - top) == VIEW_SIZES[view]
+        assert left >= 0 and top >= 0 and right <= size[0] and bottom <= size[1]
+
+    boxes = list(layout.values())
+    for i, a in enumerate(boxes):
+        for b in boxes[i + 1:]:
+            # At least a gutter apart horizontally or vertically
+            assert a[2] + 64 <= b[0] or b[2] + 64 <= a[0] or a[3] + 64 <= b[1] or b[3] + 64 <= a[1]
+
+
+def test_atlas_round_trip():
+    processor = ImageProcessor()
+    images, masks = make_views()
+    atlas, atlas_mask, layout = processor.pack_atlas(images, masks, gutter=64)
+    assert atlas.size == atlas_mask.size
+
+    pieces = processor.split_atlas(atlas, atlas.size, layout)
+    assert set(pieces) == set(images)
+    for view, piece in pieces.items():
+        assert piece.size == images[view].size
+        assert piece.tobytes() == images[view].tobytes()
+        assert atlas_mask.crop(layout[view]).tobytes() == masks[view].tobytes()
+
+
+def test_atlas_round_trip_from_downscaled_output():
+    processor = ImageProcessor()
+    images, masks = make_views()
+    atlas, _, layout = processor.pack_atlas(images, masks, gutter=64)
+
+    # The model answers at a lower resolution; each piece keeps its view's proportions...
+    generated = atlas.resize((atlas.width // 3, atlas.height // 3))
+    pieces = processor.split_atlas(generated, atlas.size, layout)
+    for view, piece in pieces.items():
+        width, height = images[view].size
+        assert abs(piece.width - width / 3) <= 1 and abs(piece.height - height / 3) <= 1
+
+        # ...and is composited back at the template's full size
+        final = processor.composite_result(images[view], piece, masks[view])
+        assert final.size == images[view].size
+        assert final.getpixel((width // 2, height // 2)) == images[view].getpixel((0, 0))
+
+
+if __name__ == "__main__":
+    test_mask_bbox_pads_and_rounds()
+    test_mask_bbox_stays_inside_image()
+    test_mask_bbox_empty_mask()
+    test_crop_to_mask()
+    test_composite_cropped_result_lands_in_place()
+    test_composite_matches_uncropped()
+    test_atlas_layout_does_not_overlap()
+    test_atlas_round_trip()
+    test_atlas_round_trip_from_downscaled_output()
+    print("✓ Image processor tests passed")
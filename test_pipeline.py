@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the livery pipeline's stage scheduling
+"""
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from image_processor import ImageProcessor
+from input_cache import PreparedInputCache
+from template_manager import TemplateManager
+from async_api_client import AsyncReplicateAPIClient, get_event_loop_thread
+from inference_backend import MockBackend
+from livery_pipeline import LiveryPipeline, ViewWork
+
+VIEWS = 5
+
+
+def make_templates(directory: Path, processor: ImageProcessor):
+    """Copies of one template that differ only in one preserved pixel; returns (path, pixel, value) per copy"""
+    manager = TemplateManager("templates")
+    vehicle = manager.get_vehicle_names()[0]
+    source = processor.load_template(manager.get_template_path(vehicle, "Left"))
+    mask = processor.create_mask(source)
+
+    # A pixel the composite keeps from the template (mask black = preserved)
+    pixel = next((x, y) for y in range(mask.height) for x in range(mask.width) if mask.getpixel((x, y)) == 0)
+    base = source.getpixel(pixel)
+
+    templates = []
+    for i in range(VIEWS):
+        template = source.copy()
+        value = (*((base[0] + i + 1) % 256, *base[1:3]), *base[3:])
+        template.putpixel(pixel, value)
+        path = directory / f"Veh{i}_Left.png"
+        template.save(path)
+        templates.append((path, pixel, value))
+    return templates
+
+
+def check_outputs(templates, outputs):
+    for (_, pixel, value), output in zip(templates, outputs):
+        with Image.open(output) as saved:
+            assert saved.getpixel(pixel)[:3] == value[:3], f"{output.name} holds another view's result"
+
+
+def test_inline_composite_not_overwritten_before_save():
+    """Composite and save run as separate calls on one thread must not share the buffer"""
+    processor = ImageProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        templates = make_templates(tmp, processor)
+        cache = PreparedInputCache(processor, cache_dir=str(tmp / "cache"))
+        client = AsyncReplicateAPIClient("", backend=MockBackend(latency="fixed:0"))
+        pipeline = LiveryPipeline(client, processor, cache)
+
+        works = [ViewWork("Left", path, "test", output_path=tmp / f"out{i}.png")
+                 for i, (path, _, _) in enumerate(templates)]
+        for work in works:
+            pipeline.run(work, stages=["prepare", "generate"])
+        # Leave a buffer behind on this thread, then interleave like concurrent views did
+        pipeline.run(ViewWork("Left", templates[0][0], "warm-up", output_path=tmp / "warm.png"))
+        for work in works:
+            pipeline.run(work, stages=["composite"])
+        for work in works:
+            pipeline.run(work, stages=["save"])
+        check_outputs(templates, [work.output_path for work in works])
+
+
+def test_run_async_concurrent_views():
+    """Concurrent run_async views each save their own composite"""
+    processor = ImageProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        templates = make_templates(tmp, processor)
+        cache = PreparedInputCache(processor, cache_dir=str(tmp / "cache"))
+        client = AsyncReplicateAPIClient("", backend=MockBackend(latency="uniform:0,0.05"), poll_interval=0.01)
+        pipeline = LiveryPipeline(client, processor, cache)
+
+        async def run_all():
+            works = [ViewWork("Left", path, "test", output_path=tmp / f"Veh{i}.png")
+                     for i, (path, _, _) in enumerate(templates)]
+            await asyncio.gather(*(pipeline.run_async(work) for work in works))
+            return [work.output_path for work in works]
+
+        for _ in range(3):
+            check_outputs(templates, get_event_loop_thread().run(run_all()))
+
+
+if __name__ == "__main__":
+    test_inline_composite_not_overwritten_before_save()
+    test_run_async_concurrent_views()
+    print("✓ Pipeline tests passed")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the generated-result cache
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from result_cache import ResultCache
+
+MODEL = "stability-ai/stable-diffusion-inpainting"
+PARAMS = {"prompt": "police livery", "seed": 42, "num_inference_steps": 50, "image": "abc", "mask": "def"}
+
+
+def png_bytes(color, size=(32, 32)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_make_key_is_stable():
+    key = ResultCache.make_key(MODEL, PARAMS)
+    assert key == ResultCache.make_key(MODEL, dict(reversed(list(PARAMS.items()))))
+    assert len(key) == 64
+
+    assert key != ResultCache.make_key(MODEL, dict(PARAMS, seed=43))
+    assert key != ResultCache.make_key(MODEL + ":v2", PARAMS)
+    assert key != ResultCache.make_key(MODEL, dict(PARAMS, prompt="police livery "))
+
+
+def test_hit_and_miss():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(tmp)
+        key = ResultCache.make_key(MODEL, PARAMS)
+        assert cache.get(key) is None
+
+        cache.put(key, png_bytes((200, 10, 10)), latency_seconds=8.0, cost=0.01, model=MODEL)
+        image = cache.get(key)
+        assert image is not None and image.getpixel((0, 0)) == (200, 10, 10)
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+        assert stats["seconds_saved"] == 8.0 and stats["cost_saved"] == 0.01
+
+
+def test_put_moves_downloaded_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(Path(tmp) / "results")
+        download = Path(tmp) / "download.png"
+        download.write_bytes(png_bytes((0, 0, 255)))
+
+        cache.put("k", download)
+        assert not download.exists()
+        assert cache.get("k").getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        entry = png_bytes((1, 2, 3))
+        cache = ResultCache(tmp, max_bytes=len(entry) * 2)
+        now = time.time()
+
+        cache.put("old", entry)
+        cache.put("used", entry)
+        os.utime(Path(tmp) / "old.png", (now - 20, now - 20))
+        os.utime(Path(tmp) / "used.png", (now - 30, now - 30))
+        # Reading "used" makes it the most recently used of the two
+        assert cache.get("used") is not None
+
+        cache.put("new", entry)
+        assert cache.get("old") is None
+        assert not (Path(tmp) / "old.json").exists()
+        assert cache.get("used") is not None
+        assert cache.get("new") is not None
+
+
+if __name__ == "__main__":
+    test_make_key_is_stable()
+    test_hit_and_miss()
+    test_put_moves_downloaded_file()
+    test_evicts_least_recently_used()
+    print("✓ Result cache tests passed")
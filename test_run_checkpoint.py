@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for resuming interrupted runs
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from run_checkpoint import RunCheckpoint
+
+META = {"kind": "cli", "jobs": "/tmp/jobs.jsonl", "output": "/tmp/output"}
+
+
+def test_reopening_resumes_finished_views():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "Alpha_Left.png"
+        output.write_bytes(b"png")
+
+        run = RunCheckpoint.open(tmp, META)
+        run.mark_done("Alpha/Left", output)
+
+        resumed = RunCheckpoint.open(tmp, META)
+        assert resumed.id == run.id
+        assert resumed.finished == {"Alpha/Left": str(output)}
+        assert resumed.is_done("Alpha/Left")
+        assert not resumed.is_done("Alpha/Right")
+
+        # Different settings are a different run
+        assert RunCheckpoint.open(tmp, dict(META, output="/elsewhere")).id != run.id
+        # resume=False starts over
+        assert RunCheckpoint.open(tmp, META, resume=False).finished == {}
+
+
+def test_finished_run_is_not_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "Alpha_Left.png"
+        output.write_bytes(b"png")
+        run = RunCheckpoint.open(tmp, META)
+        run.mark_done("Alpha/Left", output)
+        run.finish()
+
+        assert RunCheckpoint.open(tmp, META).finished == {}
+
+
+def test_is_done_needs_the_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "Alpha_Left.png"
+        output.write_bytes(b"png")
+        run = RunCheckpoint.open(tmp, META)
+        run.mark_done("Alpha/Left", output)
+
+        output.unlink()
+        assert not RunCheckpoint.open(tmp, META).is_done("Alpha/Left")
+
+
+def test_saved_views_load_back_and_are_removed_on_finish():
+    with tempfile.TemporaryDirectory() as tmp:
+        run = RunCheckpoint.open(tmp, {"kind": "gui", "vehicle": "Alpha"})
+        run.save_view("Left", Image.new("RGB", (8, 8), (10, 20, 30)))
+        run.flush()
+
+        resumed = RunCheckpoint.open(tmp, {"kind": "gui", "vehicle": "Alpha"})
+        assert resumed.load_view("Left").getpixel((0, 0)) == (10, 20, 30)
+        assert resumed.load_view("Right") is None
+        assert [r.id for r in RunCheckpoint.unfinished(tmp, kind="gui")] == [run.id]
+        assert RunCheckpoint.unfinished(tmp, kind="cli") == []
+
+        resumed.finish("abandoned")
+        assert not list(resumed.run_dir.glob("*.png"))
+        assert RunCheckpoint.unfinished(tmp) == []
+
+
+def test_prune_keeps_recent_interrupted_runs():
+    with tempfile.TemporaryDirectory() as tmp:
+        recent = RunCheckpoint.open(tmp, dict(META, jobs="recent"))
+        stale = RunCheckpoint.open(tmp, dict(META, jobs="stale"))
+        stale.manifest["updated"] = time.time() - RunCheckpoint.MAX_AGE - 60
+        stale.save_manifest()
+        finished = RunCheckpoint.open(tmp, dict(META, jobs="finished"))
+        finished.finish()
+
+        assert RunCheckpoint.prune(tmp) == 2
+        assert os.listdir(tmp) == [recent.id]
+
+
+if __name__ == "__main__":
+    test_reopening_resumes_finished_views()
+    test_finished_run_is_not_resumed()
+    test_is_done_needs_the_file()
+    test_saved_views_load_back_and_are_removed_on_finish()
+    test_prune_keeps_recent_interrupted_runs()
+    print("✓ Run checkpoint tests passed")
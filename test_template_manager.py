@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental template scanning
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+# Add src to path
+sys.path.insert(0, 'src')
+
+from template_manager import TemplateManager
+
+
+class CountingManager(TemplateManager):
+    """Records which folders are re-read and which files are hashed"""
+
+    def __init__(self, *args, **kwargs):
+        self.scanned = []
+        self.hashed = []
+        super().__init__(*args, **kwargs)
+
+    def _scan_vehicle(self, vehicle_dir, mtime_ns, previous=None):
+        self.scanned.append(vehicle_dir.name)
+        return super()._scan_vehicle(vehicle_dir, mtime_ns, previous)
+
+    def _hash_file(self, path):
+        self.hashed.append(path.name)
+        return TemplateManager._hash_file(path)
+
+
+def make_vehicle(templates_dir: Path, name: str, color=(200, 200, 200)) -> Path:
+    vehicle_dir = templates_dir / name
+    vehicle_dir.mkdir(parents=True)
+    for view in TemplateManager.REQUIRED_VIEWS:
+        Image.new("RGB", (64, 32), color).save(vehicle_dir / f"{name}_{view}.png")
+    return vehicle_dir
+
+
+def bump_mtime(path: Path, seconds: int = 10) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+def test_rescan_skips_unchanged_folders():
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        make_vehicle(templates_dir, "Alpha")
+        beta = make_vehicle(templates_dir, "Beta")
+
+        first = CountingManager(str(templates_dir))
+        assert sorted(first.scanned) == ["Alpha", "Beta"]
+        assert first.get_vehicle_names() == ["Alpha", "Beta"]
+
+        # Nothing changed: everything comes from the manifest
+        again = CountingManager(str(templates_dir))
+        assert again.scanned == [] and again.hashed == []
+        assert again.get_vehicle_names() == ["Alpha", "Beta"]
+        assert again.get_template_path("Beta", "Top") == beta / "Beta_Top.png"
+
+        # A changed folder is re-read, but only its new file is hashed
+        Image.new("RGB", (64, 32), (1, 2, 3)).save(beta / "Beta_Top.png")
+        bump_mtime(beta / "Beta_Top.png")
+        bump_mtime(beta)
+        changed = CountingManager(str(templates_dir))
+        assert changed.scanned == ["Beta"]
+        assert changed.hashed == ["Beta_Top.png"]
+
+        # full=True reads every folder
+        changed.scan_templates(full=True)
+        assert sorted(changed.scanned[1:]) == ["Alpha", "Beta"]
+
+
+def test_rescan_picks_up_added_and_removed_folders():
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        alpha = make_vehicle(templates_dir, "Alpha")
+        CountingManager(str(templates_dir))
+
+        make_vehicle(templates_dir, "Gamma")
+        for path in alpha.iterdir():
+            path.unlink()
+        alpha.rmdir()
+
+        manager = CountingManager(str(templates_dir))
+        assert manager.scanned == ["Gamma"]
+        assert manager.get_vehicle_names() == ["Gamma"]
+        assert "Alpha" not in manager.manifest["vehicles"]
+
+
+def test_incomplete_vehicle_is_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        vehicle_dir = make_vehicle(templates_dir, "Alpha")
+        (vehicle_dir / "Alpha_Rear.png").unlink()
+
+        assert TemplateManager(str(templates_dir)).get_vehicle_names() == []
+
+
+def test_update_vehicle_reports_replaced_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        vehicle_dir = make_vehicle(templates_dir, "Alpha")
+        manager = TemplateManager(str(templates_dir))
+
+        Image.new("RGB", (64, 32), (9, 9, 9)).save(vehicle_dir / "Alpha_Left.png")
+        bump_mtime(vehicle_dir / "Alpha_Left.png")
+        assert manager.update_vehicle("Alpha") == [vehicle_dir / "Alpha_Left.png"]
+        assert manager.update_vehicle("Alpha") == []
+
+
+if __name__ == "__main__":
+    test_rescan_skips_unchanged_folders()
+    test_rescan_picks_up_added_and_removed_folders()
+    test_incomplete_vehicle_is_skipped()
+    test_update_vehicle_reports_replaced_files()
+    print("✓ Template manager tests passed")